@@ -0,0 +1,418 @@
+import os
+import re
+import sqlite3
+import logging
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+# BM25 term-frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Number of buffered postings before a segment is written out
+SEGMENT_POSTINGS = 5_000_000
+
+# Compact once there are more segments than this, or too many removed chunks
+MAX_SEGMENTS = 8
+MAX_DEAD_RATIO = 0.25
+
+# Identifiers and numbers, and the camelCase words within an identifier
+_TOKEN = re.compile(r"[^\W\d]\w*|\d+")
+_SUBWORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+# Longer tokens (hashes, base64 blobs) are not worth indexing
+MAX_TOKEN_LENGTH = 64
+
+
+def tokenize(text):
+    """
+    Split code into lowercase search terms.
+
+    Each identifier yields itself plus, when it is compound, its camelCase and
+    snake_case parts: "getUserName" gives getusername, get, user and name, so
+    both the exact identifier and its words can be looked up.
+
+    Args:
+        text (str): Chunk or query text
+
+    Returns:
+        list: Terms in order of occurrence (with repeats)
+    """
+    terms = []
+    for token in _TOKEN.findall(text):
+        terms.extend(_token_terms(token))
+    return terms
+
+
+@lru_cache(maxsize=65536)
+def _token_terms(token):
+    # Identifiers repeat heavily across a codebase, so each is split only once
+    if len(token) > MAX_TOKEN_LENGTH:
+        return ()
+    lowered = token.lower()
+    terms = [lowered] if len(lowered) > 1 else []
+    parts = [part.lower() for piece in token.split('_') for part in _SUBWORD.findall(piece)]
+    if len(parts) > 1:
+        terms.extend(part for part in parts if len(part) > 1)
+    return tuple(terms)
+
+
+class BM25Index:
+    """
+    Persistent BM25 index over the chunks stored in the embedding collection.
+
+    Built alongside the embeddings, so the same chunk IDs identify a hit in
+    both, and queried next to the vector search by POST /search. Stored in
+    SQLite the way TrigramIndex is: a chunks table maps live chunk numbers to
+    chunk IDs, paths and token counts, and postings hold, per term and segment,
+    sorted arrays of chunk numbers (uint32) and term frequencies (uint16).
+    Removing a file deletes its chunk rows; their postings are filtered out at
+    query time and dropped when segments are compacted.
+    """
+
+    def __init__(self, db_path="data/bm25.db"):
+        self.db_path = db_path
+        self.generation = None
+        # Token count per chunk number (0 for removed chunks), and corpus statistics
+        self.lengths = np.zeros(0, dtype=np.float32)
+        self.live = np.zeros(0, dtype=bool)
+        self.chunk_count = 0
+        self.average_length = 0.0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''CREATE TABLE IF NOT EXISTS chunks (
+            id INTEGER PRIMARY KEY,
+            chunk_id TEXT UNIQUE,
+            file_path TEXT,
+            length INTEGER
+        )''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_file ON chunks (file_path)")
+        conn.execute('''CREATE TABLE IF NOT EXISTS postings (
+            term TEXT,
+            segment INTEGER,
+            chunk_ids BLOB,
+            tfs BLOB,
+            PRIMARY KEY (term, segment)
+        ) WITHOUT ROWID''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER
+        )''')
+        return conn
+
+    @staticmethod
+    def _get_meta(conn, key, default=0):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    @staticmethod
+    def _set_meta(conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def exists(self):
+        return os.path.exists(self.db_path)
+
+    def __len__(self):
+        if not self.exists():
+            return 0
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def writer(self, full=False):
+        """
+        Open a BM25Writer for adding and removing chunks.
+
+        Args:
+            full (bool): Discard the existing index first
+        """
+        return BM25Writer(self, full)
+
+    def compact(self):
+        """Merge all segments into one and drop the postings of removed chunks."""
+        conn = self._connect()
+        self._compact(conn)
+        conn.close()
+
+    def _compact(self, conn):
+        start_time = time.time()
+        live_ids = np.array(sorted(row[0] for row in conn.execute("SELECT id FROM chunks")), dtype=np.uint32)
+        next_segment = self._get_meta(conn, 'next_segment', 0)
+        merged_rows = []
+        current = None
+        blobs = []
+        for term, chunk_ids, tfs in conn.execute("SELECT term, chunk_ids, tfs FROM postings ORDER BY term"):
+            if term != current:
+                if blobs:
+                    merged_rows.append((current, *self._merge_postings(blobs, live_ids)))
+                current = term
+                blobs = []
+            blobs.append((chunk_ids, tfs))
+        if blobs:
+            merged_rows.append((current, *self._merge_postings(blobs, live_ids)))
+
+        conn.execute("DELETE FROM postings")
+        conn.executemany(
+            "INSERT INTO postings (term, segment, chunk_ids, tfs) VALUES (?, ?, ?, ?)",
+            ((term, next_segment, ids.tobytes(), tfs.tobytes()) for term, ids, tfs in merged_rows if len(ids))
+        )
+        self._set_meta(conn, 'next_segment', next_segment + 1)
+        self._set_meta(conn, 'dead', 0)
+        self._set_meta(conn, 'generation', self._get_meta(conn, 'generation', 0) + 1)
+        conn.commit()
+        conn.execute("VACUUM")
+        logging.info(f"BM25 index compacted in {time.time() - start_time:.1f}s")
+
+    @staticmethod
+    def _merge_postings(blobs, live_ids):
+        ids = np.concatenate([np.frombuffer(chunk_ids, dtype=np.uint32) for chunk_ids, _ in blobs])
+        tfs = np.concatenate([np.frombuffer(tfs, dtype=np.uint16) for _, tfs in blobs])
+        # Chunk numbers are never reused, so each appears in at most one segment
+        order = np.argsort(ids, kind='stable')
+        ids, tfs = ids[order], tfs[order]
+        keep = np.isin(ids, live_ids, assume_unique=True)
+        return ids[keep], tfs[keep]
+
+    # ------------------------------------------------------------------
+    # Querying
+    # ------------------------------------------------------------------
+
+    def _refresh(self, conn):
+        """Reload chunk lengths and corpus statistics if the index changed since they were last read."""
+        generation = self._get_meta(conn, 'generation', 0)
+        if generation == self.generation:
+            return
+        next_id = self._get_meta(conn, 'next_id', 0)
+        lengths = np.zeros(next_id, dtype=np.float32)
+        rows = np.array(conn.execute("SELECT id, length FROM chunks").fetchall(), dtype=np.int64).reshape(-1, 2)
+        lengths[rows[:, 0]] = rows[:, 1]
+        self.lengths = lengths
+        self.live = np.zeros(next_id, dtype=bool)
+        self.live[rows[:, 0]] = True
+        self.chunk_count = len(rows)
+        self.average_length = float(rows[:, 1].mean()) if len(rows) else 0.0
+        self.generation = generation
+
+    @staticmethod
+    def _postings(conn, term, live):
+        """Live (chunk numbers, term frequencies) of a term."""
+        rows = conn.execute("SELECT chunk_ids, tfs FROM postings WHERE term = ?", (term,)).fetchall()
+        if not rows:
+            return None
+        ids = np.concatenate([np.frombuffer(chunk_ids, dtype=np.uint32) for chunk_ids, _ in rows])
+        tfs = np.concatenate([np.frombuffer(tfs, dtype=np.uint16) for _, tfs in rows])
+        # Postings written after the last refresh point past the loaded tables
+        keep = ids < len(live)
+        ids, tfs = ids[keep], tfs[keep]
+        keep = live[ids]
+        return ids[keep], tfs[keep]
+
+    def search(self, query, limit=20):
+        """
+        Rank chunks against a query with BM25.
+
+        Args:
+            query (str): Query text, tokenized like the chunks
+            limit (int): Maximum number of hits
+
+        Returns:
+            list: (chunk_id, file_path, score) tuples, best first; empty if
+                  nothing matches or the index has not been built
+        """
+        terms = sorted(set(tokenize(query)))
+        if not terms or not self.exists():
+            return []
+        conn = self._connect()
+        try:
+            with self._lock:
+                self._refresh(conn)
+                lengths, live = self.lengths, self.live
+                total, average_length = self.chunk_count, self.average_length
+            if not total:
+                return []
+            all_ids = []
+            all_scores = []
+            for term in terms:
+                postings = self._postings(conn, term, live)
+                if postings is None or not len(postings[0]):
+                    continue
+                ids, tfs = postings
+                df = len(ids)
+                idf = np.log(1.0 + (total - df + 0.5) / (df + 0.5))
+                tfs = tfs.astype(np.float32)
+                norm = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths[ids] / max(average_length, 1.0))
+                all_ids.append(ids)
+                all_scores.append(idf * tfs * (BM25_K1 + 1.0) / (tfs + norm))
+            if not all_ids:
+                return []
+            ids, inverse = np.unique(np.concatenate(all_ids), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+            if len(ids) > limit:
+                top = np.argpartition(-scores, limit - 1)[:limit]
+            else:
+                top = np.arange(len(ids))
+            # Best first; ties broken by chunk number so results are stable
+            top = top[np.lexsort((ids[top], -scores[top]))]
+            ranked = [(int(ids[i]), float(scores[i])) for i in top]
+            placeholders = ",".join("?" * len(ranked))
+            rows = {
+                row[0]: (row[1], row[2])
+                for row in conn.execute(
+                    f"SELECT id, chunk_id, file_path FROM chunks WHERE id IN ({placeholders})",
+                    [chunk for chunk, _ in ranked]
+                )
+            }
+            return [(*rows[chunk], score) for chunk, score in ranked if chunk in rows]
+        finally:
+            conn.close()
+
+
+class BM25Writer:
+    """
+    Adds and removes the chunks of whole files, buffering postings into segments.
+
+    Nothing is visible to readers until close() commits; if the process dies
+    before then, the files are re-indexed on the next run because the manifest
+    was not updated either.
+    """
+
+    def __init__(self, index, full=False):
+        self.index = index
+        self.conn = index._connect()
+        if full:
+            self.conn.execute("DELETE FROM chunks")
+            self.conn.execute("DELETE FROM postings")
+            # The generation carries on, so running servers see the rebuilt index as new
+            self.conn.execute("DELETE FROM meta WHERE key != 'generation'")
+        self.next_id = index._get_meta(self.conn, 'next_id', 0)
+        self.next_segment = index._get_meta(self.conn, 'next_segment', 0)
+        # Postings not yet written to a segment, as parallel arrays per chunk; terms are
+        # numbered in first-seen order (self.terms) so a segment is grouped with one sort
+        self.term_numbers = {}
+        self.terms = []
+        self.pending_terms = []
+        self.pending_chunks = []
+        self.pending_tfs = []
+        self.pending_count = 0
+        self.chunks_added = 0
+        self.chunks_removed = 0
+
+    def remove_file(self, file_path):
+        """Drop every chunk of a file."""
+        self.chunks_removed += self.conn.execute("DELETE FROM chunks WHERE file_path = ?", (file_path,)).rowcount
+
+    def add_file(self, file_path, ids, documents):
+        """
+        Index the chunks of one file.
+
+        Args:
+            file_path (str): Path relative to the repository root
+            ids (list): Chunk IDs, as stored in the embedding collection
+            documents (list): Chunk texts
+        """
+        rows = []
+        term_numbers = self.term_numbers
+        for chunk_id, document in zip(ids, documents):
+            counts = Counter(tokenize(document))
+            chunk = self.next_id
+            self.next_id += 1
+            rows.append((chunk, chunk_id, file_path, sum(counts.values())))
+            if not counts:
+                continue
+            for term in counts:
+                if term not in term_numbers:
+                    term_numbers[term] = len(self.terms)
+                    self.terms.append(term)
+            self.pending_terms.append(np.fromiter((term_numbers[term] for term in counts), dtype=np.uint32, count=len(counts)))
+            self.pending_tfs.append(np.minimum(np.fromiter(counts.values(), dtype=np.int64, count=len(counts)), 65535))
+            self.pending_chunks.append(np.full(len(counts), chunk, dtype=np.uint32))
+            self.pending_count += len(counts)
+        # A chunk ID seen again (a re-added file) replaces the old row; its postings become stale
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO chunks (id, chunk_id, file_path, length) VALUES (?, ?, ?, ?)", rows
+        )
+        self.chunks_added += len(rows)
+        if self.pending_count >= SEGMENT_POSTINGS:
+            self._write_segment()
+
+    def _write_segment(self):
+        """Group buffered postings by term and store them as one segment."""
+        if not self.pending_terms:
+            return
+        terms = np.concatenate(self.pending_terms)
+        chunks = np.concatenate(self.pending_chunks)
+        tfs = np.concatenate(self.pending_tfs).astype(np.uint16)
+        # Stable sort keeps chunk numbers ascending within each term
+        order = np.argsort(terms, kind='stable')
+        terms, chunks, tfs = terms[order], chunks[order], tfs[order]
+        boundaries = np.flatnonzero(np.diff(terms)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(terms)]))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO postings (term, segment, chunk_ids, tfs) VALUES (?, ?, ?, ?)",
+            (
+                (self.terms[terms[start]], self.next_segment, chunks[start:end].tobytes(), tfs[start:end].tobytes())
+                for start, end in zip(starts.tolist(), ends.tolist())
+            )
+        )
+        self.next_segment += 1
+        self.term_numbers = {}
+        self.terms = []
+        self.pending_terms, self.pending_chunks, self.pending_tfs = [], [], []
+        self.pending_count = 0
+
+    def close(self):
+        """Write the last segment, commit, and compact if segments or removed chunks have piled up."""
+        try:
+            self._write_segment()
+            conn = self.conn
+            self.index._set_meta(conn, 'next_id', self.next_id)
+            self.index._set_meta(conn, 'next_segment', self.next_segment)
+            dead = self.index._get_meta(conn, 'dead', 0) + self.chunks_removed
+            self.index._set_meta(conn, 'dead', dead)
+            self.index._set_meta(conn, 'generation', self.index._get_meta(conn, 'generation', 0) + 1)
+            conn.commit()
+            live = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            segments = conn.execute("SELECT COUNT(DISTINCT segment) FROM postings").fetchone()[0]
+            if segments > MAX_SEGMENTS or (dead and dead / (live + dead) > MAX_DEAD_RATIO):
+                self.index._compact(conn)
+        finally:
+            self.conn.close()
+        if self.chunks_added or self.chunks_removed:
+            logging.info(f"BM25 index: added {self.chunks_added} chunks, removed {self.chunks_removed}")
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Merge ranked lists with reciprocal rank fusion: each item scores the sum of
+    1 / (k + rank) over the lists it appears in (ranks start at 1).
+
+    Only ranks are used, so scores from retrievers with unrelated scales (BM25,
+    vector distances) never have to be calibrated against each other.
+
+    Args:
+        rankings (dict): Retriever name -> list of item keys, best first
+        k (int): Damping constant; larger values flatten the difference between top ranks
+
+    Returns:
+        list: (key, score, {retriever: rank}) tuples, best first; ties keep first-seen order
+    """
+    scores = {}
+    ranks = {}
+    for name, keys in rankings.items():
+        for rank, key in enumerate(keys, 1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            ranks.setdefault(key, {})[name] = rank
+    order = sorted(scores, key=lambda key: -scores[key])
+    return [(key, scores[key], ranks[key]) for key in order]
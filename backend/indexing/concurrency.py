@@ -0,0 +1,139 @@
+import os
+import asyncio
+import functools
+
+
+class Overloaded(Exception):
+    """Raised when a request arrives while its endpoint's wait queue is full."""
+
+
+class ConcurrencyLimiter:
+    """
+    Caps how many requests of one kind run at once, with a bounded wait queue.
+
+    Up to max_concurrent requests hold a slot; up to max_waiting more wait for
+    one. Anything beyond that is rejected immediately with Overloaded, so a
+    burst of slow requests turns into fast 503s instead of an ever-growing
+    backlog that delays every other endpoint.
+
+    Use as an async context manager around the request's work.
+    """
+
+    def __init__(self, name, max_concurrent, max_waiting):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls, name, max_concurrent, max_waiting):
+        """Create a limiter whose limits can be overridden with <NAME>_MAX_CONCURRENT / <NAME>_MAX_QUEUED."""
+        prefix = name.upper()
+        return cls(
+            name,
+            int(os.getenv(f"{prefix}_MAX_CONCURRENT", str(max_concurrent))),
+            int(os.getenv(f"{prefix}_MAX_QUEUED", str(max_waiting)))
+        )
+
+    def is_full(self):
+        """Whether a new request would be rejected right now."""
+        return self.active >= self.max_concurrent and self.waiting >= self.max_waiting
+
+    async def __aenter__(self):
+        if self.is_full():
+            self.rejected += 1
+            raise Overloaded(f"Too many concurrent {self.name} requests, try again shortly")
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        self.active -= 1
+        self.completed += 1
+        self._semaphore.release()
+        return False
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_waiting,
+            "active": self.active,
+            "queued": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+async def run_blocking(executor, fn, *args, **kwargs):
+    """Run a blocking call on the given executor without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+
+_DONE = object()
+
+
+async def iterate_in_executor(executor, make_iterator, cancelled, idle_seconds=None):
+    """
+    Run a blocking iterator on an executor thread and yield its items on the event loop.
+
+    The producer checks cancelled before each item; setting it (or closing this
+    generator, e.g. when the client goes away) stops the iterator, which is
+    then closed so its cleanup runs on the worker thread. With idle_seconds,
+    None is yielded whenever nothing arrived for that long, so a streaming
+    endpoint can send keep-alives and notice a departed client while the
+    producer is busy without results.
+    """
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue()
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(items.put_nowait, item)
+        except RuntimeError:
+            # Event loop already closed; nobody is listening anymore
+            cancelled.set()
+
+    def produce():
+        iterator = None
+        try:
+            iterator = make_iterator()
+            for item in iterator:
+                if cancelled.is_set():
+                    break
+                put(item)
+        except BaseException as e:
+            put(e)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            put(_DONE)
+
+    loop.run_in_executor(executor, produce)
+    try:
+        while True:
+            if idle_seconds is None:
+                item = await items.get()
+            else:
+                try:
+                    item = await asyncio.wait_for(items.get(), idle_seconds)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
@@ -0,0 +1,311 @@
+"""
+Content matching for GET /search.
+
+scan_files runs in worker processes, so this module only imports the standard
+library: children must not pay for loading the embedding model or ChromaDB.
+
+Files are matched as raw bytes against a query compiled once: large files are
+memory-mapped rather than copied, case folding works on bounded chunks, and
+only the snippet around a match is ever decoded.
+"""
+import os
+import re
+import mmap
+import itertools
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+# Leading bytes checked for NULs; files containing one are treated as binary and skipped
+BINARY_SNIFF_BYTES = 8192
+# Files at least this large are memory-mapped; smaller ones are cheaper to read in one call
+MMAP_MIN_SIZE = 64 * 1024
+# Case-folded scans lowercase this many bytes at a time, bounding the temporary copy
+FOLD_CHUNK = 1024 * 1024
+# Characters of context kept on each side of a match in the snippet
+SNIPPET_CONTEXT = 100
+# Bytes read around a match to find SNIPPET_CONTEXT characters (UTF-8 is at most 4 bytes each)
+SNIPPET_WINDOW = SNIPPET_CONTEXT * 4
+# Line offset tables kept per process, and the bytes scanned for newlines at a time when growing one
+LINE_OFFSETS_CACHE_ENTRIES = 256
+LINE_SCAN_BLOCK = 256 * 1024
+
+_NEWLINE = re.compile(b"\n")
+
+
+def _folded_chunks(data, overlap):
+    """ASCII-lowercased chunks of data with their offsets; consecutive chunks overlap by overlap bytes."""
+    for start in range(0, len(data), FOLD_CHUNK):
+        yield start, data[start:start + FOLD_CHUNK + overlap].lower()
+
+
+def _iter_folded(data, needle):
+    """Spans of the non-overlapping case-insensitive (ASCII) occurrences of a lowercase needle."""
+    step = max(1, len(needle))
+    resume = 0
+    for start, chunk in _folded_chunks(data, max(0, len(needle) - 1)):
+        pos = chunk.find(needle, max(0, resume - start))
+        # Occurrences starting in the overlap are found again, in full, by the next chunk
+        while pos != -1 and pos < FOLD_CHUNK:
+            yield start + pos, start + pos + len(needle)
+            resume = start + pos + step
+            pos = chunk.find(needle, pos + step)
+
+
+def _contains_required(data, required):
+    """Whether data contains, case-insensitively, at least one literal of every group."""
+    pending = list(required)
+    overlap = max(len(literal) for group in pending for literal in group) - 1
+    for _, chunk in _folded_chunks(data, max(0, overlap)):
+        pending = [group for group in pending if not any(literal in chunk for literal in group)]
+        if not pending:
+            return True
+    return False
+
+
+def _ignore_case_literal(text):
+    """
+    Bytes pattern source matching text case-insensitively, like comparing lowercased strings.
+
+    re.IGNORECASE only folds ASCII on bytes patterns, so ASCII runs use a scoped
+    (?i:...) group and other characters list the UTF-8 encodings of their case variants.
+    """
+    parts = []
+    ascii_run = []
+    for char in text:
+        if char.isascii():
+            ascii_run.append(char)
+            continue
+        if ascii_run:
+            parts.append(b"(?i:" + re.escape(''.join(ascii_run).encode('utf-8')) + b")")
+            ascii_run = []
+        variants = {char, char.lower(), char.upper()}
+        encoded = sorted(re.escape(variant.encode('utf-8')) for variant in variants)
+        parts.append(encoded[0] if len(encoded) == 1 else b"(?:" + b"|".join(encoded) + b")")
+    if ascii_run:
+        parts.append(b"(?i:" + re.escape(''.join(ascii_run).encode('utf-8')) + b")")
+    return b"".join(parts)
+
+
+class ContentMatcher:
+    """
+    A GET /search query compiled for matching raw file bytes.
+
+    Built once per query in the API process and pickled to the search workers
+    with every batch. Plain ASCII terms are found by a case-folded byte search;
+    everything else runs a bytes regex, skipped outright for files missing one
+    of the literals the regex requires.
+    """
+
+    def __init__(self, pattern, highlight, required=(), literal=None):
+        self.pattern = pattern
+        self.highlight = highlight
+        self.required = required
+        self.literal = literal
+
+    def finditer(self, data):
+        """Byte spans (start, end) of the matches in data (bytes or an mmap), in order."""
+        if self.literal is not None:
+            yield from _iter_folded(data, self.literal)
+            return
+        if self.required and not _contains_required(data, self.required):
+            return
+        for match in self.pattern.finditer(data):
+            yield match.span()
+
+
+class LineOffsets:
+    """
+    Byte offsets at which the lines of one file version start.
+
+    Newlines are only scanned as far as the furthest match asked about, and
+    the table is kept in a per-process LRU cache, so a later search of the same
+    file reuses it; a line number is then a bisection of the table.
+    """
+
+    def __init__(self):
+        self.starts = array('Q', [0])
+        self.scanned = 0
+        self._lock = threading.Lock()
+
+    def line_of(self, data, offset):
+        """1-based line containing a byte offset."""
+        with self._lock:
+            if offset >= self.scanned and self.scanned < len(data):
+                end = min(len(data), max(offset + 1, self.scanned + LINE_SCAN_BLOCK))
+                self.starts.extend(match.end() for match in _NEWLINE.finditer(data, self.scanned, end))
+                self.scanned = end
+            return bisect_right(self.starts, offset)
+
+
+_line_offsets = OrderedDict()
+_line_offsets_lock = threading.Lock()
+
+
+def line_offsets(key):
+    """The cached LineOffsets for a file version key, created empty on first use."""
+    with _line_offsets_lock:
+        lines = _line_offsets.get(key)
+        if lines is None:
+            lines = _line_offsets[key] = LineOffsets()
+            while len(_line_offsets) > LINE_OFFSETS_CACHE_ENTRIES:
+                _line_offsets.popitem(last=False)
+        else:
+            _line_offsets.move_to_end(key)
+        return lines
+
+
+def compile_matcher(search_term, search_term_lower, search_pattern, is_quoted_string, literal_groups=None):
+    """
+    Compile a GET /search query into a ContentMatcher.
+
+    A regex search_pattern is re-compiled on bytes (case folding then applies
+    to ASCII, and \\s to ASCII whitespace); a quoted string matches exactly;
+    anything else matches case-insensitively.
+
+    Args:
+        literal_groups (list): Literals the pattern requires, as from
+            trigram_index.regex_literal_groups; used to skip files cheaply
+
+    Returns:
+        ContentMatcher: Picklable matcher for scan_files
+    """
+    if search_pattern:
+        pattern = re.compile(search_pattern.pattern.encode('utf-8'), search_pattern.flags & re.IGNORECASE)
+        # Bytes lowercasing only folds ASCII, so only all-ASCII groups are safe to require
+        required = [
+            tuple(literal.encode('ascii') for literal in group)
+            for group in literal_groups or ()
+            if all(literal.isascii() for literal in group)
+        ]
+        return ContentMatcher(pattern, True, required)
+    if is_quoted_string:
+        # Case-sensitive literals get the regex engine's own fast literal search
+        return ContentMatcher(re.compile(re.escape(search_term.encode('utf-8'))), True)
+    if search_term_lower.isascii():
+        return ContentMatcher(None, False, literal=search_term_lower.encode('ascii'))
+    return ContentMatcher(re.compile(_ignore_case_literal(search_term_lower)), False)
+
+
+def _char_count(data, start, end):
+    """Number of characters in a byte range of UTF-8 data"""
+    chunk = data[start:end]
+    return len(chunk) if chunk.isascii() else len(chunk.decode('utf-8', errors='ignore'))
+
+
+def _context(data, pos, match_end, lower, upper, highlight):
+    """
+    Text of a match with up to SNIPPET_CONTEXT characters on each side, within
+    the byte bounds [lower, upper); "..." marks where text was cut off.
+    """
+    # Decode only a window around the match; partial UTF-8 sequences at its edges are dropped
+    window_start = max(lower, pos - SNIPPET_WINDOW)
+    window_end = min(upper, match_end + SNIPPET_WINDOW)
+    before = data[window_start:pos].decode('utf-8', errors='ignore')
+    match_text = data[pos:match_end].decode('utf-8', errors='ignore')
+    after = data[match_end:window_end].decode('utf-8', errors='ignore')
+
+    text = ""
+    if window_start > lower or len(before) > SNIPPET_CONTEXT:
+        text += "..."
+    text += before[-SNIPPET_CONTEXT:]
+    text += "«" + match_text + "»" if highlight else match_text
+    text += after[:SNIPPET_CONTEXT]
+    if window_end < upper or len(after) > SNIPPET_CONTEXT:
+        text += "..."
+    return text, match_text
+
+
+def find_content_match(data, matcher, max_matches=1, line_key=None):
+    """
+    Find the matches of a query in file data (bytes or an mmap).
+
+    Returns the match fields of a search result, or None if there is no match:
+    the snippet, match_position (a character offset), line and column of the
+    first match, and `matches`, a list of up to max_matches entries with the
+    1-based line and column of each match and a preview of its line.
+    more_matches is set when the file has further matches.
+
+    Args:
+        line_key: Identifies the file version in the line offset cache; None builds an uncached table
+    """
+    spans = list(itertools.islice(matcher.finditer(data), max_matches + 1))
+    if not spans:
+        return None
+    lines = line_offsets(line_key) if line_key is not None else LineOffsets()
+    matches = []
+    for pos, match_end in spans[:max_matches]:
+        line = lines.line_of(data, pos)
+        line_start = lines.starts[line - 1]
+        # The preview needs the line's end only within its window, not across a huge line
+        line_end = data.find(b"\n", pos, match_end + SNIPPET_WINDOW + 1)
+        if line_end == -1:
+            line_end = min(len(data), match_end + SNIPPET_WINDOW + 1)
+        preview, _ = _context(data, pos, match_end, line_start, line_end, matcher.highlight)
+        matches.append({
+            "line": line,
+            "column": _char_count(data, line_start, pos) + 1,
+            "preview": preview.rstrip("\r"),
+        })
+
+    pos, match_end = spans[0]
+    snippet, match_text = _context(data, pos, match_end, 0, len(data), matcher.highlight)
+    result = {
+        "snippet": snippet,
+        # A character offset, as in the decoded file
+        "match_position": _char_count(data, 0, pos),
+        "line": matches[0]["line"],
+        "column": matches[0]["column"],
+        "matches": matches,
+        "more_matches": len(spans) > max_matches,
+    }
+    if matcher.highlight:
+        result["match_text"] = match_text
+        result["exact_match"] = True
+    return result
+
+
+def scan_file(full_path, matcher, max_file_size, max_matches=1):
+    """Match one file; returns the match fields, or None for no match and unreadable, large or binary files."""
+    with open(full_path, 'rb') as f:
+        stat_result = os.fstat(f.fileno())
+        size = stat_result.st_size
+        # Skip large files before reading them (and empty files, which cannot be mapped)
+        if size > max_file_size or size == 0:
+            return None
+        line_key = (full_path, stat_result.st_ino, size, stat_result.st_mtime_ns)
+        if size < MMAP_MIN_SIZE:
+            data = f.read()
+            if b"\0" in data[:BINARY_SNIFF_BYTES]:
+                return None
+            return find_content_match(data, matcher, max_matches, line_key)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data.find(b"\0", 0, BINARY_SNIFF_BYTES) != -1:
+                return None
+            return find_content_match(data, matcher, max_matches, line_key)
+
+
+def scan_files(files, matcher, max_file_size, max_matches=1):
+    """
+    Match a batch of files.
+
+    Args:
+        files (list): (full_path, rel_path) pairs
+        matcher (ContentMatcher): From compile_matcher
+        max_file_size (int): Files larger than this are skipped without being read
+        max_matches (int): Matches reported per file (see find_content_match)
+
+    Returns:
+        list: (rel_path, match fields) for every matching file, in input order
+    """
+    matches = []
+    for full_path, rel_path in files:
+        try:
+            result = scan_file(full_path, matcher, max_file_size, max_matches)
+        except (OSError, ValueError):
+            # Files deleted since indexing, unreadable files, mappings that fail
+            continue
+        if result:
+            matches.append((rel_path, result))
+    return matches
@@ -0,0 +1,153 @@
+"""
+Helpers for assembling the /query prompt context within a token budget.
+
+Token counts are estimated (about four characters per token), which is close
+enough for code and English to keep prompts inside the budget without
+loading a tokenizer.
+"""
+import re
+from bisect import bisect_right
+
+TOKEN_CHARS = 4
+
+_IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+_CAMEL_PART = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+')
+_STOPWORDS = {
+    'the', 'and', 'for', 'are', 'was', 'what', 'how', 'why', 'does', 'this', 'that',
+    'with', 'from', 'where', 'which', 'when', 'who', 'can', 'into', 'there', 'their',
+    'file', 'code', 'function', 'class', 'method', 'use', 'used', 'uses', 'work', 'works',
+}
+
+
+def estimate_tokens(text):
+    """Rough token count of a piece of text."""
+    return (len(text) + TOKEN_CHARS - 1) // TOKEN_CHARS
+
+
+def question_terms(question):
+    """Lowercased search terms from a question, with camelCase and snake_case identifiers split into parts."""
+    terms = set()
+    for identifier in _IDENTIFIER.findall(question):
+        parts = [identifier] + identifier.split('_') + _CAMEL_PART.findall(identifier)
+        for part in parts:
+            part = part.lower()
+            if len(part) >= 3 and part not in _STOPWORDS:
+                terms.add(part)
+    return terms
+
+
+def line_starts(content):
+    """Character offset at which each line of content starts."""
+    starts = [0]
+    position = content.find('\n')
+    while position != -1:
+        starts.append(position + 1)
+        position = content.find('\n', position + 1)
+    return starts
+
+
+def char_span_to_lines(starts, start, end):
+    """Convert a character span to an inclusive, 1-based (first_line, last_line) range."""
+    return bisect_right(starts, start), bisect_right(starts, max(start, end - 1))
+
+
+def locate_chunks(content, chunk_texts):
+    """Line ranges of the chunks that occur verbatim in content (chunks of a stale index are skipped)."""
+    starts = line_starts(content)
+    ranges = []
+    for text in chunk_texts:
+        position = content.find(text) if text else -1
+        if position != -1:
+            ranges.append(char_span_to_lines(starts, position, position + len(text)))
+    return ranges
+
+
+def keyword_windows(lines, terms, window=30, limit=3):
+    """
+    Score overlapping windows of lines by how many distinct question terms they mention.
+
+    Returns:
+        list: Up to limit (first_line, last_line) ranges, best first
+    """
+    if not terms or not lines:
+        return []
+    step = max(1, window // 2)
+    lowered = [line.lower() for line in lines]
+    scored = []
+    for first in range(0, len(lines), step):
+        text = '\n'.join(lowered[first:first + window])
+        hits = [term for term in terms if term in text]
+        if hits:
+            # Distinct terms matter most; total occurrences break ties
+            score = (len(hits), sum(text.count(term) for term in hits))
+            scored.append((score, first + 1, min(len(lines), first + window)))
+        if first + window >= len(lines):
+            break
+    scored.sort(key=lambda entry: entry[0], reverse=True)
+    return [(first, last) for _, first, last in scored[:limit]]
+
+
+def merge_ranges(ranges, gap=2):
+    """Merge overlapping ranges and ranges separated by at most gap lines, keeping first-seen priority order."""
+    merged = []
+    for first, last in ranges:
+        for index, (other_first, other_last) in enumerate(merged):
+            if first <= other_last + gap + 1 and other_first <= last + gap + 1:
+                merged[index] = (min(first, other_first), max(last, other_last))
+                break
+        else:
+            merged.append((first, last))
+    # A merge can make earlier ranges overlap each other; repeat until stable
+    return merged if len(merged) == len(ranges) else merge_ranges(merged, gap)
+
+
+def render_lines(lines, first, last):
+    """Render an inclusive 1-based line range as a fenced block."""
+    return "```\n" + "\n".join(lines[first - 1:last]) + "\n```\n"
+
+
+class ContextPacker:
+    """
+    Collects prompt sections in priority order while they fit in a token budget.
+
+    Each kind of section can have its own cap on top of the overall budget,
+    so, for example, the context file cannot crowd out retrieved chunks.
+    """
+
+    def __init__(self, budget_tokens):
+        self.budget_tokens = budget_tokens
+        self.used_tokens = 0
+        self.sections = []
+        self.counts = {}
+        self.tokens_by_kind = {}
+        self.dropped = 0
+
+    def remaining(self, kind=None, cap=None):
+        remaining = self.budget_tokens - self.used_tokens
+        if cap is not None:
+            remaining = min(remaining, cap - self.tokens_by_kind.get(kind, 0))
+        return remaining
+
+    def add(self, kind, text, cap=None):
+        """Add a section if it fits; returns whether it was added."""
+        tokens = estimate_tokens(text)
+        if tokens > self.remaining(kind, cap):
+            self.dropped += 1
+            return False
+        self.sections.append(text)
+        self.used_tokens += tokens
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        self.tokens_by_kind[kind] = self.tokens_by_kind.get(kind, 0) + tokens
+        return True
+
+    def text(self):
+        return "".join(self.sections)
+
+    def stats(self):
+        return {
+            "budget_tokens": self.budget_tokens,
+            "context_tokens": self.used_tokens,
+            "sections": dict(self.counts),
+            "tokens_by_section": dict(self.tokens_by_kind),
+            "dropped_sections": self.dropped,
+        }
@@ -1,65 +1,477 @@
+import os
+import stat
+import re
+import zlib
+import shutil
 import subprocess
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import json
+import time
 import logging
 
-def run_ctags(repo_path_str):
+try:
+    # Optional fast JSON decoder; ctags output is one small JSON object per line,
+    # so decoding dominates parse time
+    import orjson
+    _json_loads = orjson.loads
+    JSON_DECODER = "orjson"
+except ImportError:
+    _json_loads = json.loads
+    JSON_DECODER = "json"
+
+from indexing.symbol_table import SymbolTableBuilder, SymbolTable, SymbolIndex
+from indexing.manifest import FileManifest, stat_file
+from indexing.trigram_index import SKIP_DIRS
+
+# Base ctags invocation; JSON output with line number, end line, kind, signature and scope
+# Adjust the executable name if needed - might be 'ctags', 'universal-ctags', etc.
+CTAGS_COMMAND = ["ctags", "--fields=+neKPSZ", "--output-format=json"]
+
+TAGS_FILE_NAME = "ctags_index.tags"
+DEFAULT_TAGS_FILE = os.path.join("data", TAGS_FILE_NAME)
+
+# Files are assigned to shards by a hash of their path, so a changed file only
+# invalidates its own shard and the assignment is stable between runs
+DEFAULT_SHARDS = 64
+
+# Invalid lines logged individually per stream; the rest are only counted
+MAX_LOGGED_ERRORS = 5
+
+def tags_file_path(data_dir="data"):
+    """Path of the tags location inside a data directory (its symbol table is written next to it)."""
+    return os.path.join(data_dir, TAGS_FILE_NAME)
+
+def shard_of(rel_path, shards):
+    return zlib.crc32(rel_path.encode('utf-8')) % shards
+
+def iter_repository_files(repo_path_str):
     """
-    Run ctags on the specified repository path to generate a JSON index of code definitions.
+    Walk the repository for ctags, skipping hidden files and the same directories as search.
+    
+    Yields:
+        tuple: (rel_path, stat_result) for every regular file
+    """
+    for root, dirs, files in os.walk(repo_path_str):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.') and d not in SKIP_DIRS)
+        for file in sorted(files):
+            if file.startswith('.'):
+                continue
+            full_path = os.path.join(root, file)
+            stat_result = stat_file(full_path)
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                continue
+            yield os.path.relpath(full_path, repo_path_str).replace('\\', '/'), stat_result
+
+class TagParseStats:
+    """
+    Counts of what a ctags stream produced, for throughput and error reporting.
+
+    Each stream gets its own instance (shards parse on separate threads);
+    merge() folds them together for the summary.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.tags = 0
+        self.skipped = 0
+        self.errors = 0
+        self.lines_recovered = 0
+
+    def error(self, source, message):
+        self.errors += 1
+        if self.errors <= MAX_LOGGED_ERRORS:
+            logging.warning(f"{source}: {message}")
+
+    def merge(self, other):
+        self.tags += other.tags
+        self.skipped += other.skipped
+        self.errors += other.errors
+        self.lines_recovered += other.lines_recovered
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def rate(self):
+        elapsed = self.elapsed()
+        return self.tags / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        text = f"{self.tags} tags in {self.elapsed():.2f}s ({self.rate():,.0f} tags/sec, {JSON_DECODER} decoder)"
+        if self.lines_recovered:
+            text += f", {self.lines_recovered} line numbers recovered from patterns"
+        if self.errors:
+            text += f", {self.errors} invalid lines skipped"
+        return text
+
+# ctags escapes only backslashes and the delimiter inside patterns
+_PATTERN_ESCAPE = re.compile(r'\\([\\/?$])')
+
+def parse_pattern(pattern):
+    """
+    Split a ctags search pattern such as '/^    def foo():$/' into its text and anchors.
+
+    Returns:
+        tuple: (text, anchored_start, anchored_end), or None if it is not a search pattern
+    """
+    if len(pattern) < 2 or pattern[0] not in '/?' or pattern[-1] != pattern[0]:
+        return None
+    body = pattern[1:-1]
+    anchored_start = body.startswith('^')
+    if anchored_start:
+        body = body[1:]
+    # A trailing '$' is an anchor unless escaped; ctags drops it when it truncates long lines
+    anchored_end = body.endswith('$') and not body.endswith('\\$')
+    if anchored_end:
+        body = body[:-1]
+    return _PATTERN_ESCAPE.sub(r'\1', body), anchored_start, anchored_end
+
+class PatternLineResolver:
+    """
+    Recovers line numbers from search patterns for tags that carry no line field.
+
+    ctags emits the tags of a file together, so only the lines of the most
+    recently read file are kept.
+    """
+
+    def __init__(self, base_dir=None):
+        self.base_dir = base_dir
+        self._path = None
+        self._lines = []
+
+    def _file_lines(self, path):
+        if path != self._path:
+            self._path = path
+            full_path = os.path.join(self.base_dir, path) if self.base_dir else path
+            try:
+                with open(full_path, 'r', encoding='utf-8', errors='replace') as f:
+                    self._lines = f.read().splitlines()
+            except OSError:
+                self._lines = []
+        return self._lines
+
+    def resolve(self, path, pattern):
+        """1-based line of the first line matching pattern in path, or None."""
+        parsed = parse_pattern(pattern)
+        if parsed is None or not path:
+            return None
+        text, anchored_start, anchored_end = parsed
+        for number, line in enumerate(self._file_lines(path), 1):
+            if anchored_start and anchored_end:
+                matched = line == text
+            elif anchored_start:
+                matched = line.startswith(text)
+            elif anchored_end:
+                matched = line.endswith(text)
+            else:
+                matched = text in line
+            if matched:
+                return number
+        return None
+
+def tag_to_definition(tag, resolver=None, stats=None):
+    """
+    Convert one ctags JSON record into the definition dict served by the API.
     
     Args:
-        repo_path_str (str): Path to the repository to index
+        tag (dict): A parsed line of ctags JSON output
+        resolver (PatternLineResolver): Recovers the line from the search pattern when ctags gave none
+        stats (TagParseStats): Counts recovered line numbers
         
     Returns:
-        bool: True if ctags ran successfully, False otherwise
+        dict: Definition with path, line, kind and signature
+    """
+    # Extract the relevant fields
+    # Note: field names might vary depending on ctags version and configuration
+    path = tag.get('path', '')
+    
+    # Try different field names for line number
+    line_num = tag.get('line', tag.get('lineNumber', tag.get('scopeLine')))
+    if line_num is None and resolver is not None and isinstance(tag.get('pattern'), str):
+        # Pattern typically looks like '/^    def function_name():$/'
+        line_num = resolver.resolve(path, tag['pattern'])
+        if line_num is not None and stats is not None:
+            stats.lines_recovered += 1
+    
+    kind = tag.get('kind', '')
+    signature = tag.get('signature', '')
+    
+    return {
+        "path": path,
+        "line": line_num,
+        "kind": kind,
+        "signature": signature
+    }
+
+def iter_tags(lines, stats, resolver=None, source="ctags"):
+    """
+    Decode ctags JSON lines (str or bytes) into (name, definition) pairs.
+    
+    Pseudo tags and records without a name are skipped; invalid lines are
+    counted in stats and the first few are logged.
+    
+    Yields:
+        tuple: Symbol name and its definition dict (path, line, kind, signature)
     """
-    # Convert string path to Path object
-    repo_path = Path(repo_path_str)
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            tag = _json_loads(line)
+        except ValueError as e:
+            # json.JSONDecodeError and orjson.JSONDecodeError both derive from ValueError
+            stats.error(source, f"line {number}: invalid JSON ({e})")
+            continue
+        if not isinstance(tag, dict) or tag.get('_type', 'tag') != 'tag':
+            stats.skipped += 1
+            continue
+        name = tag.get('name')
+        if not isinstance(name, str):
+            stats.error(source, f"line {number}: tag without a name")
+            continue
+        stats.tags += 1
+        yield name, tag_to_definition(tag, resolver, stats)
+
+def stream_ctags(repo_path_str, file_paths, stats):
+    """
+    Run ctags on the given files and yield their tags as ctags writes them.
     
-    # Define the output tags file path
-    tags_file = Path("./ctags_index.tags")
+    Output is decoded straight from the subprocess pipe, so neither the
+    process output nor a tags file is ever held in memory or on disk.
+    The file list is fed to ctags on stdin from a separate thread (and
+    stderr drained by another) so no pipe can fill up and stall it.
+    
+    Args:
+        repo_path_str (str): Path to the repository (ctags working directory)
+        file_paths (list): Paths of the files to tag
+        stats (TagParseStats): Receives tag, error and throughput counts
+        
+    Yields:
+        tuple: Symbol name and its definition dict
+        
+    Raises:
+        RuntimeError: If ctags exits with an error (after its output was consumed)
+    """
+    process = subprocess.Popen(
+        CTAGS_COMMAND + ["-f", "-", "-L", "-"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=repo_path_str
+    )
+    stderr_tail = deque(maxlen=20)
     
-    # Construct the ctags command
-    # Adjust executable name if needed - might be 'ctags', 'exuberant-ctags', 'universal-ctags', etc.
-    command = [
-        "ctags",  # Replace with the correct executable name for your system
-        "--fields=+neKPSZ",  # Include line number, end line, kind, signature, scope
-        "--output-format=json",  # Output in JSON format for easier parsing
-        "-R",  # Recursively process directories
-        f"-f{tags_file.absolute()}",  # Output file path
-        str(repo_path)  # Path to repository
-    ]
+    def feed():
+        try:
+            for path in file_paths:
+                process.stdin.write(os.fsencode(str(path)) + b"\n")
+            process.stdin.close()
+        except OSError:
+            # ctags exited early; its return code reports why
+            pass
     
-    # Additional options that might be useful:
-    # "--languages=Python,JavaScript,Java,C,C++",  # Limit to specific languages
-    # "--exclude=node_modules",  # Exclude specific directories
-    # "--exclude=*.min.js",  # Exclude minified files
+    def drain():
+        for line in process.stderr:
+            stderr_tail.append(line.decode('utf-8', 'replace').rstrip())
     
+    threads = [threading.Thread(target=feed, daemon=True), threading.Thread(target=drain, daemon=True)]
+    for thread in threads:
+        thread.start()
+    completed = False
     try:
-        # Run the command
-        result = subprocess.run(
-            command, 
-            capture_output=True, 
-            text=True, 
-            check=False,  # Don't raise exceptions on non-zero exit
-            cwd=repo_path_str
-        )
+        yield from iter_tags(process.stdout, stats, PatternLineResolver(repo_path_str), source="ctags output")
+        completed = True
+    finally:
+        if not completed:
+            # The consumer stopped early or failed; don't leave ctags running
+            process.kill()
+        process.stdout.close()
+        process.wait()
+        for thread in threads:
+            thread.join()
+    if process.returncode != 0:
+        raise RuntimeError(f"ctags failed with return code {process.returncode}: {' | '.join(stderr_tail)}")
+    if stderr_tail:
+        logging.warning(f"ctags reported: {stderr_tail[-1]}")
+
+def run_ctags_shard(repo_path_str, rel_paths, output_path):
+    """
+    Tag one shard of files straight into a symbol table at output_path (written atomically).
+    
+    Returns:
+        TagParseStats: Counts and throughput of the shard's tag stream
+        
+    Raises:
+        RuntimeError: If ctags exits with an error
+    """
+    stats = TagParseStats()
+    builder = SymbolTableBuilder()
+    if rel_paths:
+        # Paths are passed as repo_path/rel_path, so tags record them exactly as
+        # a recursive run over repo_path would
+        file_paths = [os.path.join(repo_path_str, rel_path) for rel_path in rel_paths]
+        for name, definition in stream_ctags(repo_path_str, file_paths, stats):
+            builder.add(name, definition)
+    # Shard tables are only merged, never searched, so they skip the search index
+    builder.write(str(output_path), search_index=False)
+    return stats
+
+def run_ctags(repo_path_str, data_dir="data", jobs=None, shards=DEFAULT_SHARDS, full=False):
+    """
+    Run ctags over the repository and build the symbol table of code definitions.
+    
+    The tree is split into shards that are tagged by parallel ctags processes.
+    Each process's JSON output is decoded as it streams in and stored as a
+    compact per-shard symbol table; the shards are then merged into
+    <data_dir>/ctags_index.symbols. No JSON tags file is written, and memory
+    grows only by a few packed integers per tag. A manifest of each file's
+    size and mtime lets later runs re-tag only the shards containing added,
+    modified or deleted files.
+    
+    Args:
+        repo_path_str (str): Path to the repository to index
+        data_dir (str): Directory holding the symbol table, its shards and manifest
+        jobs (int): Number of concurrent ctags processes (default: CPU count)
+        shards (int): Number of shards the tree is split into
+        full (bool): Re-tag every file instead of only changed ones
         
-        # Check the return code
-        if result.returncode != 0:
-            logging.error(f"ctags failed with return code {result.returncode}")
-            logging.error(f"stdout: {result.stdout}")
-            logging.error(f"stderr: {result.stderr}")
-            return False
+    Returns:
+        bool: True if ctags ran successfully, False otherwise
+    """
+    if shutil.which(CTAGS_COMMAND[0]) is None:
+        logging.error(f"{CTAGS_COMMAND[0]} not found; install universal-ctags to generate definitions")
+        return False
+    start_time = time.time()
+    jobs = jobs or os.cpu_count() or 1
+    data_dir = Path(data_dir)
+    shard_dir = data_dir / "ctags_shards"
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    sidecar = Path(symbol_table_path(data_dir / TAGS_FILE_NAME))
+    
+    def shard_path(index):
+        return shard_dir / f"shard-{index:04d}-of-{shards:04d}.symbols"
+    
+    manifest = FileManifest(str(data_dir / "ctags_manifest.db"))
+    try:
+        if full:
+            manifest.clear()
         
-        logging.info(f"ctags successfully generated tags file at {tags_file.absolute()}")
-        return True
+        files_by_shard = [[] for _ in range(shards)]
+        current = {}
+        dirty = set()
+        for rel_path, stat_result in iter_repository_files(repo_path_str):
+            shard = shard_of(rel_path, shards)
+            files_by_shard[shard].append(rel_path)
+            current[rel_path] = stat_result
+            if not manifest.is_unchanged(rel_path, stat_result):
+                dirty.add(shard)
+        deleted = [rel_path for rel_path in manifest.entries if rel_path not in current]
+        dirty.update(shard_of(rel_path, shards) for rel_path in deleted)
+        # Shards missing on disk (first run, or a different shard count) are regenerated too
+        dirty.update(index for index in range(shards) if not shard_path(index).exists())
+        
+        tagged = set()
+        stats = TagParseStats()
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = {
+                index: executor.submit(run_ctags_shard, repo_path_str, files_by_shard[index], shard_path(index))
+                for index in sorted(dirty)
+            }
+            for index, future in futures.items():
+                try:
+                    stats.merge(future.result())
+                except Exception as e:
+                    # The manifest keeps this shard's old state, so the next run retries it
+                    logging.error(f"Error running ctags on shard {index}: {str(e)}")
+                    continue
+                tagged.add(index)
+                for rel_path in files_by_shard[index]:
+                    manifest.update(rel_path, current[rel_path], None)
+        for rel_path in deleted:
+            if shard_of(rel_path, shards) in tagged:
+                manifest.remove(rel_path)
+        if dirty:
+            logging.info(f"ctags parsed {stats.summary()}")
+        
+        if dirty or not sidecar.exists():
+            merge_start = time.time()
+            builder = SymbolTableBuilder()
+            for index in range(shards):
+                if shard_path(index).exists():
+                    builder.add_table(SymbolTable(str(shard_path(index))))
+            builder.write(str(sidecar))
+            logging.info(f"Merged {shards} ctags shards into {sidecar} in {time.time() - merge_start:.2f}s")
+        
+        # A JSON tags file from older versions would be newer than nothing and shadow the table
+        legacy_tags = data_dir / TAGS_FILE_NAME
+        if legacy_tags.exists():
+            legacy_tags.unlink()
+        # Shards left over from a run with a different shard count or an older format
+        for path in shard_dir.glob("shard-*"):
+            if not path.name.endswith(f"-of-{shards:04d}.symbols"):
+                path.unlink()
+        
+        retagged = sum(len(files_by_shard[index]) for index in dirty)
+        logging.info(
+            f"ctags re-tagged {retagged} of {len(current)} files ({len(dirty)}/{shards} shards, "
+            f"{min(jobs, max(1, len(dirty)))} processes) in {time.time() - start_time:.2f}s; "
+            f"symbol table at {sidecar.absolute()}"
+        )
+        return tagged == dirty
     
     except Exception as e:
         logging.error(f"Error running ctags: {str(e)}")
         return False
+    finally:
+        manifest.close()
 
-def parse_ctags_json(tags_file_path="./ctags_index.tags"):
+def run_ctags_for_files(repo_path_str, file_paths):
+    """
+    Run ctags on specific files and return their definitions directly, without a tags file.
+    Used to refresh the in-memory index when individual files change.
+    
+    Args:
+        repo_path_str (str): Path to the repository
+        file_paths (list): Absolute paths of the files to tag
+        
+    Returns:
+        dict: Definitions keyed by symbol name, in the same format as parse_ctags_json
+    """
+    definitions = {}
+    if not file_paths:
+        return definitions
+    
+    stats = TagParseStats()
+    try:
+        for name, definition in stream_ctags(repo_path_str, file_paths, stats):
+            definitions.setdefault(name, []).append(definition)
+        logging.debug(f"ctags parsed {stats.summary()}")
+    except Exception as e:
+        logging.error(f"Error running ctags: {str(e)}")
+    return definitions
+
+def iter_ctags_json(tags_file_path=DEFAULT_TAGS_FILE):
+    """
+    Yield (name, definition) for every tag in a JSON tags file generated by ctags.
+    
+    The file is read as bytes line by line, so memory does not grow with its size.
+    Invalid lines are counted and the first few logged; a summary with the
+    parse throughput is logged once the file is exhausted.
+    
+    Args:
+        tags_file_path (str): Path to the ctags JSON file
+        
+    Yields:
+        tuple: Symbol name and its definition dict (path, line, kind, signature)
+    """
+    stats = TagParseStats()
+    with open(tags_file_path, 'rb') as f:
+        yield from iter_tags(f, stats, PatternLineResolver(), source=str(tags_file_path))
+    logging.info(f"Parsed {tags_file_path}: {stats.summary()}")
+
+def parse_ctags_json(tags_file_path=DEFAULT_TAGS_FILE):
     """
     Parse the JSON tags file generated by ctags into a structured dictionary.
     
@@ -81,91 +493,103 @@ def parse_ctags_json(tags_file_path="./ctags_index.tags"):
     
     # Read and parse the tags file line by line
     try:
-        with open(tags_file, 'r') as f:
-            for line in f:
-                try:
-                    # Parse the JSON line
-                    tag = json.loads(line.strip())
-                    
-                    # Skip if no name
-                    if 'name' not in tag:
-                        continue
-                    
-                    name = tag['name']
-                    
-                    # Extract the relevant fields
-                    # Note: field names might vary depending on ctags version and configuration
-                    path = tag.get('path', '')
-                    
-                    # Try different field names for line number
-                    line_num = tag.get('line', tag.get('lineNumber', tag.get('scopeLine')))
-                    if line_num is None and 'pattern' in tag:
-                        # Extract line number from pattern if available
-                        # This is a fallback and might not always work correctly
-                        pattern = tag['pattern']
-                        if pattern.startswith('/^') and pattern.endswith('$/'):
-                            # Pattern typically looks like '/^    def function_name():$/''
-                            pass  # Would need regex to extract line number, but ctags should provide line number
-                    
-                    kind = tag.get('kind', '')
-                    signature = tag.get('signature', '')
-                    
-                    # Initialize list for this name if not already present
-                    if name not in definitions:
-                        definitions[name] = []
-                    
-                    # Add this definition to the list
-                    definitions[name].append({
-                        "path": path,
-                        "line": line_num,
-                        "kind": kind,
-                        "signature": signature
-                    })
-                    
-                except json.JSONDecodeError:
-                    # Skip lines that aren't valid JSON
-                    continue
-                except Exception as e:
-                    logging.warning(f"Error parsing tag: {str(e)}")
-                    continue
-        
+        for name, definition in iter_ctags_json(tags_file):
+            definitions.setdefault(name, []).append(definition)
         return definitions
     
-    except Exception as e:
+    except OSError as e:
         logging.error(f"Error reading tags file: {str(e)}")
         return definitions
 
+def symbol_table_path(tags_file_path):
+    """Path of the binary symbol table sidecar kept next to a tags file."""
+    return str(Path(tags_file_path).with_suffix('.symbols'))
+
+def build_symbol_table(tags_file_path=DEFAULT_TAGS_FILE, sidecar_path=None):
+    """
+    Convert a JSON tags file into a memory-mappable symbol table sidecar.
+    
+    Args:
+        tags_file_path (str): Path to the ctags JSON file
+        sidecar_path (str): Where to write the table (defaults to the tags path with a .symbols suffix)
+        
+    Returns:
+        str: Path of the written sidecar
+    """
+    sidecar_path = sidecar_path or symbol_table_path(tags_file_path)
+    builder = SymbolTableBuilder()
+    for name, definition in iter_ctags_json(tags_file_path):
+        builder.add(name, definition)
+    builder.write(sidecar_path)
+    return sidecar_path
+
+def load_symbol_index(tags_file_path=DEFAULT_TAGS_FILE):
+    """
+    Load the ctags definitions as a compact SymbolIndex.
+    
+    The binary sidecar is memory-mapped when it is at least as new as the tags file;
+    otherwise it is (re)built from the tags file first.
+    
+    Args:
+        tags_file_path (str): Path to the ctags JSON file
+        
+    Returns:
+        SymbolIndex: Index over the definitions (empty if no tags are available)
+    """
+    tags_file = Path(tags_file_path)
+    sidecar = Path(symbol_table_path(tags_file_path))
+    tags_mtime = tags_file.stat().st_mtime_ns if tags_file.exists() else None
+    sidecar_mtime = sidecar.stat().st_mtime_ns if sidecar.exists() else None
+    
+    if tags_mtime is None and sidecar_mtime is None:
+        logging.warning(f"Tags file {tags_file_path} does not exist")
+        return SymbolIndex()
+    if tags_mtime is not None and (sidecar_mtime is None or sidecar_mtime < tags_mtime):
+        start_time = time.time()
+        build_symbol_table(tags_file_path, str(sidecar))
+        logging.info(f"Built symbol table from {tags_file_path} in {time.time() - start_time:.2f}s")
+    try:
+        return SymbolIndex(SymbolTable(str(sidecar)))
+    except ValueError:
+        if tags_mtime is None:
+            raise
+        # Sidecar written by an older format version
+        build_symbol_table(tags_file_path, str(sidecar))
+        return SymbolIndex(SymbolTable(str(sidecar)))
+
 if __name__ == "__main__":
     # Example usage
     import argparse
     
     parser = argparse.ArgumentParser(description="Generate ctags index for a repository")
     parser.add_argument("repo_path", help="Path to the repository")
+    parser.add_argument("--data-dir", default="data", help="Directory for the tags file, shards and manifest")
+    parser.add_argument("--jobs", type=int, default=0, help="Concurrent ctags processes (0 = CPU count)")
+    parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS, help="Number of shards the tree is split into")
+    parser.add_argument("--full", action="store_true", help="Re-tag every file instead of only changed ones")
     
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
     
     # Run ctags
-    success = run_ctags(args.repo_path)
+    success = run_ctags(args.repo_path, data_dir=args.data_dir, jobs=args.jobs, shards=args.shards, full=args.full)
     
     if success:
-        # Parse the generated tags file
-        definitions = parse_ctags_json()
+        # Load the generated symbol table
+        symbols = load_symbol_index(tags_file_path(args.data_dir))
+        table = symbols.table
         
         # Print some statistics
-        num_symbols = len(definitions)
-        total_definitions = sum(len(defs) for defs in definitions.values())
-        
+        num_symbols = len(table) if table is not None else 0
+        total_definitions = table.tag_count if table is not None else 0
         print(f"Successfully indexed {num_symbols} unique symbols with {total_definitions} total definitions.")
         
         # Optionally print some examples
         print("\nSample of indexed symbols:")
-        count = 0
-        for name, defs in definitions.items():
-            if count >= 5:
-                break
-            print(f"{name}: {len(defs)} definition(s)")
+        for index in range(min(5, num_symbols)):
+            defs = table.definitions_at(index)
+            print(f"{table.names[index]}: {len(defs)} definition(s)")
             for def_info in defs[:2]:  # Show at most 2 definitions per symbol
                 print(f"  - {def_info['path']}:{def_info['line']} ({def_info['kind']})")
-            count += 1
     else:
         print("Failed to run ctags. Make sure ctags is installed and available in your PATH.") 
\ No newline at end of file
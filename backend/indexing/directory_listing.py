@@ -0,0 +1,180 @@
+import os
+import stat
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+
+def _sort_key(name, is_dir):
+    # Directories first, then case-insensitive name (exact name breaks ties)
+    return (not is_dir, name.lower(), name)
+
+
+def encode_cursor(name, is_dir):
+    """Cursor for the page after an item: its sort position, so pages stay consistent if entries change."""
+    return f"{'d' if is_dir else 'f'}/{name}"
+
+
+def decode_cursor(cursor):
+    kind, separator, name = cursor.partition('/')
+    if not separator or kind not in ('d', 'f') or not name:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return _sort_key(name, kind == 'd')
+
+
+class DirectoryListing:
+    """One directory's sorted entries, as parallel lists so pages are bisected slices."""
+
+    def __init__(self, entries):
+        entries.sort(key=lambda entry: _sort_key(entry[0], entry[1]))
+        self.keys = [_sort_key(name, is_dir) for name, is_dir in entries]
+        self.names = [name for name, _ in entries]
+        self.is_dir = [is_dir for _, is_dir in entries]
+
+    def __len__(self):
+        return len(self.names)
+
+
+class DirectoryListings:
+    """
+    Cache of sorted /browse directory listings, each valid until its directory's mtime changes.
+
+    Listings come from os.scandir, whose d_type tells files from directories
+    without a stat per entry. Serving a page then costs one stat of the
+    directory, a slice of the cached list and one stat per file on the page:
+    sizes are not cached, since editing a file in place leaves its directory's
+    mtime unchanged. Child counts of the subdirectories on a page are cached
+    the same way as listings, keyed by each subdirectory's own mtime.
+    """
+
+    def __init__(self, max_entries=128, max_child_counts=8192):
+        self.max_entries = max_entries
+        self.max_child_counts = max_child_counts
+        self._listings = OrderedDict()
+        self._child_counts = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _scan(full_path):
+        entries = []
+        with os.scandir(full_path) as iterator:
+            for entry in iterator:
+                # Skip hidden files (starting with .)
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    # d_type answers this without a stat (except for symlinks and some filesystems)
+                    is_dir = entry.is_dir()
+                except OSError:
+                    # Broken symlinks and entries removed mid-listing
+                    is_dir = False
+                entries.append((entry.name, is_dir))
+        return DirectoryListing(entries)
+
+    def _get(self, cache, key, mtime_ns):
+        with self._lock:
+            entry = cache.get(key)
+            if entry is not None and entry[0] == mtime_ns:
+                cache.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def _put(self, cache, key, mtime_ns, value, max_entries):
+        with self._lock:
+            cache[key] = (mtime_ns, value)
+            cache.move_to_end(key)
+            while len(cache) > max_entries:
+                cache.popitem(last=False)
+
+    def listing(self, full_path, mtime_ns):
+        """The sorted listing of a directory whose current mtime is mtime_ns."""
+        key = str(full_path)
+        listing = self._get(self._listings, key, mtime_ns)
+        if listing is None:
+            listing = self._scan(full_path)
+            self._put(self._listings, key, mtime_ns, listing, self.max_entries)
+        return listing
+
+    def child_count(self, full_path):
+        """Number of visible entries in a directory, or None if it cannot be read."""
+        key = str(full_path)
+        try:
+            mtime_ns = os.stat(full_path).st_mtime_ns
+        except OSError:
+            return None
+        count = self._get(self._child_counts, key, mtime_ns)
+        if count is None:
+            try:
+                with os.scandir(full_path) as iterator:
+                    count = sum(1 for entry in iterator if not entry.name.startswith('.'))
+            except OSError:
+                return None
+            self._put(self._child_counts, key, mtime_ns, count, self.max_child_counts)
+        return count
+
+    @staticmethod
+    def file_size(full_path):
+        """Current size of a file, or None if it is gone or unreadable (e.g. a broken symlink)."""
+        try:
+            return os.stat(full_path).st_size
+        except OSError:
+            return None
+
+    def page(self, full_path, stat_result, cursor=None, limit=500, name_filter=None):
+        """
+        One page of a directory listing.
+
+        Args:
+            full_path (Path): Directory to list
+            stat_result (os.stat_result): Its current stat (the mtime validates the cache)
+            cursor (str): next_cursor of the previous page, or None for the first page
+            limit (int): Maximum number of items
+            name_filter (str): Only names containing this text (case-insensitive)
+
+        Returns:
+            dict: items, total (entries matching the filter) and next_cursor (None on the last page)
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        if not stat.S_ISDIR(stat_result.st_mode):
+            raise NotADirectoryError(str(full_path))
+        listing = self.listing(full_path, stat_result.st_mtime_ns)
+        start = bisect_right(listing.keys, decode_cursor(cursor)) if cursor else 0
+        if name_filter:
+            needle = name_filter.lower()
+            matched = [index for index, key in enumerate(listing.keys) if needle in key[1]]
+            total = len(matched)
+            positions = matched[bisect_left(matched, start):][:limit + 1]
+        else:
+            total = len(listing)
+            positions = range(start, min(len(listing), start + limit + 1))
+        has_more = len(positions) > limit
+        positions = positions[:limit]
+        items = []
+        for index in positions:
+            name = listing.names[index]
+            if listing.is_dir[index]:
+                items.append({"name": name, "is_dir": True, "child_count": self.child_count(os.path.join(full_path, name))})
+            else:
+                items.append({"name": name, "is_dir": False, "size": self.file_size(os.path.join(full_path, name))})
+        next_cursor = None
+        if has_more and items:
+            next_cursor = encode_cursor(items[-1]["name"], items[-1]["is_dir"])
+        return {"items": items, "total": total, "next_cursor": next_cursor}
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "name": "directory_listings",
+            "size": len(self._listings),
+            "max_entries": self.max_entries,
+            "child_counts": len(self._child_counts),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -5,7 +5,10 @@ import os
 from tqdm import tqdm
 import numpy as np
 
-def generate_embeddings(repo_path_str, db_path, model_name='all-MiniLM-L6-v2', chunk_size=500, chunk_overlap=50, batch_size=100):
+from indexing.embedding_cache import EmbeddingCache
+
+def generate_embeddings(repo_path_str, db_path, model_name='all-MiniLM-L6-v2', chunk_size=500, chunk_overlap=50, batch_size=100,
+                        cache_path='data/embedding_cache.db'):
     """
     Generate embeddings for code files in a repository and store them in ChromaDB.
     
@@ -16,6 +19,7 @@ def generate_embeddings(repo_path_str, db_path, model_name='all-MiniLM-L6-v2', c
         chunk_size (int): Size of text chunks in characters
         chunk_overlap (int): Overlap between chunks in characters
         batch_size (int): Number of chunks to process at once
+        cache_path (str): Embedding cache shared with run_indexing.py; None encodes every chunk
     """
     # Convert string paths to Path objects
     repo_path = Path(repo_path_str)
@@ -32,6 +36,14 @@ def generate_embeddings(repo_path_str, db_path, model_name='all-MiniLM-L6-v2', c
     # Load the sentence transformer model
     print(f"Loading model: {model_name}")
     model = SentenceTransformer(model_name)
+    cache = None
+    if cache_path:
+        Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+        cache = EmbeddingCache(cache_path, model_name=model_name)
+    
+    def encode(texts):
+        # Only chunks the cache has not seen are run through the model
+        return cache.encode(model, texts) if cache else model.encode(texts)
     
     # Lists to batch data
     documents = []
@@ -117,7 +129,7 @@ def generate_embeddings(repo_path_str, db_path, model_name='all-MiniLM-L6-v2', c
                 
                 # Process batch if it reaches the batch size
                 if len(documents) >= batch_size:
-                    batch_embeddings = model.encode(documents)
+                    batch_embeddings = encode(documents)
                     collection.add(
                         embeddings=batch_embeddings.tolist(),
                         documents=documents,
@@ -137,7 +149,7 @@ def generate_embeddings(repo_path_str, db_path, model_name='all-MiniLM-L6-v2', c
     # Process any remaining items
     if documents:
         try:
-            batch_embeddings = model.encode(documents)
+            batch_embeddings = encode(documents)
             collection.add(
                 embeddings=batch_embeddings.tolist(),
                 documents=documents,
@@ -148,6 +160,10 @@ def generate_embeddings(repo_path_str, db_path, model_name='all-MiniLM-L6-v2', c
             print(f"Error processing final batch: {e}")
     
     print(f"Embedding generation complete. Database stored at {db_path}")
+    if cache:
+        print(f"Embedding cache: {cache.stats_message()}")
+        cache.prune()
+        cache.close()
     
     # Return collection count for verification
     return collection.count()
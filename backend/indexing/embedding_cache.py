@@ -0,0 +1,135 @@
+import hashlib
+import sqlite3
+import logging
+import time
+
+import numpy as np
+
+# Hashes looked up or touched per SQL statement (below SQLite's variable limit)
+LOOKUP_BATCH = 500
+
+
+def chunk_hash(text):
+    """16-byte content hash of a chunk's text; the cache key together with the model name."""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed cache of chunk embeddings.
+
+    Maps (model name, hash of the chunk text) to the vector the model produced,
+    stored as float32 so a cached vector is exactly what encoding would return.
+    Identical chunks (vendored copies, generated files, license headers) are
+    encoded once, and re-indexing after a branch switch only encodes chunks
+    whose text actually changed. Entries record when they were last used, and
+    prune() drops the least recently used ones beyond a size limit.
+    """
+
+    def __init__(self, db_path="data/embedding_cache.db", model_name="all-MiniLM-L6-v2", max_entries=2_000_000):
+        self.db_path = db_path
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS embeddings (
+            model TEXT,
+            hash BLOB,
+            vector BLOB,
+            last_used INTEGER,
+            PRIMARY KEY (model, hash)
+        ) WITHOUT ROWID''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)")
+        self.conn.commit()
+
+        # Hit-rate statistics; duplicates are misses shared with another chunk of the same batch
+        self.hits = 0
+        self.misses = 0
+        self.duplicates = 0
+
+    def _lookup(self, hashes):
+        found = {}
+        for start in range(0, len(hashes), LOOKUP_BATCH):
+            part = hashes[start:start + LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(part))
+            for key, vector in self.conn.execute(
+                f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                [self.model_name, *part]
+            ):
+                found[key] = vector
+        return found
+
+    def encode(self, model, documents, batch_size=None):
+        """
+        Embed documents, encoding only those not already cached.
+
+        Args:
+            model: SentenceTransformer (anything with encode(texts, batch_size, convert_to_numpy))
+            documents (list): Chunk texts
+            batch_size (int): Batch size for model.encode (default: all misses at once)
+
+        Returns:
+            numpy.ndarray: One float32 row per document, in order
+        """
+        if not documents:
+            return np.zeros((0, 0), dtype=np.float32)
+        hashes = [chunk_hash(document) for document in documents]
+        unique = list(dict.fromkeys(hashes))
+        found = self._lookup(unique)
+        now = int(time.time())
+
+        # Encode each distinct missing text once
+        missing = [key for key in unique if key not in found]
+        if missing:
+            texts = {}
+            for key, document in zip(hashes, documents):
+                texts.setdefault(key, document)
+            vectors = np.asarray(
+                model.encode([texts[key] for key in missing], batch_size=batch_size or len(missing), convert_to_numpy=True),
+                dtype=np.float32
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                ((self.model_name, key, vector.tobytes(), now) for key, vector in zip(missing, vectors))
+            )
+            for key, vector in zip(missing, vectors):
+                found[key] = vector.tobytes()
+        hit_keys = [key for key in unique if key not in missing]
+        if hit_keys:
+            self.conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                ((now, self.model_name, key) for key in hit_keys)
+            )
+        self.conn.commit()
+
+        missing = set(missing)
+        self.hits += sum(1 for key in hashes if key not in missing)
+        self.misses += len(missing)
+        self.duplicates += sum(1 for key in hashes if key in missing) - len(missing)
+        return np.stack([np.frombuffer(found[key], dtype=np.float32) for key in hashes])
+
+    def prune(self):
+        """Drop the least recently used entries beyond max_entries; returns the number removed."""
+        count = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+        self.conn.execute(
+            "DELETE FROM embeddings WHERE (model, hash) IN "
+            "(SELECT model, hash FROM embeddings ORDER BY last_used LIMIT ?)", (excess,)
+        )
+        self.conn.commit()
+        logging.info(f"Embedding cache pruned {excess} least recently used entries")
+        return excess
+
+    def hit_rate(self):
+        total = self.hits + self.misses + self.duplicates
+        return (self.hits + self.duplicates) / total if total else 0.0
+
+    def stats_message(self):
+        return (
+            f"embedding cache {self.hit_rate():.1%} hit rate "
+            f"({self.hits} cached, {self.duplicates} duplicate, {self.misses} encoded)"
+        )
+
+    def close(self):
+        self.conn.close()
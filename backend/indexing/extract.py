@@ -0,0 +1,244 @@
+"""
+Per-file extraction used by the indexer: file selection, chunking and regex
+definition finding. Kept free of model and database state so it can run in
+worker processes.
+"""
+
+import re
+from pathlib import Path
+
+from indexing.manifest import read_file_for_indexing
+
+# File extensions to index
+CODE_EXTENSIONS = [
+    '.py', '.js', '.jsx', '.ts', '.tsx', '.java', '.c', '.cpp', '.h', 
+    '.hpp', '.cs', '.go', '.rs', '.php', '.rb', '.swift', '.kt', '.sh',
+    '.html', '.css', '.scss', '.sql', '.md', '.json', '.xml', '.yaml', '.yml'
+]
+
+def should_index_file(file_path):
+    """Determine if a file should be indexed based on extension and path."""
+    # Skip hidden files and directories
+    if any(part.startswith('.') for part in Path(file_path).parts):
+        return False
+        
+    # Skip node_modules, venv, etc.
+    excluded_dirs = ['node_modules', 'venv', 'env', 'dist', 'build', '__pycache__']
+    if any(excluded in Path(file_path).parts for excluded in excluded_dirs):
+        return False
+        
+    # Check file extension
+    extension = Path(file_path).suffix.lower()
+    return extension in CODE_EXTENSIONS
+
+# Largest chunk, in characters; definitions longer than this are split into line-aligned windows
+MAX_CHUNK_SIZE = 1000
+# Trailing lines (up to this many characters) repeated at the start of the next window of a split definition
+CHUNK_OVERLAP = 100
+
+# Lines that belong with the definition below them (decorators, annotations, doc comments)
+_LEADING_LINE = re.compile(r'\s*(@|#|//|/\*|\*|"""|\'\'\'|--)')
+
+def definition_boundaries(lines, definitions):
+    """
+    Lines (0-based) at which chunks should start: the first line, each definition,
+    moved up over the decorators and comments directly above it.
+    """
+    boundaries = {0}
+    for definition in definitions:
+        line = definition['line_number'] - 1
+        while line > 0 and _LEADING_LINE.match(lines[line - 1]):
+            line -= 1
+        if 0 <= line < len(lines):
+            boundaries.add(line)
+    return sorted(boundaries)
+
+def _window_lines(lines, first, last, max_chunk_size, overlap):
+    """
+    Split lines [first, last) into windows of at most max_chunk_size characters.
+
+    Windows end after a blank line where one falls in their second half, and
+    repeat up to overlap characters of whole lines from the previous window.
+    A single line longer than max_chunk_size becomes a window of its own.
+    """
+    windows = []
+    start = first
+    while start < last:
+        end = start
+        size = 0
+        blank = None
+        while end < last and (end == start or size + len(lines[end]) <= max_chunk_size):
+            size += len(lines[end])
+            end += 1
+            if not lines[end - 1].strip() and size >= max_chunk_size // 2:
+                blank = end
+        if end < last and blank is not None:
+            end = blank
+        windows.append((start, end))
+        if end >= last:
+            break
+        # Step back over whole trailing lines for overlap, always making progress
+        next_start = end
+        carried = 0
+        while next_start - 1 > start and carried + len(lines[next_start - 1]) <= overlap:
+            next_start -= 1
+            carried += len(lines[next_start])
+        start = next_start
+    return windows
+
+def chunk_file(content, definitions=(), max_chunk_size=MAX_CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """
+    Split file content into chunks aligned to definitions and lines.
+
+    Chunks start at definition boundaries (from find_definitions); adjacent
+    definitions are merged while they fit in max_chunk_size, and longer ones,
+    like files without known definitions, are split into line-aligned windows.
+
+    Args:
+        content (str): File content
+        definitions (list): Definitions with 1-based 'line_number' keys
+
+    Returns:
+        list: (start_char, end_char, start_line, end_line, text) tuples with
+              exact character offsets and 1-based inclusive line numbers
+    """
+    if not content.strip():
+        return []
+    # Split on \n only (splitlines also breaks on form feeds and the like, unlike editors)
+    lines = [line + '\n' for line in content.split('\n')]
+    lines[-1] = lines[-1][:-1]
+    if not lines[-1]:
+        lines.pop()
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+
+    boundaries = definition_boundaries(lines, definitions) + [len(lines)]
+    spans = []
+    section_start = 0
+    for previous, boundary in zip(boundaries, boundaries[1:]):
+        # Extend the current run of sections while it fits; otherwise flush it
+        if offsets[boundary] - offsets[section_start] <= max_chunk_size:
+            continue
+        if offsets[boundary] - offsets[previous] > max_chunk_size:
+            # An oversized section is windowed, together with a short run before it
+            if offsets[previous] - offsets[section_start] > max_chunk_size // 2:
+                spans.append((section_start, previous))
+                section_start = previous
+            windows = _window_lines(lines, section_start, boundary, max_chunk_size, overlap)
+            # Its last window stays open, so the small sections that follow can join it
+            spans.extend(windows[:-1])
+            section_start = windows[-1][0]
+        else:
+            spans.append((section_start, previous))
+            section_start = previous
+    if section_start < len(lines):
+        spans.append((section_start, len(lines)))
+
+    chunks = []
+    for first, last in spans:
+        text = content[offsets[first]:offsets[last]]
+        if text.strip():
+            chunks.append((offsets[first], offsets[last], first + 1, last, text))
+    return chunks
+
+def find_definitions(file_path, content):
+    """Find function and class definitions in the file."""
+    extension = Path(file_path).suffix.lower()
+    definitions = []
+    
+    if extension == '.py':
+        # Simple regex-based approach for Python
+        # Match function and class definitions
+        patterns = [
+            r'def\s+([a-zA-Z0-9_]+)\s*\(', 
+            r'class\s+([a-zA-Z0-9_]+)\s*[:\(]'
+        ]
+        
+        lines = content.split('\n')
+        for i, line in enumerate(lines):
+            for pattern in patterns:
+                matches = re.finditer(pattern, line)
+                for match in matches:
+                    name = match.group(1)
+                    definitions.append({
+                        'name': name,
+                        'file_path': file_path,
+                        'line_number': i + 1,
+                        'type': 'function' if 'def ' in match.group(0) else 'class'
+                    })
+    
+    elif extension in ['.js', '.jsx', '.ts', '.tsx']:
+        # Simple regex for JavaScript/TypeScript
+        patterns = [
+            r'function\s+([a-zA-Z0-9_]+)\s*\(', 
+            r'class\s+([a-zA-Z0-9_]+)\s*[{\s]',
+            r'const\s+([a-zA-Z0-9_]+)\s*=\s*(?:async\s*)?\([^)]*\)\s*=>'
+        ]
+        
+        lines = content.split('\n')
+        for i, line in enumerate(lines):
+            for pattern in patterns:
+                matches = re.finditer(pattern, line)
+                for match in matches:
+                    name = match.group(1)
+                    def_type = 'class' if 'class ' in match.group(0) else 'function'
+                    definitions.append({
+                        'name': name,
+                        'file_path': file_path,
+                        'line_number': i + 1,
+                        'type': def_type
+                    })
+    
+    return definitions
+
+def chunk_records(rel_path, chunks):
+    """
+    Build the IDs, documents and metadata stored in the collection for a file's chunks.
+
+    Args:
+        rel_path (str): Path relative to the repository root
+        chunks (list): (start_char, end_char, start_line, end_line, text) tuples from process_file
+
+    Returns:
+        tuple: (ids, documents, metadatas) lists
+    """
+    ids = [f"{rel_path}_{start_char}_{end_char}" for start_char, end_char, _, _, _ in chunks]
+    documents = [chunk for _, _, _, _, chunk in chunks]
+    metadatas = [
+        {
+            "file_path": rel_path,
+            "start_char": start_char,
+            "end_char": end_char,
+            "start_line": start_line,
+            "end_line": end_line,
+        }
+        for start_char, end_char, start_line, end_line, _ in chunks
+    ]
+    return ids, documents, metadatas
+
+def process_file(full_path, rel_path, previous_hash=None):
+    """
+    Read one file and prepare everything the writer stage needs.
+
+    Args:
+        full_path (str): Absolute path to the file
+        rel_path (str): Path relative to the repository root, used in IDs and rows
+        previous_hash (str): Content hash from the manifest, if the file was indexed before
+
+    Returns:
+        tuple: (status, content_hash, chunks, definitions) where status is
+               'touched' if the content hash is unchanged, 'changed' otherwise,
+               or 'error' with the error message in place of the hash;
+               chunks is a list of (start_char, end_char, start_line, end_line, text)
+    """
+    try:
+        content_hash, content = read_file_for_indexing(full_path)
+        if previous_hash is not None and previous_hash == content_hash:
+            return ('touched', content_hash, None, None)
+        file_definitions = find_definitions(rel_path, content)
+        chunks = chunk_file(content, file_definitions)
+        return ('changed', content_hash, chunks, file_definitions)
+    except Exception as e:
+        # Errors are reported back rather than raised so one bad file can't stop a worker pool
+        return ('error', str(e), None, None)
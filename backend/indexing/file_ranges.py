@@ -0,0 +1,164 @@
+"""
+Ranged, memory-mapped reads of repository files for /browse, plus HTTP validators.
+
+A request for a line or byte range maps the file and copies out only that
+slice, so even huge generated files cost no more than the part being viewed.
+Line ranges are located through an index of line start offsets, built once
+per file version and kept in an LRU cache.
+"""
+import mmap
+from email.utils import formatdate, parsedate_to_datetime
+
+import numpy as np
+
+# Leading bytes checked for NULs to tell binary files from text
+BINARY_SNIFF_BYTES = 8192
+# Newlines are located this many bytes at a time, bounding the temporary mask
+LINE_INDEX_BLOCK = 16 * 1024 * 1024
+
+
+def file_etag(stat_result):
+    """Strong ETag for a file version: inode, size and mtime (ns), so any rewrite changes it."""
+    return f'"{stat_result.st_ino:x}-{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+def validator_headers(stat_result):
+    """ETag and Last-Modified headers; no-cache makes browsers revalidate instead of guessing freshness."""
+    return {
+        "ETag": file_etag(stat_result),
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+
+
+def is_not_modified(stat_result, if_none_match=None, if_modified_since=None):
+    """
+    Whether a conditional GET can be answered with 304 Not Modified.
+
+    If-None-Match takes precedence over If-Modified-Since, as HTTP requires;
+    weak comparison is used, so W/ prefixes added by proxies still match.
+    """
+    if if_none_match is not None:
+        etag = file_etag(stat_result)
+        return any(
+            tag == "*" or tag.removeprefix("W/") == etag
+            for tag in (tag.strip() for tag in if_none_match.split(","))
+        )
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have one-second resolution
+        return int(stat_result.st_mtime) <= since
+    return False
+
+
+class LineIndex:
+    """
+    Byte offset at which each line of one file version starts.
+
+    Offsets are a numpy array (4 bytes per line for files under 4 GB), so
+    locating any line range is two array lookups.
+    """
+
+    def __init__(self, starts, size):
+        self.starts = starts
+        self.size = size
+
+    @classmethod
+    def build(cls, mapped, size):
+        dtype = np.uint32 if size < 2 ** 32 else np.uint64
+        parts = [np.zeros(1, dtype=dtype)]
+        for block_start in range(0, size, LINE_INDEX_BLOCK):
+            block = np.frombuffer(mapped, dtype=np.uint8, count=min(LINE_INDEX_BLOCK, size - block_start), offset=block_start)
+            parts.append((np.flatnonzero(block == 0x0A) + (block_start + 1)).astype(dtype))
+            # Release the view so the mapping can be closed
+            del block
+        starts = np.concatenate(parts)
+        if size == 0:
+            starts = starts[:0]
+        elif starts[-1] == size:
+            # A trailing newline ends the last line rather than starting a new one
+            starts = starts[:-1]
+        return cls(starts, size)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def span(self, first_line, last_line):
+        """Byte span (start, end) of an inclusive, 1-based line range already clamped to the file."""
+        start = int(self.starts[first_line - 1])
+        end = int(self.starts[last_line]) if last_line < len(self.starts) else self.size
+        return start, end
+
+    def line_of(self, offset):
+        """1-based line containing a byte offset."""
+        return int(np.searchsorted(self.starts, offset, side='right'))
+
+
+def _line_index(path, stat_result, mapped, cache):
+    key = (str(path), stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+    index = cache.get(key) if cache is not None else None
+    if index is None:
+        index = LineIndex.build(mapped, len(mapped))
+        if cache is not None:
+            cache.put(key, index)
+    return index
+
+
+def read_file_range(path, stat_result, start_line=None, end_line=None, offset=None, length=None,
+                    max_bytes=1024 * 1024, line_index_cache=None):
+    """
+    Read part of a file through a memory map.
+
+    Either a 1-based inclusive line range (start_line/end_line) or a byte range
+    (offset/length) can be requested; with neither, the file is read from the
+    start. At most max_bytes are returned: line reads stop at the last whole
+    line that fits and set truncated, so callers can page with the next start_line.
+
+    Returns:
+        dict: content plus size, the byte span and (for line reads) the line span
+              actually returned, total_lines when known, and truncated/binary flags
+    """
+    size = stat_result.st_size
+    result = {"size": size, "binary": False, "truncated": False}
+    if size == 0:
+        result.update(content="", offset=0, end_offset=0, start_line=1, end_line=0, total_lines=0)
+        return result
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if b"\0" in mapped[:BINARY_SNIFF_BYTES]:
+            result.update(binary=True, content="This appears to be a binary file and cannot be displayed.")
+            return result
+        # The file may have changed since it was stat'ed; trust the mapping
+        size = len(mapped)
+        if offset is not None or length is not None:
+            start = min(max(offset or 0, 0), size)
+            end = size if length is None else min(size, start + max(length, 0))
+            if end - start > max_bytes:
+                end = start + max_bytes
+                result["truncated"] = True
+        elif start_line is not None or end_line is not None or size > max_bytes:
+            lines = _line_index(path, stat_result, mapped, line_index_cache)
+            first = min(max(start_line or 1, 1), len(lines) + 1)
+            last = max(first - 1, min(len(lines), end_line) if end_line is not None else len(lines))
+            if last >= first:
+                start, end = lines.span(first, last)
+            else:
+                start = end = int(lines.starts[first - 1]) if first <= len(lines) else size
+            if end - start > max_bytes:
+                # Keep whole lines; a single line longer than the limit is cut instead
+                last = max(first, lines.line_of(start + max_bytes) - 1)
+                start, end = lines.span(first, last)
+                end = min(end, start + max_bytes)
+                result["truncated"] = True
+            result.update(start_line=first, end_line=last, total_lines=len(lines))
+        else:
+            start, end = 0, size
+        content = mapped[start:end].decode('utf-8', errors='replace')
+    if "total_lines" not in result and start == 0 and end == size:
+        # Whole file read without the line index
+        total_lines = content.count("\n") + (not content.endswith("\n"))
+        result.update(start_line=1, end_line=total_lines, total_lines=total_lines)
+    result.update(content=content, offset=start, end_offset=end, size=size)
+    return result
@@ -0,0 +1,76 @@
+import re
+import threading
+
+from indexing.concurrency import iterate_in_executor
+
+
+class GeminiBackend:
+    """Answers prompts with a google.generativeai GenerativeModel."""
+
+    name = "gemini"
+
+    def __init__(self, model):
+        self.model = model
+
+    def generate(self, prompt):
+        return self.model.generate_content(prompt).text
+
+    def stream(self, prompt, cancelled):
+        """
+        Yield the answer text chunk by chunk as Gemini produces it.
+
+        Stops reading as soon as cancelled is set; abandoning the response
+        closes the underlying HTTP stream, which ends generation upstream.
+        """
+        response = self.model.generate_content(prompt, stream=True)
+        for chunk in response:
+            if cancelled.is_set():
+                return
+            text = chunk.text
+            if text:
+                yield text
+
+
+class FakeLLMBackend:
+    """
+    Local stand-in for Gemini that needs no API key or network access.
+
+    Streams a fixed answer word by word with a delay between words, so
+    streaming, cancellation and load behaviour can be exercised in tests.
+    """
+
+    name = "fake"
+
+    def __init__(self, answer=None, delay=0.05):
+        self.answer = answer
+        self.delay = delay
+        self.started = 0
+        self.completed = 0
+        self.cancelled = 0
+
+    def generate(self, prompt):
+        return "".join(self.stream(prompt, threading.Event()))
+
+    def stream(self, prompt, cancelled):
+        answer = self.answer or f"This is a fake answer to a prompt of {len(prompt)} characters."
+        self.started += 1
+        for word in re.findall(r'\S+\s*', answer):
+            if cancelled.wait(self.delay):
+                self.cancelled += 1
+                return
+            yield word
+        self.completed += 1
+
+
+async def stream_in_executor(executor, backend, prompt, cancelled):
+    """
+    Run backend.stream on an executor thread and yield its chunks on the event loop.
+
+    Setting cancelled (or closing this generator, e.g. when the client goes
+    away) tells the backend to stop at its next chunk.
+    """
+    try:
+        async for text in iterate_in_executor(executor, lambda: backend.stream(prompt, cancelled), cancelled):
+            yield text
+    finally:
+        cancelled.set()
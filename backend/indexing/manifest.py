@@ -0,0 +1,123 @@
+import hashlib
+import os
+import sqlite3
+import logging
+
+
+def hash_content(data):
+    """
+    Compute a stable content hash for a file's raw bytes.
+
+    Args:
+        data (bytes): The raw file content
+
+    Returns:
+        str: Hex digest identifying the content
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class FileManifest:
+    """
+    Per-file manifest of what was last indexed, stored in SQLite.
+
+    Each row records the relative path, size, modification time (ns) and
+    content hash of a file at the time its chunks and definitions were written.
+    Comparing the current tree against the manifest tells the indexer which
+    files were added, modified or deleted since the previous run.
+    """
+
+    def __init__(self, db_path="data/manifest.db"):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime_ns INTEGER,
+            content_hash TEXT
+        )''')
+        self.conn.commit()
+        # Load the whole manifest up front; lookups happen once per file in the walk
+        self.entries = {
+            row[0]: (row[1], row[2], row[3])
+            for row in self.conn.execute("SELECT path, size, mtime_ns, content_hash FROM files")
+        }
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, rel_path):
+        """Return (size, mtime_ns, content_hash) for a path, or None if unknown."""
+        return self.entries.get(rel_path)
+
+    def is_unchanged(self, rel_path, stat_result):
+        """
+        Cheap check based on size and mtime only, so unchanged files are never read.
+
+        Args:
+            rel_path (str): Path relative to the repository root
+            stat_result (os.stat_result): Current stat of the file
+
+        Returns:
+            bool: True if size and mtime match the manifest entry
+        """
+        entry = self.entries.get(rel_path)
+        if entry is None:
+            return False
+        return entry[0] == stat_result.st_size and entry[1] == stat_result.st_mtime_ns
+
+    def update(self, rel_path, stat_result, content_hash):
+        """Record the current state of a file after it has been indexed."""
+        self.entries[rel_path] = (stat_result.st_size, stat_result.st_mtime_ns, content_hash)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+            (rel_path, stat_result.st_size, stat_result.st_mtime_ns, content_hash)
+        )
+
+    def remove(self, rel_path):
+        """Forget a file that no longer exists in the repository."""
+        self.entries.pop(rel_path, None)
+        self.conn.execute("DELETE FROM files WHERE path = ?", (rel_path,))
+
+    def clear(self):
+        """Drop every entry, forcing the next run to re-index the whole tree."""
+        self.entries = {}
+        self.conn.execute("DELETE FROM files")
+        self.conn.commit()
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def read_file_for_indexing(full_path):
+    """
+    Read a file once, returning both its content hash and decoded text.
+
+    Newlines are normalized the same way text-mode open() would, so chunk
+    boundaries match what the indexer produced before the manifest existed.
+
+    Args:
+        full_path (str): Absolute path to the file
+
+    Returns:
+        tuple: (content_hash, content) where content is a str
+    """
+    with open(full_path, 'rb') as f:
+        data = f.read()
+    content = data.decode('utf-8', errors='ignore')
+    if '\r' in content:
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return hash_content(data), content
+
+
+def stat_file(full_path):
+    """Stat a file, returning None if it disappeared between the walk and the stat."""
+    try:
+        return os.stat(full_path)
+    except OSError as e:
+        logging.warning(f"Could not stat {full_path}: {str(e)}")
+        return None
@@ -0,0 +1,345 @@
+import os
+import re
+import threading
+import logging
+from bisect import bisect_left, bisect_right
+from array import array
+
+from indexing.trigram_index import SKIP_DIRS, MAX_FILE_SIZE, is_searchable_path
+
+
+def _subsequence_pattern(query):
+    """Pattern matching a line of the joined paths that contains the query characters in order."""
+    # Anchored at the line start, each negated-class gap stops at the next character's first
+    # occurrence, so a line is accepted or rejected in one pass without backtracking
+    gaps = ''.join(f"[^\\n{re.escape(char)}]*{re.escape(char)}" for char in query)
+    return re.compile('^' + gaps, re.MULTILINE)
+
+
+def _subsequence_span(text, query, start=0):
+    """
+    Length of a tight window of text[start:] holding the query characters in order, or None.
+
+    Each character is found at its first occurrence, then the window's start is
+    moved back to the last occurrence that still fits before the end.
+    """
+    position = start - 1
+    for char in query:
+        position = text.find(char, position + 1)
+        if position == -1:
+            return None
+    end = position
+    for char in reversed(query[:-1]):
+        position = text.rfind(char, start, position)
+    return end - position + 1
+
+
+class PathIndex:
+    """
+    In-memory index of every searchable file path in the repository.
+
+    Paths are kept sorted, so all files under a directory form a contiguous
+    range, and their lowercased forms are joined into one newline-separated
+    string that substring and fuzzy lookups scan with str.find / re at C speed.
+    Extensions and file-name offsets are pre-split per path.
+
+    The directory tree is remembered together with each directory's mtime;
+    refresh() only re-lists directories whose mtime changed, so keeping the
+    index current costs one stat per directory rather than a full walk.
+    """
+
+    # Fuzzy matches examined per search; bounds latency for loose queries on large trees
+    FUZZY_CANDIDATES = 300
+
+    def __init__(self, repo_path):
+        self.repo_path = repo_path
+        # rel_dir -> (mtime_ns, [file names], [subdirectory names])
+        self.dirs = {}
+        self.ready = False
+        self.version = 0
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    # ------------------------------------------------------------------
+    # Building and refreshing
+    # ------------------------------------------------------------------
+
+    def build(self):
+        """Walk the whole repository and build the index from scratch."""
+        with self._lock:
+            self.dirs = {}
+            self._scan_tree('')
+            self._rebuild_snapshot()
+            self.ready = True
+        logging.info(f"Path index built with {len(self._snapshot['paths'])} files in {len(self.dirs)} directories")
+
+    def refresh(self):
+        """
+        Bring the index up to date by re-listing only directories whose mtime changed.
+
+        Returns:
+            bool: True if any path was added or removed
+        """
+        with self._lock:
+            changed = False
+            for rel_dir in sorted(self.dirs):
+                if rel_dir not in self.dirs:
+                    continue  # Removed along with a parent earlier in this refresh
+                mtime_ns = self.dirs[rel_dir][0]
+                try:
+                    current = os.stat(self._full_path(rel_dir)).st_mtime_ns
+                except OSError:
+                    self._remove_tree(rel_dir)
+                    changed = True
+                    continue
+                if current != mtime_ns:
+                    self._rescan_dir(rel_dir)
+                    changed = True
+            if changed:
+                self._rebuild_snapshot()
+            return changed
+
+    def update_paths(self, added=(), removed=()):
+        """
+        Apply known file additions and removals without touching the filesystem
+        for unrelated directories (used by the file watcher).
+
+        Args:
+            added (iterable): Relative paths of files that were created
+            removed (iterable): Relative paths of files that were deleted
+        """
+        with self._lock:
+            changed = False
+            for rel_path in removed:
+                rel_dir, _, name = rel_path.rpartition('/')
+                entry = self.dirs.get(rel_dir)
+                if entry and name in entry[1]:
+                    entry[1].remove(name)
+                    changed = True
+            for rel_path in added:
+                rel_dir, _, name = rel_path.rpartition('/')
+                if not is_searchable_path(rel_path):
+                    continue
+                entry = self.dirs.get(rel_dir)
+                if entry is None:
+                    # New directory: scan it (and any missing parents) from the deepest known ancestor
+                    ancestor = rel_dir
+                    while ancestor and ancestor not in self.dirs:
+                        ancestor = ancestor.rpartition('/')[0]
+                    self._rescan_dir(ancestor)
+                    changed = True
+                elif name not in entry[1]:
+                    entry[1].append(name)
+                    changed = True
+            if changed:
+                self._rebuild_snapshot()
+
+    def _full_path(self, rel_dir):
+        return os.path.join(self.repo_path, rel_dir) if rel_dir else self.repo_path
+
+    def _list_dir(self, rel_dir):
+        """List one directory with the same skip rules as GET /search."""
+        full_dir = self._full_path(rel_dir)
+        files = []
+        subdirs = []
+        mtime_ns = os.stat(full_dir).st_mtime_ns
+        with os.scandir(full_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    if entry.is_dir():
+                        # Like os.walk, don't descend into symlinked directories
+                        if entry.name not in SKIP_DIRS and not entry.is_symlink():
+                            subdirs.append(entry.name)
+                    elif entry.is_file() and entry.stat().st_size <= MAX_FILE_SIZE:
+                        files.append(entry.name)
+                except OSError:
+                    continue
+        return mtime_ns, files, subdirs
+
+    def _scan_tree(self, rel_dir):
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            try:
+                entry = self._list_dir(current)
+            except OSError as e:
+                logging.warning(f"Path index could not list {current or '.'}: {str(e)}")
+                continue
+            self.dirs[current] = entry
+            stack.extend(f"{current}/{name}" if current else name for name in entry[2])
+
+    def _rescan_dir(self, rel_dir):
+        previous = self.dirs.get(rel_dir)
+        try:
+            entry = self._list_dir(rel_dir)
+        except OSError:
+            self._remove_tree(rel_dir)
+            return
+        self.dirs[rel_dir] = entry
+        old_subdirs = set(previous[2]) if previous else set()
+        new_subdirs = set(entry[2])
+        for name in old_subdirs - new_subdirs:
+            self._remove_tree(f"{rel_dir}/{name}" if rel_dir else name)
+        for name in new_subdirs - old_subdirs:
+            self._scan_tree(f"{rel_dir}/{name}" if rel_dir else name)
+
+    def _remove_tree(self, rel_dir):
+        prefix = rel_dir + '/' if rel_dir else ''
+        for key in [key for key in self.dirs if key == rel_dir or key.startswith(prefix)]:
+            del self.dirs[key]
+
+    def _rebuild_snapshot(self):
+        """Build the immutable search structures; readers only ever see a complete snapshot."""
+        # Sorted by lowercased path so the lowered list can be bisected for directory ranges
+        paths = sorted(
+            (
+                f"{rel_dir}/{name}" if rel_dir else name
+                for rel_dir, (_, files, _) in self.dirs.items()
+                for name in files
+            ),
+            key=lambda path: (path.lower(), path)
+        )
+        lowered = [path.lower() for path in paths]
+        offsets = array('L')
+        name_starts = array('L')
+        exts = []
+        position = 0
+        for path in lowered:
+            offsets.append(position)
+            slash = path.rfind('/')
+            name_starts.append(slash + 1)
+            dot = path.rfind('.')
+            exts.append(path[dot:] if dot > slash + 1 else '')
+            position += len(path) + 1
+        self._snapshot = {
+            "paths": paths,
+            "lowered": lowered,
+            "blob": '\n'.join(lowered),
+            "offsets": offsets,
+            "name_starts": name_starts,
+            "exts": exts,
+            "dirs": frozenset(self.dirs),
+        }
+        self.version += 1
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self._snapshot["paths"]) if self._snapshot else 0
+
+    def has_dir(self, rel_dir):
+        """Whether a directory (relative, '/'-separated) is part of the index."""
+        return self._snapshot is not None and rel_dir.strip('/') in self._snapshot["dirs"]
+
+    def search(self, query, extensions=None, directory=None, limit=100, fuzzy=True):
+        """
+        Find files whose path matches the query, best matches first.
+
+        Substring matches are ranked by where they hit: exact file name, file
+        name prefix, file name substring, path prefix, then anywhere in the path.
+        If fewer than limit files match as a substring and fuzzy is set, files
+        whose path contains the query characters in order (Ctrl-P style) follow,
+        ranked by how tightly the characters cluster.
+
+        Args:
+            query (str): Search text (matched case-insensitively)
+            extensions (list): Optional extensions including the dot, e.g. ['.py']
+            directory (str): Optional directory (relative to the repo) to restrict to
+            limit (int): Maximum number of results
+
+        Returns:
+            list: Matching relative paths
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return []
+        query = query.lower()
+        paths = snapshot["paths"]
+        lowered = snapshot["lowered"]
+        offsets = snapshot["offsets"]
+        blob = snapshot["blob"]
+
+        # Directory filter: sorted paths make every directory a contiguous range
+        first, last = 0, len(paths)
+        directory_prefix = None
+        if directory:
+            directory_prefix = directory.strip('/') + '/'
+            first = bisect_left(lowered, directory_prefix.lower())
+            last = bisect_left(lowered, directory_prefix.lower() + '\U0010ffff')
+        if first >= last:
+            return []
+        blob_start = offsets[first]
+        blob_end = offsets[last - 1] + len(lowered[last - 1])
+        extension_set = set(extensions) if extensions else None
+
+        def accepted(index):
+            # The range is found case-insensitively; directory names themselves are case-sensitive
+            if directory_prefix and not paths[index].startswith(directory_prefix):
+                return False
+            return extension_set is None or snapshot["exts"][index] in extension_set
+
+        if not query:
+            return [paths[i] for i in range(first, last) if accepted(i)][:limit]
+
+        # Substring matches via repeated str.find over the joined paths
+        scored = []
+        seen = set()
+        position = blob.find(query, blob_start, blob_end)
+        while position != -1:
+            index = bisect_right(offsets, position) - 1
+            if index not in seen and accepted(index):
+                seen.add(index)
+                scored.append((self._substring_rank(snapshot, index, query), len(paths[index]), paths[index]))
+            # Continue from the next path
+            next_start = offsets[index] + len(lowered[index]) + 1
+            position = blob.find(query, next_start, blob_end) if next_start < blob_end else -1
+        scored.sort()
+        results = [path for _, _, path in scored[:limit]]
+
+        if fuzzy and len(results) < limit and '\n' not in query:
+            results.extend(self._fuzzy(snapshot, query, blob_start, blob_end, seen, accepted, limit - len(results)))
+        return results
+
+    @staticmethod
+    def _substring_rank(snapshot, index, query):
+        path = snapshot["lowered"][index]
+        name = path[snapshot["name_starts"][index]:]
+        if name == query:
+            return 0
+        if name.startswith(query):
+            return 1
+        if query in name:
+            return 2
+        if path.startswith(query):
+            return 3
+        return 4
+
+    def _fuzzy(self, snapshot, query, blob_start, blob_end, seen, accepted, limit):
+        """Subsequence matches scored by span length, preferring hits inside the file name."""
+        pattern = _subsequence_pattern(query)
+        offsets = snapshot["offsets"]
+        lowered = snapshot["lowered"]
+        paths = snapshot["paths"]
+        blob = snapshot["blob"]
+        candidates = max(limit, self.FUZZY_CANDIDATES)
+        scored = []
+        position = blob_start
+        while position < blob_end and len(scored) < candidates:
+            match = pattern.search(blob, position, blob_end)
+            if match is None:
+                break
+            index = bisect_right(offsets, match.start()) - 1
+            if index not in seen and accepted(index):
+                path = lowered[index]
+                span = _subsequence_span(path, query, snapshot["name_starts"][index])
+                in_name = span is not None
+                if not in_name:
+                    span = _subsequence_span(path, query)
+                scored.append((0 if in_name else 1, span, len(paths[index]), paths[index]))
+            position = offsets[index] + len(lowered[index]) + 1
+        scored.sort()
+        return [path for _, _, _, path in scored[:limit]]
@@ -0,0 +1,235 @@
+import queue
+import threading
+import time
+import logging
+
+_DONE = object()
+
+
+def prefetch(iterable, max_pending=64):
+    """
+    Run an iterable in a background thread, yielding its items as they are ready.
+
+    Used to overlap file reading and chunking with embedding: the reader keeps
+    up to max_pending items queued while the consumer is busy in model.encode,
+    which releases the GIL during the forward pass.
+
+    Args:
+        iterable: Any iterable; it is consumed entirely on the background thread
+        max_pending (int): Maximum number of items buffered ahead of the consumer
+
+    Yields:
+        The items of the iterable, in order
+    """
+    buffer = queue.Queue(maxsize=max_pending)
+    stop = threading.Event()
+
+    def producer():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                buffer.put(item)
+        except BaseException as e:
+            buffer.put(e)
+        finally:
+            buffer.put(_DONE)
+
+    thread = threading.Thread(target=producer, name="index-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Consumer stopped early (error or interrupt): let the producer exit
+        stop.set()
+        while thread.is_alive():
+            try:
+                buffer.get_nowait()
+            except queue.Empty:
+                thread.join(timeout=0.1)
+
+
+class EmbeddingWriter:
+    """
+    Gathers chunks across files into batches, encodes each batch in a single
+    model.encode call and writes it to the collection with a single bulk add.
+
+    Files are registered together with their chunks; on_file_complete is called
+    for a file once all of its chunks have been written successfully, so callers
+    only record a file as indexed after its embeddings are durable. When a
+    vector_store is given, every batch is written to it as well. With an
+    EmbeddingCache, only chunks whose text it has not seen are encoded.
+    """
+
+    def __init__(self, model, collection, batch_size=256, on_file_complete=None, vector_store=None, cache=None):
+        self.model = model
+        self.collection = collection
+        self.vector_store = vector_store
+        self.cache = cache
+        self.batch_size = batch_size
+        self.on_file_complete = on_file_complete
+
+        # Current batch
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self.owners = []
+
+        # Outstanding chunk count per file and files with a failed batch
+        self.remaining = {}
+        self.failed = set()
+
+        # Throughput statistics
+        self.chunks_written = 0
+        self.batches_written = 0
+        self.encode_seconds = 0.0
+        self.write_seconds = 0.0
+        self.started_at = time.time()
+
+    def add_file(self, file_key, ids, documents, metadatas):
+        """
+        Queue all chunks of one file, flushing whenever a full batch is ready.
+
+        Args:
+            file_key: Identifier handed back to on_file_complete (usually the relative path)
+            ids (list): Chunk IDs
+            documents (list): Chunk texts
+            metadatas (list): Chunk metadata dicts
+        """
+        if not ids:
+            self._complete(file_key)
+            return
+        self.remaining[file_key] = self.remaining.get(file_key, 0) + len(ids)
+        for chunk_id, document, metadata in zip(ids, documents, metadatas):
+            self.ids.append(chunk_id)
+            self.documents.append(document)
+            self.metadatas.append(metadata)
+            self.owners.append(file_key)
+            if len(self.ids) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        """Encode and write the current batch, if any."""
+        if not self.ids:
+            return
+        ids, documents, metadatas, owners = self.ids, self.documents, self.metadatas, self.owners
+        self.ids, self.documents, self.metadatas, self.owners = [], [], [], []
+
+        try:
+            encode_start = time.time()
+            if self.cache is not None:
+                embeddings = self.cache.encode(self.model, documents, batch_size=len(documents))
+            else:
+                embeddings = self.model.encode(documents, batch_size=len(documents), convert_to_numpy=True)
+            write_start = time.time()
+            self.collection.add(
+                ids=ids,
+                embeddings=embeddings.tolist(),
+                documents=documents,
+                metadatas=metadatas
+            )
+            if self.vector_store is not None:
+                self.vector_store.add(ids, embeddings, documents, metadatas)
+            self.encode_seconds += write_start - encode_start
+            self.write_seconds += time.time() - write_start
+            self.chunks_written += len(ids)
+            self.batches_written += 1
+        except Exception as e:
+            logging.error(f"Error writing batch of {len(ids)} chunks: {str(e)}")
+            self.failed.update(owners)
+
+        for owner in owners:
+            self.remaining[owner] -= 1
+            if self.remaining[owner] == 0:
+                del self.remaining[owner]
+                self._complete(owner)
+
+    def close(self):
+        """Flush the final partial batch."""
+        self.flush()
+
+    def _complete(self, file_key):
+        if file_key in self.failed:
+            self.failed.discard(file_key)
+            return
+        if self.on_file_complete:
+            self.on_file_complete(file_key)
+
+    def chunks_per_second(self):
+        elapsed = time.time() - self.started_at
+        return self.chunks_written / elapsed if elapsed > 0 else 0.0
+
+    def stats_message(self):
+        message = (
+            f"{self.chunks_written} chunks in {self.batches_written} batches, "
+            f"{self.chunks_per_second():.1f} chunks/sec "
+            f"(encode {self.encode_seconds:.1f}s, write {self.write_seconds:.1f}s)"
+        )
+        if self.cache is not None:
+            message += f"; {self.cache.stats_message()}"
+        return message
+
+
+def ordered_map(executor, fn, items, max_in_flight=64):
+    """
+    Map fn over items on an executor, yielding results in input order.
+
+    Unlike Executor.map, at most max_in_flight calls are outstanding at once,
+    so a slow consumer applies backpressure instead of letting every result
+    pile up in memory. Items may be (args, None) pairs for work to submit, or
+    (None, result) pairs that are already resolved and only need to keep
+    their place in the ordering.
+
+    Args:
+        executor: A concurrent.futures executor, or None to run fn inline
+        fn: Callable taking the unpacked args tuple
+        items: Iterable of (args, ready_result) pairs
+        max_in_flight (int): Maximum number of submitted but unconsumed calls
+
+    Yields:
+        (args, ready_result, result) for each item, in input order; result is
+        None for items that were already resolved
+    """
+    window = []
+    head = 0
+    in_flight = 0
+    try:
+        for args, ready in items:
+            if args is None:
+                window.append((args, ready, None))
+            elif executor is None:
+                window.append((args, ready, fn(*args)))
+            else:
+                window.append((args, ready, executor.submit(fn, *args)))
+                in_flight += 1
+            # Yield everything at the front that is resolved, waiting only when the window is full
+            while head < len(window):
+                entry_args, entry_ready, pending = window[head]
+                is_future = executor is not None and entry_args is not None
+                if is_future and in_flight <= max_in_flight and not pending.done():
+                    break
+                if is_future:
+                    pending = pending.result()
+                    in_flight -= 1
+                window[head] = None
+                head += 1
+                yield entry_args, entry_ready, pending
+            if head > 1024:
+                window = window[head:]
+                head = 0
+        for entry_args, entry_ready, pending in window[head:]:
+            if executor is not None and entry_args is not None:
+                pending = pending.result()
+            yield entry_args, entry_ready, pending
+    finally:
+        # The consumer stopped early (a result limit, a cancelled request): drop queued work
+        if executor is not None:
+            for entry in window[head:]:
+                if entry is not None and entry[0] is not None:
+                    entry[2].cancel()
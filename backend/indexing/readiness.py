@@ -0,0 +1,70 @@
+import time
+import threading
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class Readiness:
+    """
+    Tracks the warm-up state of server components loaded in the background.
+
+    Each component moves from pending to loading to ready (or failed) and can
+    report progress while loading; endpoints consult it to degrade gracefully
+    instead of blocking until everything is up.
+    """
+
+    def __init__(self, names):
+        self._lock = threading.Lock()
+        self.components = {
+            name: {"state": PENDING, "progress": None, "detail": None, "seconds": None}
+            for name in names
+        }
+        self._started_at = {}
+
+    def start(self, name):
+        with self._lock:
+            self._started_at[name] = time.monotonic()
+            self.components[name].update(state=LOADING, progress=None, detail=None, seconds=None)
+
+    def progress(self, name, progress, detail=None):
+        """Record loading progress (a count of items done, or a fraction) and an optional note."""
+        with self._lock:
+            self.components[name]["progress"] = progress
+            if detail is not None:
+                self.components[name]["detail"] = detail
+
+    def ready(self, name, detail=None):
+        self._finish(name, READY, detail)
+
+    def failed(self, name, error):
+        self._finish(name, FAILED, str(error))
+
+    def _finish(self, name, state, detail):
+        with self._lock:
+            component = self.components[name]
+            component["state"] = state
+            if detail is not None:
+                component["detail"] = detail
+            started_at = self._started_at.get(name)
+            if started_at is not None:
+                component["seconds"] = round(time.monotonic() - started_at, 3)
+
+    def state(self, name):
+        return self.components[name]["state"]
+
+    def is_ready(self, name):
+        return self.state(name) == READY
+
+    def is_loading(self, name):
+        return self.state(name) in (PENDING, LOADING)
+
+    def all_settled(self):
+        """Whether every component has finished loading, successfully or not."""
+        return not any(self.is_loading(name) for name in self.components)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(component) for name, component in self.components.items()}
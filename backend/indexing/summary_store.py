@@ -0,0 +1,63 @@
+import sqlite3
+
+
+class SummaryStore:
+    """
+    On-disk cache of per-file codebase summary fragments, stored in SQLite.
+
+    Each row holds a file's summary section together with the size,
+    modification time (ns) and content hash of the file it was built from.
+    A fragment is reused as-is when size and mtime match, or when the file
+    was only touched and its content hash still matches, so a restart only
+    re-summarizes files that actually changed.
+    """
+
+    def __init__(self, db_path="data/summaries.db"):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS fragments (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime_ns INTEGER,
+            content_hash TEXT,
+            fragment TEXT
+        )''')
+        self.conn.commit()
+        self.entries = {
+            row[0]: (row[1], row[2], row[3], row[4])
+            for row in self.conn.execute("SELECT path, size, mtime_ns, content_hash, fragment FROM fragments")
+        }
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, rel_path):
+        """Return (size, mtime_ns, content_hash, fragment) for a path, or None if unknown."""
+        return self.entries.get(rel_path)
+
+    def put(self, rel_path, stat_result, content_hash, fragment):
+        entry = (stat_result.st_size, stat_result.st_mtime_ns, content_hash, fragment)
+        if self.entries.get(rel_path) == entry:
+            return
+        self.entries[rel_path] = entry
+        self.conn.execute(
+            "INSERT OR REPLACE INTO fragments (path, size, mtime_ns, content_hash, fragment) VALUES (?, ?, ?, ?, ?)",
+            (rel_path, *entry)
+        )
+
+    def remove(self, rel_path):
+        if self.entries.pop(rel_path, None) is not None:
+            self.conn.execute("DELETE FROM fragments WHERE path = ?", (rel_path,))
+
+    def retain(self, rel_paths):
+        """Drop fragments of every file not in rel_paths (files deleted since the last run)."""
+        keep = set(rel_paths)
+        for rel_path in [path for path in self.entries if path not in keep]:
+            self.remove(rel_path)
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
@@ -0,0 +1,849 @@
+import os
+import re
+import sys
+import mmap
+import struct
+import logging
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+import numpy as np
+
+MAGIC = b"CNSYMTB2"
+
+# Sections of the sidecar file, in order, with their element types
+SECTIONS = (
+    ("name_offsets", "<u8"),
+    ("name_blob", "u1"),
+    ("tag_start", "<u4"),
+    ("tag_line", "<u4"),
+    ("tag_kind", "<u2"),
+    ("tag_path", "<u4"),
+    ("tag_signature", "<u4"),
+    ("path_offsets", "<u8"),
+    ("path_blob", "u1"),
+    ("kind_offsets", "<u8"),
+    ("kind_blob", "u1"),
+    ("signature_offsets", "<u8"),
+    ("signature_blob", "u1"),
+    ("search_order", "<u4"),
+    ("search_offsets", "<u8"),
+    ("search_blob", "u1"),
+    ("word_suffixes", "<u8"),
+    ("initials_order", "<u4"),
+    ("initials_offsets", "<u8"),
+    ("initials_blob", "u1"),
+)
+HEADER = struct.Struct("<8sQ" + "QQ" * len(SECTIONS))
+# memoryview format codes for the column types, used for fast scalar access
+_FORMATS = {"<u8": "Q", "<u4": "I", "<u2": "H", "u1": "B"}
+
+# Lowercases ASCII letters only, matching bytes.lower() on the sidecar's search blob
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+_WORD_START = re.compile(
+    r'(?<![^\W_])[^\W_]'                      # first letter or digit after punctuation or at the start
+    r'|(?<=[a-z])[A-Z]'                       # camelCase hump
+    r'|(?<=[A-Z])[A-Z](?=[a-z])'              # last capital of an acronym: HTTP|Server
+    r'|(?<=[^\W\d_])\d|(?<=\d)[^\W\d_]'       # letters to digits and back
+)
+
+
+def ascii_lower(text):
+    return text.translate(_ASCII_LOWER)
+
+
+def word_starts(name):
+    """
+    Positions in a symbol name where a word starts: after '_' or other
+    punctuation, at camelCase humps ('getUser' -> 'User'), at the last capital
+    of an acronym run ('HTTPServer' -> 'Server') and where digits begin or end.
+    """
+    return {match.start() for match in _WORD_START.finditer(name)}
+
+
+def _is_subsequence(query, text, start):
+    position = start
+    for char in query:
+        position = text.find(char, position)
+        if position == -1:
+            return False
+        position += 1
+    return True
+
+
+def _fuzzy_rank(name, lowered, query):
+    """
+    Align query characters to the name in order, preferring word starts so that
+    'gun' matches getUserName at G, U and N. Returns (misses, span) where misses
+    counts characters that are neither at a word start nor right after the
+    previous match, or None if query is not a subsequence of the name.
+    """
+    if not _is_subsequence(query, lowered, 0):
+        return None
+    starts = word_starts(name)
+    positions = []
+    position = 0
+    for index, char in enumerate(query):
+        earliest = lowered.find(char, position)
+        chosen = earliest
+        if earliest not in starts and (not positions or earliest != positions[-1] + 1):
+            for candidate in sorted(start for start in starts if start > earliest and lowered[start] == char):
+                if _is_subsequence(query[index + 1:], lowered, candidate + 1):
+                    chosen = candidate
+                    break
+        positions.append(chosen)
+        position = chosen + 1
+    misses = sum(
+        1 for index, position in enumerate(positions)
+        if position not in starts and (index == 0 or position != positions[index - 1] + 1)
+    )
+    return misses, positions[-1] - positions[0] + 1
+
+
+def _subsequence_pattern(lowered_query):
+    """Bytes pattern matching a line that contains the query characters in order."""
+    parts = [re.escape(lowered_query[0].encode('utf-8'))]
+    for char in lowered_query[1:]:
+        data = char.encode('utf-8')
+        # A negated class skips ahead without backtracking; it only works for single bytes
+        gap = b'[^\n' + re.escape(data) + b']*' if len(data) == 1 else b'[^\n]*?'
+        parts.append(gap + re.escape(data))
+    return re.compile(b''.join(parts))
+
+
+def match_rank(name, query, lowered_query=None):
+    """
+    Rank how well a symbol name matches a search query; lower sorts first.
+
+    Tiers: exact, case-insensitive exact, prefix, substring at a word start,
+    acronym of the words ('gun' for getUserName), substring elsewhere, then
+    fuzzy (query characters in order, starting with the first character of
+    the name) scored by how many characters land on word starts and how
+    tightly they cluster.
+
+    Returns:
+        tuple: Sort key, or None if the name does not match at all
+    """
+    if lowered_query is None:
+        lowered_query = ascii_lower(query)
+    lowered = ascii_lower(name)
+    if name == query:
+        return (0, 0, len(name))
+    if lowered == lowered_query:
+        return (1, 0, len(name))
+    if lowered.startswith(lowered_query):
+        return (2, 0, len(name))
+    starts = word_starts(name)
+    position = lowered.find(lowered_query)
+    hit = position
+    while hit != -1 and hit not in starts:
+        hit = lowered.find(lowered_query, hit + 1)
+    if hit != -1:
+        return (3, hit, len(name))
+    initials = ascii_lower(''.join(name[start] for start in sorted(starts)))
+    if initials.startswith(lowered_query):
+        return (4, len(initials), len(name))
+    if position != -1:
+        return (5, position, len(name))
+    if lowered[:1] != lowered_query[:1]:
+        return None
+    fuzzy = _fuzzy_rank(name, lowered, lowered_query)
+    if fuzzy is None:
+        return None
+    return (6, fuzzy[0], fuzzy[1], len(name))
+
+
+class StringTable:
+    """Strings stored back to back in one UTF-8 blob, addressed by an offsets array."""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw(self, index):
+        return bytes(self.blob[self.offsets[index]:self.offsets[index + 1]])
+
+    def __getitem__(self, index):
+        return self.raw(index).decode('utf-8')
+
+
+def _pack_strings(strings):
+    """Encode strings into (offsets, blob) arrays for a StringTable."""
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+    if encoded:
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype='u1')
+
+
+class SymbolTableBuilder:
+    """
+    Accumulates ctags definitions into compact columns and writes the sidecar file.
+
+    Paths, kinds and signatures are interned into string tables, and every tag
+    is five integers in typed arrays, so even millions of tags cost a few bytes
+    each rather than a dict per tag.
+    """
+
+    def __init__(self):
+        self._names = {}
+        self._paths = {}
+        self._kinds = {}
+        self._signatures = {"": 0}
+        self.tag_name = array('I')
+        self.tag_line = array('I')
+        self.tag_kind = array('H')
+        self.tag_path = array('I')
+        self.tag_signature = array('I')
+
+    def __len__(self):
+        return len(self.tag_name)
+
+    @staticmethod
+    def _intern(table, value):
+        index = table.get(value)
+        if index is None:
+            index = table[value] = len(table)
+        return index
+
+    def add(self, name, definition):
+        """Add one definition dict (as produced by tag_to_definition) under a symbol name."""
+        line = definition.get("line")
+        try:
+            line = int(line) if line is not None else 0
+        except (TypeError, ValueError):
+            line = 0
+        kind = self._intern(self._kinds, definition.get("kind") or "")
+        if kind > 0xFFFF:
+            raise ValueError("Too many distinct ctags kinds")
+        self.tag_name.append(self._intern(self._names, name))
+        self.tag_line.append(line)
+        self.tag_kind.append(kind)
+        self.tag_path.append(self._intern(self._paths, definition.get("path") or ""))
+        self.tag_signature.append(self._intern(self._signatures, definition.get("signature") or ""))
+
+    def add_table(self, table):
+        """
+        Append every tag of another SymbolTable (such as one ctags shard), re-interning its strings.
+
+        Columns are remapped with numpy rather than tag by tag, so merging costs
+        one Python step per distinct string instead of per tag.
+        """
+        def remap(strings, interned):
+            return np.array([self._intern(interned, strings[index]) for index in range(len(strings))], dtype=np.int64)
+
+        def extend(target, values):
+            target.frombytes(np.ascontiguousarray(values, dtype=np.dtype(target.typecode)).tobytes())
+
+        if not table.tag_count:
+            return
+        name_ids = remap(table.names, self._names)
+        kind_ids = remap(table.kinds, self._kinds)
+        if len(self._kinds) > 0x10000:
+            raise ValueError("Too many distinct ctags kinds")
+        path_ids = remap(table.paths, self._paths)
+        signature_ids = remap(table.signatures, self._signatures)
+        extend(self.tag_name, np.repeat(name_ids, np.diff(np.asarray(table.tag_start, dtype=np.int64))))
+        extend(self.tag_line, np.asarray(table.tag_line))
+        extend(self.tag_kind, kind_ids[np.asarray(table.tag_kind)])
+        extend(self.tag_path, path_ids[np.asarray(table.tag_path)])
+        extend(self.tag_signature, signature_ids[np.asarray(table.tag_signature)])
+
+    def write(self, sidecar_path, search_index=True):
+        """
+        Write the table to sidecar_path atomically (via a temporary file and rename).
+
+        With search_index=False the name search sections are left empty; that is
+        enough for intermediate tables that are only read back by add_table.
+        """
+        # Names sorted by UTF-8 bytes so lookups can bisect the raw blob without decoding
+        names = sorted(self._names, key=lambda name: name.encode('utf-8'))
+        rank = np.empty(len(names), dtype=np.int64)
+        for position, name in enumerate(names):
+            rank[self._names[name]] = position
+        tag_rank = rank[np.frombuffer(self.tag_name, dtype=np.uint32)] if len(self.tag_name) else np.zeros(0, np.int64)
+        # Stable, so each symbol keeps its definitions in the order ctags reported them
+        order = np.argsort(tag_rank, kind='stable')
+        tag_start = np.zeros(len(names) + 1, dtype='<u4')
+        np.cumsum(np.bincount(tag_rank, minlength=len(names)), out=tag_start[1:])
+
+        name_offsets, name_blob = _pack_strings(names)
+        path_offsets, path_blob = _pack_strings(self._paths)
+        kind_offsets, kind_blob = _pack_strings(self._kinds)
+        signature_offsets, signature_blob = _pack_strings(self._signatures)
+
+        if not search_index:
+            search_order, search_offsets, search_blob = [], np.zeros(1, dtype='<u8'), b""
+            word_suffixes, initials_order = np.zeros(0, dtype='<u8'), np.zeros(0, dtype='<u4')
+            initials_offsets, initials_blob = _pack_strings([])
+        else:
+            # Search index: ASCII-lowercased names joined by newlines, sorted case-insensitively,
+            # so prefixes are contiguous ranges and substring/fuzzy scans run over one buffer.
+            # ASCII lowercasing keeps every entry the same byte length as its name.
+            encoded = [name.encode('utf-8') for name in names]
+            search_order = sorted(range(len(names)), key=lambda index: (encoded[index].lower(), encoded[index]))
+            search_offsets = np.zeros(len(names) + 1, dtype='<u8')
+            if names:
+                np.cumsum([len(encoded[index]) + 1 for index in search_order], out=search_offsets[1:])
+            search_blob = b"".join(encoded[index].lower() + b"\n" for index in search_order)
+            # Word suffixes: blob offsets of every inner word start ('user_name' -> 'name',
+            # 'getUserName' -> 'username' and 'name'), sorted by the lowercased text that
+            # follows, so word-start matches are prefix ranges too
+            # Initials: the first letter of every word ('getUserName' -> 'gun'), sorted, for acronym matches
+            suffixes = []
+            initials = []
+            for position, index in enumerate(search_order):
+                name = names[index]
+                start = int(search_offsets[position])
+                end = int(search_offsets[position + 1])
+                starts = sorted(word_starts(name))
+                for char_position in starts:
+                    if char_position:
+                        offset = start + (char_position if name.isascii() else len(name[:char_position].encode('utf-8')))
+                        suffixes.append((search_blob[offset:end], offset))
+                initials.append((ascii_lower(''.join(name[char_position] for char_position in starts)), position))
+            suffixes.sort()
+            word_suffixes = np.array([offset for _, offset in suffixes], dtype='<u8')
+            del suffixes
+            initials.sort(key=lambda entry: (entry[0].encode('utf-8'), entry[1]))
+            initials_offsets, initials_blob = _pack_strings(text for text, _ in initials)
+            initials_order = np.array([position for _, position in initials], dtype='<u4')
+            del initials
+
+        def column(values, dtype):
+            return np.frombuffer(values, dtype=np.dtype(values.typecode)).astype(dtype)[order]
+
+        sections = {
+            "name_offsets": name_offsets,
+            "name_blob": name_blob,
+            "tag_start": tag_start,
+            "tag_line": column(self.tag_line, '<u4'),
+            "tag_kind": column(self.tag_kind, '<u2'),
+            "tag_path": column(self.tag_path, '<u4'),
+            "tag_signature": column(self.tag_signature, '<u4'),
+            "path_offsets": path_offsets,
+            "path_blob": path_blob,
+            "kind_offsets": kind_offsets,
+            "kind_blob": kind_blob,
+            "signature_offsets": signature_offsets,
+            "signature_blob": signature_blob,
+            "search_order": np.array(search_order, dtype='<u4'),
+            "search_offsets": search_offsets,
+            "search_blob": np.frombuffer(search_blob, dtype='u1'),
+            "word_suffixes": word_suffixes,
+            "initials_order": initials_order,
+            "initials_offsets": initials_offsets,
+            "initials_blob": initials_blob,
+        }
+
+        temp_path = f"{sidecar_path}.tmp"
+        layout = []
+        with open(temp_path, 'wb') as f:
+            f.write(b"\0" * HEADER.size)
+            for name, dtype in SECTIONS:
+                data = np.ascontiguousarray(sections[name], dtype=dtype)
+                # 8-byte alignment so every column can be viewed in place
+                f.write(b"\0" * (-f.tell() % 8))
+                layout.extend((f.tell(), len(data)))
+                f.write(data.tobytes())
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, len(SECTIONS), *layout))
+        os.replace(temp_path, sidecar_path)
+        # Intermediate (shard) tables are written many at a time; only report final tables
+        log = logging.info if search_index else logging.debug
+        log(f"Wrote symbol table with {len(names)} symbols and {len(self.tag_name)} tags to {sidecar_path}")
+
+
+class SymbolTable:
+    """
+    Read-only symbol table memory-mapped from a sidecar file.
+
+    Columns are views straight onto the mapping, so loading costs no parsing
+    and pages are shared between every process that maps the file.
+    Lookups bisect the sorted names and build the definition dicts on demand.
+    """
+
+    def __init__(self, sidecar_path):
+        self.path = sidecar_path
+        with open(sidecar_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < HEADER.size:
+            self._mmap.close()
+            raise ValueError(f"{sidecar_path} is not a symbol table sidecar")
+        magic, section_count, *layout = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or section_count != len(SECTIONS):
+            self._mmap.close()
+            raise ValueError(f"{sidecar_path} is not a symbol table sidecar")
+        columns = {}
+        view = memoryview(self._mmap)
+        for index, (name, dtype) in enumerate(SECTIONS):
+            offset, count = layout[2 * index], layout[2 * index + 1]
+            if sys.byteorder == 'little' or dtype == 'u1':
+                # Indexing a memoryview yields plain ints, much faster than numpy scalars;
+                # np.asarray() still gives a zero-copy array for vectorized scans
+                item_size = np.dtype(dtype).itemsize
+                columns[name] = view[offset:offset + count * item_size].cast(_FORMATS[dtype])
+            else:
+                columns[name] = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=offset)
+        self.names = StringTable(columns["name_offsets"], columns["name_blob"])
+        self.paths = StringTable(columns["path_offsets"], columns["path_blob"])
+        self.kinds = StringTable(columns["kind_offsets"], columns["kind_blob"])
+        self.signatures = StringTable(columns["signature_offsets"], columns["signature_blob"])
+        self.tag_start = columns["tag_start"]
+        self.tag_line = columns["tag_line"]
+        self.tag_kind = columns["tag_kind"]
+        self.tag_path = columns["tag_path"]
+        self.tag_signature = columns["tag_signature"]
+        self.search_order = columns["search_order"]
+        self.search_offsets = columns["search_offsets"]
+        self.search_blob = columns["search_blob"]
+        self.word_suffixes = columns["word_suffixes"]
+        self.initials = StringTable(columns["initials_offsets"], columns["initials_blob"])
+        self.initials_order = columns["initials_order"]
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def tag_count(self):
+        return len(self.tag_line)
+
+    def find(self, name):
+        """Index of a symbol name in the sorted names table, or -1."""
+        key = name.encode('utf-8')
+        low, high = 0, len(self.names)
+        while low < high:
+            middle = (low + high) // 2
+            if self.names.raw(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.names) and self.names.raw(low) == key:
+            return low
+        return -1
+
+    def definition(self, tag):
+        """Definition dict of one tag."""
+        line = int(self.tag_line[tag])
+        return {
+            "path": self.paths[self.tag_path[tag]],
+            "line": line if line else None,
+            "kind": self.kinds[self.tag_kind[tag]],
+            "signature": self.signatures[self.tag_signature[tag]]
+        }
+
+    def tags_of(self, index):
+        """Tag indices of the symbol at a names-table index, in ctags order."""
+        return range(int(self.tag_start[index]), int(self.tag_start[index + 1]))
+
+    def definitions_at(self, index):
+        """Definition dicts for the symbol at a names-table index, in ctags order."""
+        return [self.definition(tag) for tag in self.tags_of(index)]
+
+    def lookup(self, name):
+        index = self.find(name)
+        return self.definitions_at(index) if index >= 0 else []
+
+    # ------------------------------------------------------------------
+    # Name search over the lowercased search blob
+    # ------------------------------------------------------------------
+
+    def _search_entry(self, position):
+        start = self.search_offsets[position]
+        return bytes(self.search_blob[start:self.search_offsets[position + 1] - 1])
+
+    def _search_lower_bound(self, key):
+        low, high = 0, len(self.names)
+        while low < high:
+            middle = (low + high) // 2
+            if self._search_entry(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def prefix_range(self, key):
+        """Range of search positions whose lowercased name starts with key (ASCII-lowercased UTF-8 bytes)."""
+        # No UTF-8 sequence contains 0xff, so key + 0xff bounds everything prefixed by key
+        return self._search_lower_bound(key), self._search_lower_bound(key + b"\xff")
+
+    def filter_mask(self, kinds=None, path=None):
+        """
+        Boolean array over search positions: whether the name has at least one
+        definition of one of the kinds and with path containing the given text.
+        """
+        tag_ok = np.ones(self.tag_count, dtype=bool)
+        if kinds:
+            kind_ids = [index for index in range(len(self.kinds)) if self.kinds[index] in kinds]
+            tag_ok &= np.isin(np.asarray(self.tag_kind), kind_ids)
+        if path:
+            # Find the text in the path blob and map each hit back to its path
+            path_offsets = np.asarray(self.paths.offsets)
+            needle = re.compile(re.escape(path.encode('utf-8')))
+            hits = [match.start() for match in needle.finditer(self.paths.blob)]
+            path_ids = np.searchsorted(path_offsets, np.array(hits, dtype=np.uint64), side='right') - 1
+            # A hit spanning two paths is not a match
+            path_ids = path_ids[np.asarray(hits, dtype=np.uint64) + len(path.encode('utf-8')) <= path_offsets[path_ids + 1]]
+            tag_ok &= np.isin(np.asarray(self.tag_path), path_ids)
+        if not len(self.names):
+            return np.zeros(0, dtype=bool)
+        # Every symbol has at least one tag, so reduceat sees no empty ranges
+        name_ok = np.logical_or.reduceat(tag_ok, np.asarray(self.tag_start[:-1], dtype=np.int64))
+        return name_ok[np.asarray(self.search_order)]
+
+    @staticmethod
+    def _smallest(keys, limit):
+        """Positions of the limit smallest keys, in key order (ties by position)."""
+        if len(keys) > limit:
+            # Partition rather than sort a potentially huge range
+            chosen = np.argpartition(keys, limit - 1)[:limit]
+            return chosen[np.lexsort((chosen, keys[chosen]))]
+        return np.argsort(keys, kind='stable')
+
+    def prefix_matches(self, key, limit, mask=None):
+        """
+        Names-table indices of up to limit names starting with key, shortest first,
+        optionally only among the search positions set in mask (see filter_mask).
+        """
+        first, last = self.prefix_range(key)
+        if first >= last:
+            return []
+        positions = np.arange(first, last)
+        if mask is not None:
+            positions = positions[mask[first:last]]
+        offsets = np.asarray(self.search_offsets)
+        lengths = offsets[positions + 1] - offsets[positions]
+        return [int(self.search_order[int(positions[chosen])]) for chosen in self._smallest(lengths, limit)]
+
+    def word_start_matches(self, key, limit, mask=None):
+        """
+        Names-table indices of up to limit names with an inner word (camelCase hump or
+        snake_case part) starting with key; earliest word, then shortest name, first.
+        """
+        suffixes = self.word_suffixes
+        blob = self.search_blob
+        size = len(key)
+
+        def bound(inclusive):
+            # Comparing only len(key) bytes keeps the order monotone: a shorter suffix
+            # runs into its newline, which sorts below any identifier character
+            low, high = 0, len(suffixes)
+            while low < high:
+                middle = (low + high) // 2
+                start = suffixes[middle]
+                text = bytes(blob[start:start + size])
+                if text < key or (inclusive and text == key):
+                    low = middle + 1
+                else:
+                    high = middle
+            return low
+
+        first, last = bound(False), bound(True)
+        if first >= last:
+            return []
+        offsets = np.asarray(self.search_offsets)
+        hits = np.asarray(suffixes[first:last])
+        entries = np.searchsorted(offsets, hits, side='right') - 1
+        if mask is not None:
+            keep = mask[entries]
+            hits, entries = hits[keep], entries[keep]
+        positions = (hits - offsets[entries]).astype(np.int64)
+        lengths = (offsets[entries + 1] - offsets[entries]).astype(np.int64)
+        keys = (positions << 20) | np.minimum(lengths, (1 << 20) - 1)
+        matches = []
+        seen = set()
+        for chosen in self._smallest(keys, limit):
+            index = int(self.search_order[int(entries[chosen])])
+            if index not in seen:
+                seen.add(index)
+                matches.append(index)
+        return matches
+
+    def acronym_matches(self, key, limit, mask=None):
+        """
+        Names-table indices of up to limit names whose word initials start with key
+        ('gun' finds getUserName and get_user_node), fewest words, then shortest name, first.
+        """
+        initials = self.initials
+        low, high = 0, len(initials)
+        while low < high:
+            middle = (low + high) // 2
+            if initials.raw(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        first, high = low, len(initials)
+        while low < high:
+            middle = (low + high) // 2
+            if initials.raw(middle)[:len(key)] == key:
+                low = middle + 1
+            else:
+                high = middle
+        last = low
+        if first >= last:
+            return []
+        positions = np.asarray(self.initials_order[first:last], dtype=np.int64)
+        initial_counts = np.diff(np.asarray(initials.offsets[first:last + 1])).astype(np.int64)
+        if mask is not None:
+            keep = mask[positions]
+            positions, initial_counts = positions[keep], initial_counts[keep]
+        offsets = np.asarray(self.search_offsets)
+        lengths = (offsets[positions + 1] - offsets[positions]).astype(np.int64)
+        keys = (initial_counts << 20) | np.minimum(lengths, (1 << 20) - 1)
+        return [int(self.search_order[int(positions[chosen])]) for chosen in self._smallest(keys, limit)]
+
+    def masked_blob(self, mask):
+        """
+        The search blob of just the names set in mask, as (blob, offsets, positions)
+        where positions maps each entry back to its search position. Scanning this
+        instead of the whole blob pays off when a filter keeps few names.
+        """
+        positions = np.flatnonzero(mask)
+        offsets = self.search_offsets
+        blob = self.search_blob
+        data = b"".join(blob[offsets[position]:offsets[position + 1]] for position in positions.tolist())
+        lengths = np.diff(np.asarray(offsets))[positions]
+        masked_offsets = array('Q', [0]) * (len(positions) + 1)
+        if len(positions):
+            masked_offsets[1:] = array('Q', np.cumsum(lengths).astype(np.uint64).tobytes())
+        return data, memoryview(masked_offsets), positions
+
+    def pattern_matches(self, pattern, limit, skip=(), first=0, last=None, mask=None, masked=None):
+        """
+        Names-table indices of up to limit names the compiled bytes pattern matches
+        (within a single name), in case-insensitive name order, optionally only over
+        the search positions first..last and those set in mask. With masked (the
+        result of masked_blob(mask)) the scan runs over the filtered blob instead.
+        Indices in skip are passed over without counting toward limit.
+        """
+        last = len(self.names) if last is None else last
+        if masked is not None:
+            blob, offsets, positions = masked
+            first, last = (int(bound) for bound in np.searchsorted(positions, (first, last)))
+            mask = None
+        else:
+            blob, offsets, positions = self.search_blob, self.search_offsets, None
+        matches = []
+        previous = -1
+        for match in pattern.finditer(blob, offsets[first], offsets[last]):
+            entry = bisect_right(offsets, match.start()) - 1
+            if entry == previous:
+                continue
+            previous = entry
+            if positions is not None:
+                entry = int(positions[entry])
+            elif mask is not None and not mask[entry]:
+                continue
+            index = int(self.search_order[entry])
+            if index not in skip:
+                matches.append(index)
+                if len(matches) >= limit:
+                    break
+        return matches
+
+
+class SymbolIndex:
+    """
+    The symbol table served by the API: a memory-mapped base table plus an
+    in-memory overlay for files re-tagged since the table was written.
+
+    Definitions from files listed in stale_paths are hidden from the base
+    table; their current definitions live in the overlay. Updates build new
+    overlay structures and swap them in, so readers never see a partial state.
+    """
+
+    # Names examined per search stage; bounds latency for very common queries
+    SEARCH_CANDIDATES = 2000
+    # Fuzzy candidates are ranked in Python, so the fuzzy stage examines fewer
+    FUZZY_CANDIDATES = 300
+    # Filter masks kept for reuse, since typeahead repeats the same filters per keystroke
+    FILTER_MASKS = 8
+
+    def __init__(self, table=None):
+        self.table = table
+        self.stale_paths = frozenset()
+        self.overlay = {}
+        self._filter_masks = OrderedDict()
+
+    def __len__(self):
+        base = len(self.table) if self.table is not None else 0
+        return base + sum(1 for name in self.overlay if self.table is None or self.table.find(name) < 0)
+
+    def lookup(self, name):
+        """All definitions of a symbol, in the same format as parse_ctags_json."""
+        definitions = []
+        if self.table is not None:
+            definitions = self.table.lookup(name)
+            if self.stale_paths:
+                definitions = [d for d in definitions if d["path"] not in self.stale_paths]
+        return definitions + self.overlay.get(name, [])
+
+    def _filter(self, kinds, path):
+        """(mask, masked blob or None) for a kind/path filter, or (None, None) without one."""
+        if not kinds and not path:
+            return None, None
+        key = (kinds, path)
+        entry = self._filter_masks.get(key)
+        if entry is None:
+            mask = self.table.filter_mask(kinds, path)
+            # Selective filters get their own blob to scan; otherwise the mask is checked per hit
+            masked = self.table.masked_blob(mask) if mask.sum() * 4 <= len(mask) else None
+            entry = self._filter_masks[key] = (mask, masked)
+            while len(self._filter_masks) > self.FILTER_MASKS:
+                self._filter_masks.popitem(last=False)
+        return entry
+
+    def search(self, query, limit=20, kinds=None, path=None, fuzzy=True):
+        """
+        Find symbols by name, best matches first (see match_rank for the ordering).
+
+        Matching is case-insensitive and runs in stages: prefix ranges of the
+        sorted names, of their sorted inner words and of their sorted word
+        initials, then a substring scan and finally a fuzzy subsequence scan. A later stage only runs if the
+        earlier ones found fewer than limit symbols, and each stage examines at
+        most SEARCH_CANDIDATES names.
+
+        Args:
+            query (str): Search text
+            limit (int): Maximum number of symbols
+            kinds (iterable): Optional ctags kinds to restrict to, e.g. ['function', 'class']
+            path (str): Optional text the definition's path must contain
+            fuzzy (bool): Whether to fall back to subsequence matches
+
+        Returns:
+            list: One dict per symbol with its name, the path/line/kind/signature of
+                  its first matching definition and the number of matching definitions
+        """
+        query = query.strip()
+        if not query or '\n' in query or limit <= 0:
+            return []
+        lowered_query = ascii_lower(query)
+        key = lowered_query.encode('utf-8')
+        table = self.table
+        stale_paths = self.stale_paths
+        kinds = frozenset(kinds) if kinds else None
+        kind_ids = None
+        if table is not None and kinds is not None:
+            kind_ids = {index for index in range(len(table.kinds)) if table.kinds[index] in kinds}
+        path_allowed = {}
+
+        def base_tags(index):
+            tags = []
+            for tag in table.tags_of(index):
+                if kind_ids is not None and table.tag_kind[tag] not in kind_ids:
+                    continue
+                path_id = table.tag_path[tag]
+                allowed = path_allowed.get(path_id)
+                if allowed is None:
+                    tag_path = table.paths[path_id]
+                    allowed = path_allowed[path_id] = tag_path not in stale_paths and (not path or path in tag_path)
+                if allowed:
+                    tags.append(tag)
+            return tags
+
+        ranked = {}
+        resolved = {}
+
+        def consider(name, index):
+            if name in ranked:
+                return
+            rank = match_rank(name, query, lowered_query)
+            if rank is not None and (fuzzy or rank[0] < 6):
+                ranked[name] = (rank, index)
+
+        def resolve(name, index):
+            tags = []
+            if table is not None:
+                if index is None:
+                    index = table.find(name)
+                if index >= 0:
+                    tags = base_tags(index)
+            overlay = [
+                definition for definition in self.overlay.get(name, ())
+                if (kinds is None or definition["kind"] in kinds) and (not path or path in definition["path"])
+            ]
+            count = len(tags) + len(overlay)
+            if not count:
+                return None
+            first = table.definition(tags[0]) if tags else overlay[0]
+            return {"name": name, **first, "definitions": count}
+
+        def top():
+            results = []
+            for name, (_, index) in sorted(ranked.items(), key=lambda item: (item[1][0], item[0])):
+                if name not in resolved:
+                    resolved[name] = resolve(name, index)
+                if resolved[name] is not None:
+                    results.append(resolved[name])
+                    if len(results) == limit:
+                        break
+            return results
+
+        # The overlay is small; rank all of it against the query up front
+        for name in self.overlay:
+            consider(name, None)
+        if table is None:
+            return top()
+
+        mask, masked = self._filter(kinds, path)
+
+        def run_stage(indices):
+            for index in indices:
+                consider(table.names[index], index)
+            return top()
+
+        def run_ranged_stage(fetch):
+            # Range stages return candidates best first, so fetch a few pages and only
+            # widen when filters reject too many of them
+            size = min(max(limit * 2, 50), self.SEARCH_CANDIDATES)
+            while True:
+                indices = fetch(key, size, mask)
+                results = run_stage(indices)
+                if len(results) >= limit or len(indices) < size or size >= self.SEARCH_CANDIDATES:
+                    return results
+                size = min(size * 4, self.SEARCH_CANDIDATES)
+
+        def seen():
+            return {index for _, index in ranked.values() if index is not None}
+
+        candidates = self.SEARCH_CANDIDATES
+        results = run_ranged_stage(table.prefix_matches)
+        if len(results) < limit:
+            results = run_ranged_stage(table.word_start_matches)
+        if len(results) < limit:
+            results = run_ranged_stage(table.acronym_matches)
+        if len(results) < limit:
+            substring = re.compile(re.escape(key))
+            results = run_stage(table.pattern_matches(substring, candidates, seen(), mask=mask, masked=masked))
+        if len(results) < limit and fuzzy and len(lowered_query) > 1:
+            # Like most symbol pickers, fuzzy matches must start with the query's first
+            # character, which also confines the scan to one range of the sorted names
+            first_char = lowered_query[0].encode('utf-8')
+            first, last = table.prefix_range(first_char)
+            pattern = _subsequence_pattern(lowered_query)
+            results = run_stage(table.pattern_matches(pattern, self.FUZZY_CANDIDATES, seen(), first, last, mask, masked))
+        return results
+
+    def replace_files(self, stale_paths, new_definitions):
+        """
+        Replace the definitions of some files.
+
+        Args:
+            stale_paths (iterable): Paths (as ctags recorded them) whose definitions are outdated
+            new_definitions (dict): Fresh definitions keyed by symbol name
+        """
+        stale_paths = frozenset(stale_paths)
+        overlay = {}
+        for name, definitions in self.overlay.items():
+            kept = [d for d in definitions if d["path"] not in stale_paths]
+            if kept:
+                overlay[name] = kept
+        for name, definitions in new_definitions.items():
+            overlay.setdefault(name, []).extend(definitions)
+        self.stale_paths, self.overlay = self.stale_paths | stale_paths, overlay
+
@@ -0,0 +1,549 @@
+import os
+import sqlite3
+import logging
+import time
+import numpy as np
+
+try:
+    import re._parser as sre_parse
+    from re._constants import LITERAL, SUBPATTERN, BRANCH, MAX_REPEAT, MIN_REPEAT, AT
+except ImportError:  # Python < 3.11
+    import sre_parse
+    from sre_constants import LITERAL, SUBPATTERN, BRANCH, MAX_REPEAT, MIN_REPEAT, AT
+
+# Directories skipped by the code-content search, and therefore never indexed
+SKIP_DIRS = ['node_modules', '__pycache__', 'venv', 'env', '.git', 'build', 'dist']
+
+# Files larger than this are skipped by the search, so they are not indexed either
+MAX_FILE_SIZE = 5 * 1024 * 1024
+
+# Number of buffered postings before a segment is written out during a build
+SEGMENT_POSTINGS = 20_000_000
+
+# Compact once there are more segments than this, or too many tombstoned file ids
+MAX_SEGMENTS = 8
+MAX_DEAD_RATIO = 0.25
+
+# Regex literal extraction keeps at most this many alternative strings per run
+MAX_ALTERNATIVES = 16
+
+
+def extract_trigrams(text):
+    """
+    Compute the sorted set of byte trigrams of the lowercased text.
+
+    Each trigram is packed into a uint32 as (b0 << 16) | (b1 << 8) | b2 over the
+    UTF-8 encoding, so queries and documents are compared the same way no matter
+    which characters they contain.
+
+    Args:
+        text (str): Content to index
+
+    Returns:
+        numpy.ndarray: Unique trigram keys (uint32), sorted
+    """
+    data = np.frombuffer(text.lower().encode('utf-8'), dtype=np.uint8)
+    if len(data) < 3:
+        return np.empty(0, dtype=np.uint32)
+    data = data.astype(np.uint32)
+    keys = (data[:-2] << 16) | (data[1:-1] << 8) | data[2:]
+    return np.unique(keys)
+
+
+def literal_trigrams(literal):
+    """Trigram keys a document must contain to contain the literal (case-insensitive)."""
+    return extract_trigrams(literal)
+
+
+def read_searchable_text(full_path):
+    """
+    Read a file the way GET /search does, returning None for binary files.
+
+    Args:
+        full_path (str): Absolute path to the file
+
+    Returns:
+        str or None: Decoded text with normalized newlines, or None if the file
+                     looks binary (contains a NUL byte in its first 8 KB)
+    """
+    with open(full_path, 'rb') as f:
+        data = f.read()
+    if b'\0' in data[:8192]:
+        return None
+    content = data.decode('utf-8', errors='ignore')
+    if '\r' in content:
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return content
+
+
+def file_trigrams(full_path):
+    """
+    Worker-friendly helper returning the trigram keys of one file.
+
+    Returns:
+        numpy.ndarray or None: Trigram keys (empty for binary files, which are
+                               recorded but never match), or None if unreadable
+    """
+    try:
+        content = read_searchable_text(full_path)
+    except OSError as e:
+        logging.warning(f"Could not read {full_path} for trigram index: {str(e)}")
+        return None
+    if content is None:
+        return np.empty(0, dtype=np.uint32)
+    return extract_trigrams(content)
+
+
+def is_searchable_path(rel_path):
+    """Whether a '/'-separated relative path passes the GET /search skip rules (size aside)."""
+    parts = rel_path.split('/')
+    if any(part.startswith('.') for part in parts):
+        return False
+    return not any(part in SKIP_DIRS for part in parts[:-1])
+
+
+def iter_searchable_files(repo_path, search_dir=None):
+    """
+    Walk the repository applying the same skip rules as GET /search.
+
+    Yields:
+        tuple: (full_path, rel_path, stat_result) for every candidate file
+    """
+    for root, dirs, files in os.walk(search_dir or repo_path):
+        # Skip hidden directories and common directories to ignore
+        dirs[:] = [d for d in dirs if not d.startswith('.') and d not in SKIP_DIRS]
+        for file in files:
+            if file.startswith('.'):
+                continue
+            full_path = os.path.join(root, file)
+            try:
+                stat_result = os.stat(full_path)
+            except OSError:
+                continue
+            if stat_result.st_size > MAX_FILE_SIZE:
+                continue
+            rel_path = os.path.relpath(full_path, repo_path).replace('\\', '/')
+            yield full_path, rel_path, stat_result
+
+
+def regex_literal_groups(pattern):
+    """
+    Derive trigram-friendly literal requirements from a regular expression.
+
+    The result is a conjunction of groups, each group a list of alternative
+    literals: every matching document must contain at least one literal of each
+    group. For example r"(?:!=\\s*null|is\\s+not\\s+null)" yields
+    [["null"]], and r"foo\\s+barbaz" yields [["foo"], ["barbaz"]].
+    Groups whose literals are shorter than three characters are dropped, since
+    they cannot narrow a trigram lookup.
+
+    Args:
+        pattern (str): Regular expression source
+
+    Returns:
+        list: List of groups (lists of lowercase strings); empty if nothing is required
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return []
+    _, groups = _analyze_sequence(list(parsed))
+    return [group for group in groups if all(len(lit) >= 3 for lit in group)]
+
+
+def _analyze_sequence(items):
+    """
+    Returns (exact, groups): exact is a set of strings the whole sequence can
+    match exactly (or None if unknown), groups is the list of required groups.
+    """
+    groups = []
+    run = {''}
+    all_exact = True
+
+    def flush():
+        nonlocal run
+        if run and run != {''}:
+            groups.append(sorted(run))
+        run = {''}
+
+    for op, av in items:
+        child_exact = None
+        if op == LITERAL:
+            child_exact = {chr(av).lower()}
+        elif op == SUBPATTERN:
+            child_exact, child_groups = _analyze_sequence(list(av[-1]))
+            if child_exact is None:
+                groups.extend(child_groups)
+        elif op == BRANCH:
+            child_exact, child_groups = _analyze_branch(av[1])
+            if child_exact is None and child_groups:
+                groups.append(child_groups)
+        elif op in (MAX_REPEAT, MIN_REPEAT):
+            min_count, _, body = av
+            if min_count >= 1:
+                # The body must occur at least once, but repetition breaks the literal run
+                body_exact, body_groups = _analyze_sequence(list(body))
+                groups.extend(body_groups)
+                if body_exact is not None and body_exact != {''}:
+                    groups.append(sorted(body_exact))
+            all_exact = False
+            flush()
+            continue
+        elif op == AT:
+            # Anchors match the empty string and don't break a literal run
+            continue
+
+        if child_exact is None:
+            all_exact = False
+            flush()
+            continue
+        combined = {prefix + suffix for prefix in run for suffix in child_exact}
+        if len(combined) > MAX_ALTERNATIVES:
+            all_exact = False
+            flush()
+            combined = set(child_exact)
+        run = combined
+
+    exact = set(run) if all_exact else None
+    flush()
+    return exact, groups
+
+
+def _analyze_branch(branches):
+    """Analyze an alternation; returns (exact, group) where group is one implied OR-group."""
+    exacts = []
+    implied = []
+    for branch in branches:
+        exact, groups = _analyze_sequence(list(branch))
+        exacts.append(exact)
+        if exact is not None and exact != {''}:
+            implied.append(sorted(exact))
+        elif groups:
+            # Any single group of a branch is implied by that branch; pick the most selective
+            implied.append(max(groups, key=lambda group: min(len(lit) for lit in group)))
+        else:
+            implied.append(None)
+
+    if all(exact is not None for exact in exacts):
+        union = set().union(*exacts)
+        if len(union) <= MAX_ALTERNATIVES:
+            return union, None
+    if any(group is None for group in implied):
+        return None, None
+    merged = sorted({lit for group in implied for lit in group})
+    return None, merged
+
+
+class TrigramIndex:
+    """
+    Persistent trigram inverted index over the files searched by GET /search.
+
+    Stored in SQLite: a files table maps live file ids to paths with the size
+    and mtime they were indexed at, and postings hold, per trigram and segment,
+    a sorted uint32 array of file ids. Builds are incremental: changed files get
+    a new id (the old one becomes a tombstone, filtered out at query time) and
+    their postings go into a new segment. Segments and tombstones are merged
+    away by compact().
+    """
+
+    def __init__(self, db_path="data/trigrams.db"):
+        self.db_path = db_path
+        self.generation = None
+        self.paths = {}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY,
+            path TEXT UNIQUE,
+            size INTEGER,
+            mtime_ns INTEGER
+        )''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS postings (
+            trigram INTEGER,
+            segment INTEGER,
+            file_ids BLOB,
+            PRIMARY KEY (trigram, segment)
+        ) WITHOUT ROWID''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER
+        )''')
+        return conn
+
+    @staticmethod
+    def _get_meta(conn, key, default=0):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    @staticmethod
+    def _set_meta(conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def exists(self):
+        return os.path.exists(self.db_path)
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def build(self, repo_path, executor=None, full=False):
+        """
+        Bring the index up to date with the repository.
+
+        Args:
+            repo_path (str): Repository root
+            executor: Optional process pool used to read files and extract trigrams
+            full (bool): Discard the existing index and rebuild from scratch
+
+        Returns:
+            dict: Counts of indexed, unchanged and removed files
+        """
+        return self._update(repo_path, iter_searchable_files(repo_path), None, executor, full)
+
+    def update(self, repo_path, rel_paths):
+        """
+        Re-index only the given files, e.g. as reported by the file watcher.
+
+        Paths that no longer exist (or no longer qualify for search) are removed.
+
+        Args:
+            repo_path (str): Repository root
+            rel_paths (iterable): '/'-separated paths relative to the repository root
+
+        Returns:
+            dict: Counts of indexed, unchanged and removed files
+        """
+        rel_paths = set(rel_paths)
+        files = []
+        for rel_path in sorted(rel_paths):
+            full_path = os.path.join(repo_path, rel_path)
+            try:
+                stat_result = os.stat(full_path)
+            except OSError:
+                continue
+            if is_searchable_path(rel_path) and stat_result.st_size <= MAX_FILE_SIZE:
+                files.append((full_path, rel_path, stat_result))
+        return self._update(repo_path, files, rel_paths, None, False)
+
+    def _update(self, repo_path, files, scope, executor, full):
+        """
+        Index the given (full_path, rel_path, stat_result) files. Known files
+        that were not among them are removed: all of them for a full walk
+        (scope None), otherwise only those inside scope.
+        """
+        # Imported here to avoid a circular import with the indexing pipeline helpers
+        from indexing.pipeline import ordered_map
+
+        start_time = time.time()
+        conn = self._connect()
+        if full:
+            conn.execute("DELETE FROM files")
+            conn.execute("DELETE FROM postings")
+            # The generation carries on, so running servers see the rebuilt index as new
+            conn.execute("DELETE FROM meta WHERE key != 'generation'")
+
+        known = {
+            row[0]: (row[1], row[2], row[3])
+            for row in conn.execute("SELECT path, id, size, mtime_ns FROM files")
+        }
+        next_id = self._get_meta(conn, 'next_id', 0)
+        next_segment = self._get_meta(conn, 'next_segment', 0)
+
+        seen = set()
+        pending_ids = []
+        pending_keys = []
+        pending_count = 0
+        indexed = 0
+        unchanged = 0
+
+        def candidates():
+            for full_path, rel_path, stat_result in files:
+                seen.add(rel_path)
+                entry = known.get(rel_path)
+                if entry and entry[1] == stat_result.st_size and entry[2] == stat_result.st_mtime_ns:
+                    yield None, None
+                    continue
+                yield (full_path,), (rel_path, stat_result)
+
+        for args, ready, keys in ordered_map(executor, file_trigrams, candidates()):
+            if args is None:
+                unchanged += 1
+                continue
+            rel_path, stat_result = ready
+            entry = known.get(rel_path)
+            if entry:
+                # Old id becomes a tombstone; its postings are dropped on compaction
+                conn.execute("DELETE FROM files WHERE id = ?", (entry[0],))
+            if keys is None:
+                known.pop(rel_path, None)
+                continue
+            file_id = next_id
+            next_id += 1
+            conn.execute(
+                "INSERT OR REPLACE INTO files (id, path, size, mtime_ns) VALUES (?, ?, ?, ?)",
+                (file_id, rel_path, stat_result.st_size, stat_result.st_mtime_ns)
+            )
+            indexed += 1
+            if not len(keys):
+                continue
+            pending_ids.append(np.full(len(keys), file_id, dtype=np.uint32))
+            pending_keys.append(keys)
+            pending_count += len(keys)
+            if pending_count >= SEGMENT_POSTINGS:
+                self._write_segment(conn, next_segment, pending_keys, pending_ids)
+                next_segment += 1
+                pending_ids, pending_keys, pending_count = [], [], 0
+
+        if pending_keys:
+            self._write_segment(conn, next_segment, pending_keys, pending_ids)
+            next_segment += 1
+
+        removed = [path for path in known if path not in seen and (scope is None or path in scope)]
+        for rel_path in removed:
+            conn.execute("DELETE FROM files WHERE path = ?", (rel_path,))
+
+        self._set_meta(conn, 'next_id', next_id)
+        self._set_meta(conn, 'next_segment', next_segment)
+        self._set_meta(conn, 'generation', self._get_meta(conn, 'generation', 0) + 1)
+        conn.commit()
+
+        live = conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        segments = conn.execute("SELECT COUNT(DISTINCT segment) FROM postings").fetchone()[0]
+        dead = next_id - live
+        if segments > MAX_SEGMENTS or (next_id and dead / next_id > MAX_DEAD_RATIO):
+            self._compact(conn)
+        conn.close()
+
+        logging.info(
+            f"Trigram index: indexed {indexed} files, {unchanged} unchanged, "
+            f"{len(removed)} removed in {time.time() - start_time:.1f}s"
+        )
+        return {"indexed": indexed, "unchanged": unchanged, "removed": len(removed)}
+
+    @staticmethod
+    def _write_segment(conn, segment, pending_keys, pending_ids):
+        """Group buffered (trigram, file id) pairs by trigram and store them as one segment."""
+        keys = np.concatenate(pending_keys)
+        ids = np.concatenate(pending_ids)
+        # Stable sort keeps file ids ascending within each trigram
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        ids = ids[order]
+        boundaries = np.flatnonzero(np.diff(keys)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(keys)]))
+        conn.executemany(
+            "INSERT OR REPLACE INTO postings (trigram, segment, file_ids) VALUES (?, ?, ?)",
+            (
+                (int(keys[start]), segment, ids[start:end].tobytes())
+                for start, end in zip(starts, ends)
+            )
+        )
+
+    def compact(self):
+        """Merge all segments into one and drop tombstoned file ids."""
+        conn = self._connect()
+        self._compact(conn)
+        conn.close()
+
+    def _compact(self, conn):
+        start_time = time.time()
+        live_ids = np.array(
+            sorted(row[0] for row in conn.execute("SELECT id FROM files")), dtype=np.uint32
+        )
+        next_segment = self._get_meta(conn, 'next_segment', 0)
+        merged_rows = []
+        current = None
+        blobs = []
+        for trigram, file_ids in conn.execute("SELECT trigram, file_ids FROM postings ORDER BY trigram"):
+            if trigram != current:
+                if blobs:
+                    merged_rows.append((current, self._merge_postings(blobs, live_ids)))
+                current = trigram
+                blobs = []
+            blobs.append(file_ids)
+        if blobs:
+            merged_rows.append((current, self._merge_postings(blobs, live_ids)))
+
+        conn.execute("DELETE FROM postings")
+        conn.executemany(
+            "INSERT INTO postings (trigram, segment, file_ids) VALUES (?, ?, ?)",
+            ((trigram, next_segment, ids.tobytes()) for trigram, ids in merged_rows if len(ids))
+        )
+        self._set_meta(conn, 'next_segment', next_segment + 1)
+        self._set_meta(conn, 'generation', self._get_meta(conn, 'generation', 0) + 1)
+        conn.commit()
+        conn.execute("VACUUM")
+        logging.info(f"Trigram index compacted in {time.time() - start_time:.1f}s")
+
+    @staticmethod
+    def _merge_postings(blobs, live_ids):
+        ids = np.concatenate([np.frombuffer(blob, dtype=np.uint32) for blob in blobs])
+        ids = np.unique(ids)
+        return ids[np.isin(ids, live_ids, assume_unique=True)]
+
+    # ------------------------------------------------------------------
+    # Querying
+    # ------------------------------------------------------------------
+
+    def _refresh(self, conn):
+        """Reload the id -> path table if the index was rebuilt since it was last read."""
+        generation = self._get_meta(conn, 'generation', 0)
+        if generation != self.generation:
+            self.paths = dict(conn.execute("SELECT id, path FROM files"))
+            self.generation = generation
+
+    def _postings(self, conn, trigram):
+        blobs = [row[0] for row in conn.execute("SELECT file_ids FROM postings WHERE trigram = ?", (int(trigram),))]
+        if not blobs:
+            return np.empty(0, dtype=np.uint32)
+        if len(blobs) == 1:
+            return np.frombuffer(blobs[0], dtype=np.uint32)
+        return np.unique(np.concatenate([np.frombuffer(blob, dtype=np.uint32) for blob in blobs]))
+
+    def _literal_candidates(self, conn, literal):
+        result = None
+        for trigram in literal_trigrams(literal):
+            ids = self._postings(conn, trigram)
+            result = ids if result is None else np.intersect1d(result, ids, assume_unique=True)
+            if len(result) == 0:
+                break
+        return result
+
+    def candidates(self, groups):
+        """
+        Return the paths of files that may satisfy a query.
+
+        Args:
+            groups (list): Conjunction of OR-groups of literals, as produced by
+                           regex_literal_groups; use [[term]] for a plain substring
+
+        Returns:
+            list: Sorted relative paths of candidate files; every live file if
+                  the query has no usable trigrams
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self._refresh(conn)
+            result = None
+            for group in groups:
+                group_ids = None
+                usable = True
+                for literal in group:
+                    ids = self._literal_candidates(conn, literal)
+                    if ids is None:
+                        # Literal too short to constrain the search; the group matches anything
+                        usable = False
+                        break
+                    group_ids = ids if group_ids is None else np.union1d(group_ids, ids)
+                if not usable or group_ids is None:
+                    continue
+                result = group_ids if result is None else np.intersect1d(result, group_ids, assume_unique=True)
+                if len(result) == 0:
+                    break
+            if result is None:
+                return sorted(self.paths.values())
+            return sorted(self.paths[file_id] for file_id in result.tolist() if file_id in self.paths)
+        finally:
+            conn.close()
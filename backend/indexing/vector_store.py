@@ -0,0 +1,522 @@
+"""
+Exact nearest-neighbour search over chunk embeddings with NumPy.
+
+Vectors are stored quantized (int8 with a per-vector scale, or float16) in the
+embeddings table of data/embeddings.db, next to the chunk text and metadata.
+For searching, the table is exported to a snapshot file that is memory-mapped
+as a matrix and scanned in blocks with one matrix product per block, for all
+queries waiting at the time; rows added since the snapshot are held in memory
+and deleted rows are masked until a writer rewrites the snapshot after a batch
+of changes (queries never do).
+
+VectorStore answers the subset of the ChromaDB collection API the server uses
+(add, delete, get, query, count), so either can serve POST /search and /query.
+"""
+import os
+import glob
+import sqlite3
+import logging
+import threading
+import time
+
+import numpy as np
+
+VECTOR_DTYPES = ('int8', 'float16')
+
+# Rows converted to float32 and multiplied at a time (small enough to stay in cache),
+# and rows whose distances are computed before the best k are selected from them
+SCAN_BLOCK_ROWS = 1024
+SCAN_GROUP_ROWS = 32768
+# Rows added or deleted since the snapshot before write_snapshot_if_stale() rewrites it
+SNAPSHOT_MAX_DELTA = 50_000
+SNAPSHOT_MAX_DELETED_RATIO = 0.1
+
+# Metadata columns, as stored in the collection by extract.chunk_records
+METADATA_COLUMNS = ('file_path', 'start_char', 'end_char', 'start_line', 'end_line')
+
+
+def quantize(embeddings, dtype):
+    """
+    Quantize float vectors for storage.
+
+    int8 vectors are scaled per vector so the largest component maps to 127;
+    float16 vectors have a scale of 1. The squared norm of each original
+    vector is kept so distances can be computed like ChromaDB's l2 space.
+
+    Returns:
+        tuple: (vectors, scales, squared norms) arrays
+    """
+    x = np.asarray(embeddings, dtype=np.float32)
+    norms = np.einsum('ij,ij->i', x, x)
+    if dtype == 'int8':
+        scales = np.abs(x).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        vectors = np.rint(x / scales[:, None]).astype(np.int8)
+    else:
+        scales = np.ones(len(x), dtype=np.float32)
+        vectors = x.astype(np.float16)
+    return vectors, scales.astype(np.float32), norms.astype(np.float32)
+
+
+class _Snapshot:
+    """Searchable state: snapshot rows (memory-mapped) plus the rows added since, and which are live."""
+
+    def __init__(self, number=None, vectors=None, rows=None, scales=None, norms=None, dim=0, dtype='int8'):
+        self.number = number
+        empty = np.zeros((0, dim), dtype=dtype)
+        self.vectors = vectors if vectors is not None else empty
+        self.rows = rows if rows is not None else np.zeros(0, dtype=np.int64)
+        self.scales = scales if scales is not None else np.zeros(0, dtype=np.float32)
+        self.norms = norms if norms is not None else np.zeros(0, dtype=np.float32)
+        self.live = np.ones(len(self.rows), dtype=bool)
+        self.delta = (empty, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32))
+
+
+class _PendingQuery:
+    def __init__(self, queries, k):
+        self.queries = queries
+        self.k = k
+        self.result = None
+        self.error = None
+
+
+class VectorStore:
+    """
+    Chunk embeddings in SQLite, searched by an exact NumPy scan.
+
+    Rows get increasing numbers that are never reused, so a snapshot only
+    needs the numbers deleted since it was written (vector_deletions) and the
+    rows numbered past it to be current.
+    """
+
+    def __init__(self, db_path="data/embeddings.db", dtype="int8"):
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {dtype} (expected one of {', '.join(VECTOR_DTYPES)})")
+        self.db_path = db_path
+        self.dtype = dtype
+        self.snapshot_dir = os.path.join(os.path.dirname(db_path) or '.', 'vectors')
+        self.generation = None
+        self.state = None
+        # Queries arriving while a scan runs wait and are answered together by the next scan
+        self._scan_condition = threading.Condition()
+        self._scanning = False
+        self._pending = []
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('''CREATE TABLE IF NOT EXISTS embeddings (
+            id INTEGER PRIMARY KEY,
+            file_path TEXT,
+            content TEXT,
+            start_char INTEGER,
+            end_char INTEGER,
+            embedding BLOB
+        )''')
+        # Columns added when the table started being filled; older databases have an empty table without them
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(embeddings)")}
+        for column, kind in (('chunk_id', 'TEXT'), ('start_line', 'INTEGER'), ('end_line', 'INTEGER'),
+                             ('scale', 'REAL'), ('norm', 'REAL')):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE embeddings ADD COLUMN {column} {kind}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_file_path ON embeddings (file_path)")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_chunk_id ON embeddings (chunk_id)")
+        conn.execute("CREATE TABLE IF NOT EXISTS vector_deletions (id INTEGER PRIMARY KEY)")
+        conn.execute('''CREATE TABLE IF NOT EXISTS vector_meta (
+            key TEXT PRIMARY KEY,
+            value
+        )''')
+        return conn
+
+    @staticmethod
+    def _get_meta(conn, key, default=None):
+        row = conn.execute("SELECT value FROM vector_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    @staticmethod
+    def _set_meta(conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO vector_meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _bump_generation(self, conn):
+        self._set_meta(conn, 'generation', self._get_meta(conn, 'generation', 0) + 1)
+
+    def exists(self):
+        """Whether vectors have ever been written (by run_indexing.py or its backfill)."""
+        if not os.path.exists(self.db_path):
+            return False
+        conn = self._connect()
+        try:
+            return self._get_meta(conn, 'dim') is not None
+        finally:
+            conn.close()
+
+    def count(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        finally:
+            conn.close()
+
+    def clear(self):
+        """Drop every vector and snapshot; the next add sets the dtype and dimension afresh."""
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM embeddings")
+            conn.execute("DELETE FROM vector_deletions")
+            # The generation and snapshot counter carry on, so readers never mistake new state for old
+            conn.execute("DELETE FROM vector_meta WHERE key NOT IN ('generation', 'snapshots_written')")
+            self._bump_generation(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        for path in glob.glob(os.path.join(self.snapshot_dir, 'vectors-*')):
+            os.remove(path)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        """Store chunks (replacing any with the same ID), like Collection.add."""
+        if not len(ids):
+            return
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+        conn = self._connect()
+        try:
+            dtype = self._get_meta(conn, 'dtype')
+            if dtype is None:
+                dtype = self.dtype
+                self._set_meta(conn, 'dtype', dtype)
+                self._set_meta(conn, 'dim', len(embeddings[0]))
+            vectors, scales, norms = quantize(embeddings, dtype)
+            self._mark_deleted(conn, "chunk_id = ?", [(chunk_id,) for chunk_id in ids])
+            next_id = self._get_meta(conn, 'next_id', 0)
+            conn.executemany(
+                '''INSERT INTO embeddings (id, chunk_id, file_path, content, start_char, end_char,
+                                           start_line, end_line, embedding, scale, norm)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                (
+                    (next_id + i, chunk_id, metadata.get('file_path'), document, metadata.get('start_char'),
+                     metadata.get('end_char'), metadata.get('start_line'), metadata.get('end_line'),
+                     vectors[i].tobytes(), float(scales[i]), float(norms[i]))
+                    for i, (chunk_id, document, metadata) in enumerate(zip(ids, documents, metadatas))
+                )
+            )
+            self._set_meta(conn, 'next_id', next_id + len(ids))
+            self._bump_generation(conn)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def delete(self, ids=None, where=None):
+        """Delete chunks by ID or by file (where={"file_path": ...}), like Collection.delete."""
+        if where is not None:
+            if set(where) != {'file_path'}:
+                raise ValueError("VectorStore.delete only filters on file_path")
+            condition, params = "file_path = ?", [(where['file_path'],)]
+        elif ids is not None:
+            condition, params = "chunk_id = ?", [(chunk_id,) for chunk_id in ids]
+        else:
+            return
+        conn = self._connect()
+        try:
+            self._mark_deleted(conn, condition, params)
+            self._bump_generation(conn)
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _mark_deleted(conn, condition, params):
+        conn.executemany(f"INSERT OR IGNORE INTO vector_deletions SELECT id FROM embeddings WHERE {condition}", params)
+        conn.executemany(f"DELETE FROM embeddings WHERE {condition}", params)
+
+    def write_snapshot(self):
+        """Export all vectors to a new memory-mappable snapshot and clear the deletion log."""
+        start_time = time.time()
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        conn = self._connect()
+        try:
+            dtype = self._get_meta(conn, 'dtype')
+            dim = self._get_meta(conn, 'dim')
+            if dtype is None:
+                return
+            # One transaction, so the rows exported and the deletions cleared agree
+            conn.execute("BEGIN IMMEDIATE")
+            count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            number = self._get_meta(conn, 'snapshots_written', 0) + 1
+            base = os.path.join(self.snapshot_dir, f"vectors-{number}")
+            vectors = np.lib.format.open_memmap(base + ".npy.tmp", mode='w+', dtype=dtype, shape=(count, dim))
+            rows = np.zeros(count, dtype=np.int64)
+            scales = np.zeros(count, dtype=np.float32)
+            norms = np.zeros(count, dtype=np.float32)
+            cursor = conn.execute("SELECT id, embedding, scale, norm FROM embeddings ORDER BY id")
+            position = 0
+            while True:
+                batch = cursor.fetchmany(10000)
+                if not batch:
+                    break
+                end = position + len(batch)
+                rows[position:end] = [row[0] for row in batch]
+                vectors[position:end] = np.frombuffer(b"".join(row[1] for row in batch), dtype=dtype).reshape(-1, dim)
+                scales[position:end] = [row[2] for row in batch]
+                norms[position:end] = [row[3] for row in batch]
+                position = end
+            vectors.flush()
+            del vectors
+            np.savez(base + ".rows.tmp.npz", rows=rows, scales=scales, norms=norms)
+            os.replace(base + ".npy.tmp", base + ".npy")
+            os.replace(base + ".rows.tmp.npz", base + ".rows.npz")
+            conn.execute("DELETE FROM vector_deletions")
+            self._set_meta(conn, 'snapshot', number)
+            self._set_meta(conn, 'snapshot_rows', count)
+            self._set_meta(conn, 'snapshot_last_row', int(rows[-1]) if count else -1)
+            self._set_meta(conn, 'snapshots_written', number)
+            self._bump_generation(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        # Readers still mapping an older snapshot keep it until they reload
+        for path in glob.glob(os.path.join(self.snapshot_dir, 'vectors-*')):
+            if not os.path.basename(path).startswith(f"vectors-{number}."):
+                os.remove(path)
+        logging.info(f"Vector snapshot of {count} chunks written in {time.time() - start_time:.1f}s")
+
+    def write_snapshot_if_stale(self):
+        """
+        Rewrite the snapshot if many rows were added or deleted since it was written.
+
+        Meant for writers after a batch of changes (the file watcher): exporting
+        the table takes seconds for a large index, and queries keep being served
+        from the old snapshot plus the rows added since while it runs.
+
+        Returns:
+            bool: True if a snapshot was written
+        """
+        conn = self._connect()
+        try:
+            if self._get_meta(conn, 'dtype') is None:
+                return False
+            # Databases from before these were recorded count every row as added
+            last_row = self._get_meta(conn, 'snapshot_last_row', -1)
+            snapshot_rows = self._get_meta(conn, 'snapshot_rows', 0)
+            added = conn.execute("SELECT COUNT(*) FROM embeddings WHERE id > ?", (last_row,)).fetchone()[0]
+            deleted = conn.execute("SELECT COUNT(*) FROM vector_deletions WHERE id <= ?", (last_row,)).fetchone()[0]
+        finally:
+            conn.close()
+        if added <= SNAPSHOT_MAX_DELTA and (not snapshot_rows or deleted / snapshot_rows <= SNAPSHOT_MAX_DELETED_RATIO):
+            return False
+        self.write_snapshot()
+        return True
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def _refresh(self, conn):
+        """Reload the snapshot, deletions and newer rows if anything was written since the last scan."""
+        generation = self._get_meta(conn, 'generation', 0)
+        if generation == self.generation:
+            return self.state
+        dtype = self._get_meta(conn, 'dtype', self.dtype)
+        dim = self._get_meta(conn, 'dim', 0)
+        number = self._get_meta(conn, 'snapshot')
+        state = self.state
+        if state is None or state.number != number or state.vectors.dtype != dtype:
+            state = _Snapshot(dim=dim, dtype=dtype)
+            base = os.path.join(self.snapshot_dir, f"vectors-{number}")
+            if number is not None and os.path.exists(base + ".npy"):
+                with np.load(base + ".rows.npz") as arrays:
+                    state = _Snapshot(
+                        number, np.load(base + ".npy", mmap_mode='r'),
+                        arrays['rows'], arrays['scales'], arrays['norms'], dim, dtype
+                    )
+        last_row = int(state.rows[-1]) if len(state.rows) else -1
+        deleted = np.array([row[0] for row in conn.execute("SELECT id FROM vector_deletions WHERE id <= ?", (last_row,))],
+                           dtype=np.int64)
+        state.live = np.ones(len(state.rows), dtype=bool)
+        if len(deleted):
+            # Every deleted number is at most the last snapshot row, so each has a position
+            positions = np.searchsorted(state.rows, deleted)
+            state.live[positions[state.rows[positions] == deleted]] = False
+        added = conn.execute("SELECT id, embedding, scale, norm FROM embeddings WHERE id > ? ORDER BY id", (last_row,)).fetchall()
+        state.delta = (
+            np.frombuffer(b"".join(row[1] for row in added), dtype=dtype).reshape(-1, dim) if added else np.zeros((0, dim), dtype=dtype),
+            np.array([row[0] for row in added], dtype=np.int64),
+            np.array([row[2] for row in added], dtype=np.float32),
+            np.array([row[3] for row in added], dtype=np.float32),
+        )
+        self.state, self.generation = state, generation
+        return state
+
+    def _search(self, queries, k):
+        """Top k (row numbers, squared distances) per query, coalescing concurrent callers into one scan."""
+        request = _PendingQuery(queries, k)
+        with self._scan_condition:
+            self._pending.append(request)
+            # Wait for a running scan; if it did not take this query, lead the next one
+            while self._scanning and request.result is None and request.error is None:
+                self._scan_condition.wait()
+            if request.result is None and request.error is None:
+                self._scanning = True
+                batch, self._pending = self._pending, []
+            else:
+                batch = None
+        if batch is not None:
+            try:
+                state = self._current_state()
+                stacked = np.concatenate([pending.queries for pending in batch])
+                rows, distances = self._scan(state, stacked, max(pending.k for pending in batch))
+                offset = 0
+                for pending in batch:
+                    count = len(pending.queries)
+                    pending.result = ([row[:pending.k] for row in rows[offset:offset + count]],
+                                      [distance[:pending.k] for distance in distances[offset:offset + count]])
+                    offset += count
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            finally:
+                with self._scan_condition:
+                    self._scanning = False
+                    self._scan_condition.notify_all()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _current_state(self):
+        conn = self._connect()
+        try:
+            return self._refresh(conn)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _scan(state, queries, k):
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        best_distances = np.zeros((len(queries), 0), dtype=np.float32)
+        buffer = np.empty((SCAN_BLOCK_ROWS, queries.shape[1]), dtype=np.float32)
+        parts = [(state.vectors, state.rows, state.scales, state.norms, state.live)]
+        vectors, rows, scales, norms = state.delta
+        parts.append((vectors, rows, scales, norms, None))
+        for vectors, rows, scales, norms, live in parts:
+            for group_start in range(0, len(rows), SCAN_GROUP_ROWS):
+                group_end = min(group_start + SCAN_GROUP_ROWS, len(rows))
+                # Squared l2 distance less |q|^2 (the same for every row): |v|^2 - 2 q.v
+                distances = np.empty((len(queries), group_end - group_start), dtype=np.float32)
+                for start in range(group_start, group_end, SCAN_BLOCK_ROWS):
+                    end = min(start + SCAN_BLOCK_ROWS, group_end)
+                    block = buffer[:end - start]
+                    np.copyto(block, vectors[start:end], casting='unsafe')
+                    np.matmul(queries, block.T, out=distances[:, start - group_start:end - group_start])
+                distances *= -2.0 * scales[group_start:group_end]
+                distances += norms[group_start:group_end]
+                if live is not None:
+                    distances[:, ~live[group_start:group_end]] = np.inf
+                if distances.shape[1] > k:
+                    keep = np.argpartition(distances, k - 1, axis=1)[:, :k]
+                    group_rows = rows[group_start + keep]
+                    distances = np.take_along_axis(distances, keep, axis=1)
+                else:
+                    group_rows = np.broadcast_to(rows[group_start:group_end], distances.shape)
+                best_rows = np.concatenate([best_rows, group_rows], axis=1)
+                best_distances = np.concatenate([best_distances, distances], axis=1)
+        order = np.argsort(best_distances, axis=1, kind='stable')[:, :k]
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        best_distances = np.take_along_axis(best_distances, order, axis=1)
+        best_distances = np.maximum(best_distances + np.einsum('ij,ij->i', queries, queries)[:, None], 0.0)
+        finite = np.isfinite(best_distances)
+        return ([rows[mask].tolist() for rows, mask in zip(best_rows, finite)],
+                [distances[mask].tolist() for distances, mask in zip(best_distances, finite)])
+
+    def _filtered_search(self, conn, queries, k, file_path):
+        """Exact search over the chunks of one file, read straight from the table."""
+        rows = conn.execute("SELECT id, embedding, scale, norm FROM embeddings WHERE file_path = ?", (file_path,)).fetchall()
+        if not rows:
+            return [[] for _ in queries], [[] for _ in queries]
+        dtype = self._get_meta(conn, 'dtype', self.dtype)
+        vectors = np.frombuffer(b"".join(row[1] for row in rows), dtype=dtype).reshape(len(rows), -1).astype(np.float32)
+        vectors *= np.array([row[2] for row in rows], dtype=np.float32)[:, None]
+        norms = np.array([row[3] for row in rows], dtype=np.float32)
+        distances = np.einsum('ij,ij->i', queries, queries)[:, None] + norms[None, :] - 2.0 * (queries @ vectors.T)
+        order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        return ([ids[row].tolist() for row in order],
+                [np.maximum(distances[i, row], 0.0).tolist() for i, row in enumerate(order)])
+
+    def _fetch(self, conn, row_numbers):
+        """chunk_id, document and metadata of each row number that still exists."""
+        found = {}
+        unique = list(dict.fromkeys(row_numbers))
+        for start in range(0, len(unique), 500):
+            part = unique[start:start + 500]
+            placeholders = ",".join("?" * len(part))
+            for row in conn.execute(
+                f"SELECT id, chunk_id, content, {', '.join(METADATA_COLUMNS)} FROM embeddings WHERE id IN ({placeholders})",
+                part
+            ):
+                metadata = {key: value for key, value in zip(METADATA_COLUMNS, row[3:]) if value is not None}
+                found[row[0]] = (row[1], row[2], metadata)
+        return found
+
+    def query(self, query_embeddings, n_results=10, where=None, include=('documents', 'metadatas', 'distances')):
+        """Nearest chunks to each query embedding, in the shape Collection.query returns."""
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        if where is not None and set(where) != {'file_path'}:
+            raise ValueError("VectorStore.query only filters on file_path")
+        if where is not None:
+            conn = self._connect()
+            try:
+                rows, distances = self._filtered_search(conn, queries, n_results, where['file_path'])
+            finally:
+                conn.close()
+        else:
+            rows, distances = self._search(queries, n_results)
+        conn = self._connect()
+        try:
+            found = self._fetch(conn, [row for query_rows in rows for row in query_rows])
+        finally:
+            conn.close()
+        result = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        for query_rows, query_distances in zip(rows, distances):
+            # Rows deleted between the scan and the fetch are dropped
+            hits = [(found[row], distance) for row, distance in zip(query_rows, query_distances) if row in found]
+            result['ids'].append([hit[0] for hit, _ in hits])
+            result['documents'].append([hit[1] for hit, _ in hits])
+            result['metadatas'].append([hit[2] for hit, _ in hits])
+            result['distances'].append([distance for _, distance in hits])
+        return {key: value for key, value in result.items() if key == 'ids' or key in include}
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=('documents', 'metadatas')):
+        """Chunks by ID, by file, or a page of all of them, in the shape Collection.get returns."""
+        conn = self._connect()
+        try:
+            dtype = self._get_meta(conn, 'dtype', self.dtype)
+            columns = f"chunk_id, content, embedding, scale, {', '.join(METADATA_COLUMNS)}"
+            if ids is not None:
+                rows = []
+                for start in range(0, len(ids), 500):
+                    part = list(ids[start:start + 500])
+                    placeholders = ",".join("?" * len(part))
+                    rows.extend(conn.execute(f"SELECT {columns} FROM embeddings WHERE chunk_id IN ({placeholders})", part))
+            elif where is not None:
+                if set(where) != {'file_path'}:
+                    raise ValueError("VectorStore.get only filters on file_path")
+                rows = conn.execute(f"SELECT {columns} FROM embeddings WHERE file_path = ? ORDER BY id", (where['file_path'],)).fetchall()
+            else:
+                rows = conn.execute(
+                    f"SELECT {columns} FROM embeddings ORDER BY id LIMIT ? OFFSET ?",
+                    (-1 if limit is None else limit, offset or 0)
+                ).fetchall()
+        finally:
+            conn.close()
+        result = {'ids': [row[0] for row in rows]}
+        if 'documents' in include:
+            result['documents'] = [row[1] for row in rows]
+        if 'metadatas' in include:
+            result['metadatas'] = [
+                {key: value for key, value in zip(METADATA_COLUMNS, row[4:]) if value is not None} for row in rows
+            ]
+        if 'embeddings' in include:
+            result['embeddings'] = [(np.frombuffer(row[2], dtype=dtype).astype(np.float32) * row[3]).tolist() for row in rows]
+        return result
@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+import logging
+
+from indexing.trigram_index import is_searchable_path, iter_searchable_files
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # Optional dependency; fall back to polling
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Forwards watchdog events to the RepositoryWatcher as relative paths."""
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            # Moving a directory in or out produces no events for the files inside it
+            if event.event_type in ('moved', 'deleted'):
+                self.watcher.notify_directory(event.src_path)
+            if event.event_type == 'moved':
+                self.watcher.notify_tree(event.dest_path)
+            elif event.event_type == 'created':
+                self.watcher.notify_tree(event.src_path)
+            return
+        self.watcher.notify(event.src_path)
+        dest_path = getattr(event, 'dest_path', None)
+        if dest_path:
+            self.watcher.notify(dest_path)
+
+
+class RepositoryWatcher:
+    """
+    Watches the repository for file changes and reports them in debounced batches.
+
+    Uses inotify (through the optional watchdog package) when it is installed,
+    otherwise polls the tree for size/mtime changes every poll_interval seconds.
+    Changes are collected until no new event has arrived for debounce seconds
+    (or max_delay seconds have passed since the first one), then on_changes is
+    called on a background thread with (changed_paths, deleted_paths), both
+    sets of '/'-separated paths relative to the repository root.
+    """
+
+    def __init__(self, repo_path, on_changes, debounce=1.0, max_delay=10.0, poll_interval=5.0, use_polling=False):
+        self.repo_path = os.path.abspath(repo_path)
+        self.on_changes = on_changes
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.use_polling = use_polling or Observer is None
+
+        self._pending = set()
+        self._first_event_at = None
+        self._last_event_at = None
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._threads = []
+        self._observer = None
+        self._snapshot = {}
+
+    @property
+    def mode(self):
+        return "polling" if self.use_polling else "inotify"
+
+    def start(self):
+        """Start watching in background threads."""
+        # Known files: compared against by the poller, used to expand directory events otherwise
+        self._snapshot = self._take_snapshot()
+        if self.use_polling:
+            self._spawn(self._poll_loop, "repo-watcher-poll")
+        else:
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self), self.repo_path, recursive=True)
+            self._observer.start()
+        self._spawn(self._flush_loop, "repo-watcher-debounce")
+        logging.info(f"Watching {self.repo_path} for changes ({self.mode})")
+
+    def stop(self):
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    # ------------------------------------------------------------------
+    # Event intake
+    # ------------------------------------------------------------------
+
+    def notify(self, full_path):
+        """Record that a file may have changed."""
+        rel_path = os.path.relpath(full_path, self.repo_path).replace('\\', '/')
+        if rel_path.startswith('..') or not is_searchable_path(rel_path):
+            return
+        self._add_pending([rel_path])
+
+    def notify_directory(self, full_path):
+        """A directory moved or vanished: everything previously under it may have changed."""
+        rel_dir = os.path.relpath(full_path, self.repo_path).replace('\\', '/')
+        prefix = rel_dir + '/'
+        with self._condition:
+            known = [path for path in self._snapshot if path.startswith(prefix)]
+        self._add_pending(known)
+
+    def notify_tree(self, full_path):
+        """A directory appeared: every file under it is new."""
+        self._add_pending([
+            rel_path for _, rel_path, _ in iter_searchable_files(self.repo_path, search_dir=full_path)
+            if is_searchable_path(rel_path)
+        ])
+
+    def _add_pending(self, rel_paths):
+        if not rel_paths:
+            return
+        with self._condition:
+            now = time.monotonic()
+            self._pending.update(rel_paths)
+            if self._first_event_at is None:
+                self._first_event_at = now
+            self._last_event_at = now
+            self._condition.notify_all()
+
+    # ------------------------------------------------------------------
+    # Polling fallback
+    # ------------------------------------------------------------------
+
+    def _take_snapshot(self):
+        return {
+            rel_path: (stat_result.st_size, stat_result.st_mtime_ns)
+            for _, rel_path, stat_result in iter_searchable_files(self.repo_path)
+        }
+
+    def _poll_loop(self):
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                current = self._take_snapshot()
+            except Exception as e:
+                logging.error(f"Error polling repository: {str(e)}")
+                continue
+            changed = [path for path, state in current.items() if self._snapshot.get(path) != state]
+            changed.extend(path for path in self._snapshot if path not in current)
+            with self._condition:
+                self._snapshot = current
+            self._add_pending(changed)
+
+    # ------------------------------------------------------------------
+    # Debounced delivery
+    # ------------------------------------------------------------------
+
+    def _flush_loop(self):
+        while not self._stopped.is_set():
+            with self._condition:
+                while not self._pending and not self._stopped.is_set():
+                    self._condition.wait()
+                if self._stopped.is_set():
+                    return
+                now = time.monotonic()
+                quiet_for = now - self._last_event_at
+                waiting_for = now - self._first_event_at
+                if quiet_for < self.debounce and waiting_for < self.max_delay:
+                    self._condition.wait(min(self.debounce - quiet_for, self.max_delay - waiting_for))
+                    continue
+                batch = self._pending
+                self._pending = set()
+                self._first_event_at = None
+                self._last_event_at = None
+
+            changed = set()
+            deleted = set()
+            for rel_path in batch:
+                if os.path.isfile(os.path.join(self.repo_path, rel_path)):
+                    changed.add(rel_path)
+                else:
+                    deleted.add(rel_path)
+            if not self.use_polling:
+                # Keep the record of known paths current so directory removals can be expanded
+                with self._condition:
+                    for rel_path in changed:
+                        self._snapshot.setdefault(rel_path, None)
+                    for rel_path in deleted:
+                        self._snapshot.pop(rel_path, None)
+            try:
+                self.on_changes(changed, deleted)
+            except Exception as e:
+                logging.error(f"Error applying repository changes: {str(e)}")
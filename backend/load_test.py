@@ -0,0 +1,110 @@
+"""
+Load test: measure /browse latency on its own and while /query requests are in flight.
+
+Run against a running server, e.g.
+    python load_test.py --browse-path src --query-concurrency 8
+
+If the event loop is never blocked by the embedding model, ChromaDB, Gemini or
+file reads, the two /browse latency distributions should be nearly the same.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(label, latencies):
+    if not latencies:
+        print(f"{label}: no successful requests")
+        return
+    print(
+        f"{label}: n={len(latencies)} "
+        f"p50={percentile(latencies, 0.50) * 1000:.1f}ms "
+        f"p95={percentile(latencies, 0.95) * 1000:.1f}ms "
+        f"p99={percentile(latencies, 0.99) * 1000:.1f}ms "
+        f"max={max(latencies) * 1000:.1f}ms "
+        f"mean={statistics.mean(latencies) * 1000:.1f}ms"
+    )
+
+
+async def measure_browse(client, path, requests, concurrency):
+    """Issue browse requests with a fixed concurrency and return the latency of each successful one."""
+    latencies = []
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await client.get(f"/browse/{path}")
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+async def query_load(client, question, context_file, stop, counters):
+    """Keep one /query request in flight until stop is set."""
+    payload = {"question": question}
+    if context_file:
+        payload["context_file_path"] = context_file
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            response = await client.post("/query", json=payload)
+            counters[response.status_code] = counters.get(response.status_code, 0) + 1
+            counters["seconds"] += time.perf_counter() - start
+        except httpx.HTTPError as e:
+            counters[type(e).__name__] = counters.get(type(e).__name__, 0) + 1
+
+
+async def main(args):
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout) as client:
+        # Warm up (path caches, connection pool)
+        await measure_browse(client, args.browse_path, 10, 1)
+
+        baseline = await measure_browse(client, args.browse_path, args.requests, args.browse_concurrency)
+        summarize("browse (idle)", baseline)
+
+        stop = asyncio.Event()
+        counters = {"seconds": 0.0}
+        load = [
+            asyncio.create_task(query_load(client, args.question, args.context_file, stop, counters))
+            for _ in range(args.query_concurrency)
+        ]
+        # Let the /query requests reach the model before measuring
+        await asyncio.sleep(args.ramp_up)
+        loaded = await measure_browse(client, args.browse_path, args.requests, args.browse_concurrency)
+        stop.set()
+        await asyncio.gather(*load)
+        summarize(f"browse (with {args.query_concurrency} /query in flight)", loaded)
+
+        completed = sum(count for key, count in counters.items() if key != "seconds")
+        statuses = {key: count for key, count in counters.items() if key != "seconds"}
+        print(f"/query: {completed} requests, statuses {statuses}")
+        if baseline and loaded:
+            ratio = percentile(loaded, 0.95) / percentile(baseline, 0.95)
+            print(f"browse p95 ratio (loaded / idle): {ratio:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure /browse latency while /query requests are in flight")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Backend URL")
+    parser.add_argument("--browse-path", default="", help="Repository path to browse (directory or file)")
+    parser.add_argument("--requests", type=int, default=200, help="Browse requests per measurement")
+    parser.add_argument("--browse-concurrency", type=int, default=4, help="Concurrent browse requests")
+    parser.add_argument("--query-concurrency", type=int, default=8, help="Concurrent /query requests during the loaded run")
+    parser.add_argument("--question", default="What does this repository do?", help="Question sent to /query")
+    parser.add_argument("--context-file", default=None, help="Optional context_file_path for /query")
+    parser.add_argument("--ramp-up", type=float, default=1.0, help="Seconds to wait after starting /query load")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Request timeout in seconds")
+    asyncio.run(main(parser.parse_args()))
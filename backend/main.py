@@ -1,16 +1,46 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse, JSONResponse
+from fastapi.responses import PlainTextResponse, JSONResponse, StreamingResponse, Response
 import uvicorn
 from dotenv import load_dotenv
 import os
 from pathlib import Path
-import chromadb
-from sentence_transformers import SentenceTransformer
 from pydantic import BaseModel
-import google.generativeai as genai
 import json
-from indexing.ctags_indexer import parse_ctags_json
+from indexing.ctags_indexer import load_symbol_index, run_ctags_for_files, tags_file_path, symbol_table_path, TAGS_FILE_NAME
+from indexing.symbol_table import SymbolIndex
+from indexing.bm25_index import BM25Index, reciprocal_rank_fusion
+from indexing.vector_store import VectorStore
+from indexing.embedding_cache import EmbeddingCache
+from indexing.trigram_index import TrigramIndex, regex_literal_groups, SKIP_DIRS as SEARCH_SKIP_DIRS, MAX_FILE_SIZE as MAX_SEARCH_FILE_SIZE
+from indexing.path_index import PathIndex
+from indexing.watcher import RepositoryWatcher
+from indexing.manifest import FileManifest, stat_file, read_file_for_indexing
+from indexing.summary_store import SummaryStore
+from indexing.extract import should_index_file, process_file, chunk_records
+from indexing.pipeline import EmbeddingWriter
+from indexing.query_cache import LRUCache, normalize_query
+from indexing.concurrency import ConcurrencyLimiter, Overloaded, run_blocking, iterate_in_executor
+from indexing.content_search import compile_matcher, scan_files
+from indexing.file_ranges import read_file_range, validator_headers, is_not_modified
+from indexing.directory_listing import DirectoryListings
+from indexing.pipeline import ordered_map
+from indexing.readiness import Readiness
+from indexing.llm import GeminiBackend, FakeLLMBackend, stream_in_executor
+from indexing.context_builder import (
+    ContextPacker, estimate_tokens, question_terms, locate_chunks, keyword_windows, merge_ranges, render_lines
+)
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import functools
+import contextlib
+import itertools
+import asyncio
+import sqlite3
+import stat
+import time
 import re
 from typing import List, Optional
 import fnmatch
@@ -35,51 +65,156 @@ REPO_PATH = os.getenv("REPO_PATH", "../path/to/your/local/repo")
 
 # ChromaDB and embedding model configuration
 DB_PATH = "./chroma_db"
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
 
-# Initialize ChromaDB client globally
-try:
-    print(f"Initializing ChromaDB PersistentClient with DB_PATH: {DB_PATH}")
-    chroma_client = chromadb.PersistentClient(path=DB_PATH)
-    embedding_collection = chroma_client.get_collection("code_embeddings")
-    # Check if the embedding collection is populated
-    if embedding_collection.count() == 0:
-        print("Warning: The embedding collection is empty. Ensure embeddings are indexed properly.")
-    # Load the same model used for indexing
-    embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-except Exception as e:
-    print(f"Warning: Could not initialize ChromaDB or embedding model: {str(e)}")
-    # We'll handle this in the endpoint if these variables are None
+# Caches for POST /search: query embeddings and final ranked results
+query_embedding_cache = LRUCache(
+    "query_embeddings",
+    max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "2048")),
+    ttl_seconds=float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "3600"))
+)
+search_result_cache = LRUCache(
+    "search_results",
+    max_entries=int(os.getenv("SEARCH_CACHE_SIZE", "512")),
+    ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300"))
+)
+
+# POST /search takes this many candidates from each of the vector and BM25 retrievers,
+# then merges them with reciprocal rank fusion (RRF_K damps the weight of top ranks)
+SEMANTIC_SEARCH_CANDIDATES = int(os.getenv("SEMANTIC_SEARCH_CANDIDATES", "20"))
+SEMANTIC_SEARCH_RESULTS = 10
+RRF_K = int(os.getenv("RRF_K", "60"))
+# BM25 index over the embedded chunks, built by run_indexing.py and updated by the watcher
+BM25_DB_PATH = "./data/bm25.db"
+bm25_index = BM25Index(BM25_DB_PATH)
+# Vector search backend: "chroma", or "numpy" for an exact scan of the quantized vectors that
+# run_indexing.py stores in data/embeddings.db; updates are written to both either way
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+EMBEDDINGS_DB_PATH = "./data/embeddings.db"
+EMBEDDING_CACHE_DB_PATH = "./data/embedding_cache.db"
+vector_store = VectorStore(EMBEDDINGS_DB_PATH, dtype=os.getenv("VECTOR_DTYPE", "int8"))
 
-# Configure Gemini API
+# ChromaDB client, collection and embedding model; loaded in the background at startup
+# (see load_embedding_store) and None until then or if loading failed
+chroma_client = None
+embedding_collection = None
+embedding_model = None
+# Collection answering vector queries: embedding_collection, or vector_store with VECTOR_BACKEND=numpy
+search_collection = None
+
+# Gemini API, configured in the background at startup (see load_language_model)
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
-    try:
-        qa_model = genai.GenerativeModel('gemini-1.5-flash')
-    except Exception as e:
-        print(f"Warning: Could not initialize Gemini model: {str(e)}")
-        qa_model = None
-else:
-    print("Warning: GOOGLE_API_KEY not set. Gemini API will not be available.")
-    qa_model = None
+qa_model = None
+
+# Language model behind /query; LLM_BACKEND=fake swaps in a local stand-in that needs no API key
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+llm_backend = None
+
+# Bounded worker pools for blocking work, so a slow call never stalls the event loop:
+# file system access, the embedding model and ChromaDB, and Gemini calls each get their own
+IO_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("IO_WORKERS", "16")), thread_name_prefix="io")
+MODEL_WORKERS = int(os.getenv("MODEL_WORKERS", "2"))
+MODEL_POOL = ThreadPoolExecutor(max_workers=MODEL_WORKERS, thread_name_prefix="model")
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", "8"))
+LLM_POOL = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="llm")
+# Worker processes for GET /search content matching (0 matches inline on an I/O thread)
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", str(min(4, os.cpu_count() or 1))))
+SEARCH_BATCH_SIZE = 32
+# GET /search result limits: the default per request and the most a request may ask for
+SEARCH_RESULT_LIMIT = int(os.getenv("SEARCH_RESULT_LIMIT", "100"))
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "1000"))
+# Matches listed per file (with line and column) by code-content searches, by default and at most
+SEARCH_MATCHES_PER_FILE = int(os.getenv("SEARCH_MATCHES_PER_FILE", "20"))
+SEARCH_MAX_MATCHES_PER_FILE = int(os.getenv("SEARCH_MAX_MATCHES_PER_FILE", "1000"))
+# Streaming GET /search sends a progress line after this long without a match
+SEARCH_PROGRESS_SECONDS = float(os.getenv("SEARCH_PROGRESS_SECONDS", "0.5"))
+search_process_pool = None
+
+# Per-endpoint concurrency limits; requests beyond the queue depth get a 503
+browse_limiter = ConcurrencyLimiter.from_env("browse", 32, 256)
+semantic_search_limiter = ConcurrencyLimiter.from_env("semantic_search", MODEL_WORKERS * 2, 32)
+query_limiter = ConcurrencyLimiter.from_env("query", LLM_WORKERS, 16)
+code_search_limiter = ConcurrencyLimiter.from_env("code_search", 4, 32)
+
+# /browse file reads: responses are capped at this many bytes (larger files are paged by line range),
+# and the line offsets of recently viewed files are cached to locate ranges without rescanning
+BROWSE_MAX_BYTES = int(os.getenv("BROWSE_MAX_BYTES", str(1024 * 1024)))
+browse_line_index_cache = LRUCache(
+    "browse_line_index",
+    max_entries=int(os.getenv("BROWSE_LINE_INDEX_CACHE_SIZE", "32")),
+    ttl_seconds=float(os.getenv("BROWSE_LINE_INDEX_CACHE_TTL_SECONDS", "3600"))
+)
+
+# /browse directory listings: sorted once per directory version (until its mtime changes) and served in pages
+BROWSE_PAGE_SIZE = int(os.getenv("BROWSE_PAGE_SIZE", "500"))
+directory_listings = DirectoryListings(max_entries=int(os.getenv("BROWSE_LISTING_CACHE_SIZE", "128")))
+
+# /query context: retrieved chunks and the relevant parts of the context file, packed into a token budget
+QUERY_CONTEXT_TOKENS = int(os.getenv("QUERY_CONTEXT_TOKENS", "8000"))
+QUERY_CONTEXT_FILE_SHARE = float(os.getenv("QUERY_CONTEXT_FILE_SHARE", "0.5"))
+QUERY_TOP_K = int(os.getenv("QUERY_TOP_K", "8"))
+QUERY_FILE_CHUNKS = 5
 
-# Global ctags data cache
-ctags_data = {}
+# Trigram index built by run_indexing.py; GET /search falls back to a full walk without it
+TRIGRAM_DB_PATH = "./data/trigrams.db"
+trigram_index = TrigramIndex(TRIGRAM_DB_PATH)
+
+# In-memory index of repository paths for file name search, refreshed in the background
+PATH_INDEX_REFRESH_SECONDS = float(os.getenv("PATH_INDEX_REFRESH_SECONDS", "30"))
+path_index = PathIndex(REPO_PATH)
+
+# Global ctags symbol index: memory-mapped symbol table plus updates from the watcher
+ctags_data = SymbolIndex()
+# Directory holding the tags file generated by run_indexing.py (and its symbol table sidecar)
+CTAGS_DATA_DIR = os.getenv("CTAGS_DATA_DIR", "./data")
+CTAGS_TAGS_PATH = tags_file_path(CTAGS_DATA_DIR)
 
 # Global variable to store the summarized codebase
 codebase_summary = ""
 
+# Per-file sections of the codebase summary, in walk order; codebase_summary is their concatenation
+summary_fragments = {}
+# Fragments persisted across restarts, keyed by path and validated by mtime/hash
+SUMMARY_DB_PATH = "./data/summaries.db"
+SUMMARY_EXTENSIONS = ['.py', '.js', '.jsx', '.ts', '.tsx', '.java']
+
+# Databases written by run_indexing.py, updated in place by the repository watcher
+DEFINITIONS_DB_PATH = "./data/definitions.db"
+MANIFEST_DB_PATH = "./data/manifest.db"
+
+# Optional live watcher keeping all indexes fresh while the server runs
+WATCH_REPO = os.getenv("WATCH_REPO", "false").lower() in ("1", "true", "yes")
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", "1.0"))
+WATCH_POLLING = os.getenv("WATCH_POLLING", "false").lower() in ("1", "true", "yes")
+WATCH_POLL_SECONDS = float(os.getenv("WATCH_POLL_SECONDS", "5.0"))
+repo_watcher = None
+
+# Incremented whenever the watcher updates an index; caches key on it
+index_version = 0
+
+# Warm-up state of the components loaded in the background after the server starts accepting requests
+STARTUP_COMPONENTS = ["embeddings", "llm", "summary", "ctags", "path_index"] + (["watcher"] if WATCH_REPO else [])
+readiness = Readiness(STARTUP_COMPONENTS)
+background_tasks = []
+
 # Function to load ctags data
 def load_ctags_data():
-    """Load ctags data from the tags file and store in global cache"""
+    """Load the ctags symbol table and store in global cache"""
     global ctags_data
     try:
         print("Loading ctags data...")
-        ctags_data = parse_ctags_json()
+        tags_path = CTAGS_TAGS_PATH
+        generated = os.path.exists(tags_path) or os.path.exists(symbol_table_path(tags_path))
+        if not generated and os.path.exists(TAGS_FILE_NAME):
+            # Tags generated before the file moved into the data directory
+            print(f"Using legacy tags file ./{TAGS_FILE_NAME}; re-run indexing to move it to {CTAGS_DATA_DIR}")
+            tags_path = TAGS_FILE_NAME
+        ctags_data = load_symbol_index(tags_path)
         print(f"Loaded {len(ctags_data)} symbols from ctags")
     except Exception as e:
         print(f"Error loading ctags data: {str(e)}")
-        ctags_data = {}
+        ctags_data = SymbolIndex()
+    return len(ctags_data)
 
 def find_definitions(file_path: Path, content: str):
     """
@@ -155,51 +290,390 @@ def find_definitions(file_path: Path, content: str):
     
     return definitions
 
-def summarize_codebase(repo_path: str) -> str:
+def summarize_content(full_path: Path, rel_path: str, content: str) -> str:
+    """
+    Build the summary section for a single file: its definitions and file-level docstring.
+    """
+    parts = [f"\n--- File: {rel_path} ---\n"]
+    
+    # Extract function and class definitions
+    definitions = find_definitions(full_path, content)
+    for definition in definitions:
+        parts.append(f"{definition['type'].capitalize()} {definition['name']} (Line {definition['line_number']})\n")
+    
+    # Extract file-level docstrings or comments
+    if content.strip().startswith('"""') or content.strip().startswith("'''"):
+        docstring_end = content.find('"""', 3) if '"""' in content[3:] else content.find("'''", 3)
+        if docstring_end != -1:
+            parts.append(f"Docstring: {content[:docstring_end+3].strip()}\n")
+    return "".join(parts)
+
+def summarize_file(full_path: Path, rel_path: str, store: SummaryStore):
+    """
+    Return the summary section for a file, reusing the stored fragment unless the file changed.
+    Returns (fragment, recomputed).
+    """
+    stat_result = os.stat(full_path)
+    entry = store.get(rel_path)
+    if entry and entry[0] == stat_result.st_size and entry[1] == stat_result.st_mtime_ns:
+        return entry[3], False
+    content_hash, content = read_file_for_indexing(full_path)
+    if entry and entry[2] == content_hash:
+        # Touched but not modified
+        store.put(rel_path, stat_result, content_hash, entry[3])
+        return entry[3], False
+    fragment = summarize_content(full_path, rel_path, content)
+    store.put(rel_path, stat_result, content_hash, fragment)
+    return fragment, True
+
+def open_summary_store() -> SummaryStore:
+    Path(SUMMARY_DB_PATH).parent.mkdir(parents=True, exist_ok=True)
+    return SummaryStore(SUMMARY_DB_PATH)
+
+def summarize_codebase(repo_path: str, on_progress=None) -> str:
     """
     Summarize the codebase by extracting key information such as function and class definitions,
     docstrings, and file-level comments.
+    Per-file sections are kept in summary_fragments so single files can be refreshed later, and
+    persisted in the summary store so only files changed since the last run are re-summarized.
+    on_progress, if given, is called with the number of files summarized so far.
     """
-    summary = ""
+    global summary_fragments
+    fragments = {}
+    recomputed = 0
+    store = open_summary_store()
     try:
         for root, dirs, files in os.walk(repo_path):
             for file in files:
+                # Skip unsupported file types
+                if os.path.splitext(file)[1].lower() not in SUMMARY_EXTENSIONS:
+                    continue
                 full_path = Path(root) / file
-                if full_path.is_file():
-                    try:
-                        # Skip unsupported file types
-                        if full_path.suffix.lower() not in ['.py', '.js', '.jsx', '.ts', '.tsx', '.java']:
-                            print(f"Skipping unsupported file type: {full_path}")
-                            continue
-                        
-                        content = full_path.read_text(encoding='utf-8', errors='ignore')
-                        summary += f"\n--- File: {full_path.relative_to(repo_path)} ---\n"
-                        
-                        # Extract function and class definitions
-                        definitions = find_definitions(full_path, content)
-                        for definition in definitions:
-                            summary += f"{definition['type'].capitalize()} {definition['name']} (Line {definition['line_number']})\n"
-                        
-                        # Extract file-level docstrings or comments
-                        if content.strip().startswith('"""') or content.strip().startswith("'''"):
-                            docstring_end = content.find('"""', 3) if '"""' in content[3:] else content.find("'''", 3)
-                            if docstring_end != -1:
-                                summary += f"Docstring: {content[:docstring_end+3].strip()}\n"
-                    except Exception as e:
-                        print(f"Error summarizing file {full_path}: {str(e)}")
+                try:
+                    rel_path = str(full_path.relative_to(repo_path)).replace('\\', '/')
+                    fragments[rel_path], changed = summarize_file(full_path, rel_path, store)
+                    recomputed += changed
+                    if on_progress and len(fragments) % 100 == 0:
+                        on_progress(len(fragments))
+                except Exception as e:
+                    print(f"Error summarizing file {full_path}: {str(e)}")
+        # Forget files deleted since the last run
+        store.retain(fragments)
     except Exception as e:
         print(f"Error summarizing codebase: {str(e)}")
-    return summary
+    finally:
+        store.close()
+    print(f"Summarized {len(fragments)} files ({recomputed} new or changed)")
+    summary_fragments = fragments
+    return "".join(fragments.values())
+
+def refresh_summary_fragments(changed: set, deleted: set):
+    """Re-summarize changed files and drop deleted ones, in memory and in the summary store"""
+    store = open_summary_store()
+    try:
+        for rel_path in deleted:
+            summary_fragments.pop(rel_path, None)
+            store.remove(rel_path)
+        for rel_path in changed:
+            full_path = Path(REPO_PATH) / rel_path
+            if full_path.suffix.lower() in SUMMARY_EXTENSIONS:
+                try:
+                    summary_fragments[rel_path], _ = summarize_file(full_path, rel_path, store)
+                except Exception as e:
+                    print(f"Error summarizing file {full_path}: {str(e)}")
+    finally:
+        store.close()
+
+def scoped_summary(directory: str) -> tuple:
+    """
+    Concatenate the summary sections of the files under a directory (relative to the repository).
+    Returns (summary, number of files).
+    """
+    prefix = directory.strip('/').replace('\\', '/')
+    prefix = prefix + '/' if prefix else ''
+    fragments = [fragment for rel_path, fragment in list(summary_fragments.items()) if rel_path.startswith(prefix)]
+    return "".join(fragments), len(fragments)
+
+def update_embeddings_and_definitions(changed: set, deleted: set):
+    """Re-chunk, re-embed and re-extract definitions (and BM25 terms) for changed files; drop deleted ones"""
+    if embedding_collection is None or embedding_model is None:
+        print("Skipping embedding update: database or embedding model not initialized")
+        return
+    if not Path(MANIFEST_DB_PATH).parent.exists():
+        print("Skipping embedding update: repository has not been indexed")
+        return
+    manifest = FileManifest(MANIFEST_DB_PATH)
+    definitions_db = sqlite3.connect(DEFINITIONS_DB_PATH)
+    pending_manifest = {}
+    
+    def mark_indexed(rel_path):
+        manifest.update(rel_path, *pending_manifest.pop(rel_path))
+    
+    # Only keep the vector store current once run_indexing.py has filled it
+    vectors = vector_store if vector_store.exists() else None
+    # Chunks of an edited file that did not change are served from run_indexing.py's embedding cache
+    embedding_cache = EmbeddingCache(EMBEDDING_CACHE_DB_PATH, model_name=EMBEDDING_MODEL_NAME)
+    writer = EmbeddingWriter(
+        embedding_model, embedding_collection, on_file_complete=mark_indexed, vector_store=vectors, cache=embedding_cache
+    )
+    bm25_writer = bm25_index.writer() if bm25_index.exists() else None
+    try:
+        for rel_path in sorted(deleted):
+            embedding_collection.delete(where={"file_path": rel_path})
+            if vectors is not None:
+                vectors.delete(where={"file_path": rel_path})
+            definitions_db.execute("DELETE FROM definitions WHERE file_path = ?", (rel_path,))
+            if bm25_writer is not None:
+                bm25_writer.remove_file(rel_path)
+            manifest.remove(rel_path)
+        
+        for rel_path in sorted(changed):
+            full_path = os.path.join(REPO_PATH, rel_path)
+            if not should_index_file(full_path):
+                continue
+            stat_result = stat_file(full_path)
+            if stat_result is None:
+                continue
+            previous = manifest.get(rel_path)
+            status, content_hash, chunks, file_definitions = process_file(
+                full_path, rel_path, previous[2] if previous else None
+            )
+            if status == 'error':
+                print(f"Error processing {rel_path}: {content_hash}")
+                continue
+            if status == 'touched':
+                manifest.update(rel_path, stat_result, content_hash)
+                continue
+            
+            embedding_collection.delete(where={"file_path": rel_path})
+            if vectors is not None:
+                vectors.delete(where={"file_path": rel_path})
+            definitions_db.execute("DELETE FROM definitions WHERE file_path = ?", (rel_path,))
+            definitions_db.executemany(
+                "INSERT INTO definitions (name, file_path, line_number, type) VALUES (?, ?, ?, ?)",
+                [(d['name'], d['file_path'], d['line_number'], d['type']) for d in file_definitions]
+            )
+            pending_manifest[rel_path] = (stat_result, content_hash)
+            ids, documents, metadatas = chunk_records(rel_path, chunks)
+            if bm25_writer is not None:
+                bm25_writer.remove_file(rel_path)
+                bm25_writer.add_file(rel_path, ids, documents)
+            writer.add_file(rel_path, ids, documents, metadatas)
+        writer.close()
+        definitions_db.commit()
+        if writer.chunks_written:
+            print(f"Re-embedded changed files: {embedding_cache.stats_message()}")
+        if vectors is not None and vectors.write_snapshot_if_stale():
+            print("Rewrote the vector snapshot after accumulated changes")
+    finally:
+        if bm25_writer is not None:
+            bm25_writer.close()
+        embedding_cache.close()
+        definitions_db.close()
+        manifest.close()
+
+def update_ctags_entries(changed: set, deleted: set):
+    """Replace the ctags entries of changed files and drop those of deleted files"""
+    if not ctags_data:
+        return
+    # ctags records paths as given on its command line: absolute when REPO_PATH is absolute
+    stale_paths = set()
+    for rel_path in changed | deleted:
+        stale_paths.update({rel_path, f"./{rel_path}", os.path.join(REPO_PATH, rel_path)})
+    changed_files = [os.path.join(REPO_PATH, rel_path) for rel_path in sorted(changed)]
+    ctags_data.replace_files(stale_paths, run_ctags_for_files(REPO_PATH, changed_files))
+
+def apply_repository_changes(changed: set, deleted: set):
+    """
+    Called by the repository watcher with a debounced batch of changes.
+    Updates chunks, definitions, ctags entries, summary sections, the trigram and path indexes,
+    then bumps index_version so caches keyed on it are invalidated.
+    """
+    global codebase_summary, index_version
+    start_time = time.time()
+    print(f"Applying repository changes: {len(changed)} changed, {len(deleted)} deleted")
+    
+    try:
+        update_embeddings_and_definitions(changed, deleted)
+    except Exception as e:
+        print(f"Error updating embeddings and definitions: {str(e)}")
+    
+    try:
+        if trigram_index.exists():
+            trigram_index.update(REPO_PATH, changed | deleted)
+    except Exception as e:
+        print(f"Error updating trigram index: {str(e)}")
+    
+    try:
+        if path_index.ready:
+            path_index.update_paths(added=changed, removed=deleted)
+    except Exception as e:
+        print(f"Error updating path index: {str(e)}")
+    
+    try:
+        update_ctags_entries(changed, deleted)
+    except Exception as e:
+        print(f"Error updating ctags entries: {str(e)}")
+    
+    try:
+        refresh_summary_fragments(changed, deleted)
+    except Exception as e:
+        print(f"Error updating summary: {str(e)}")
+    codebase_summary = "".join(summary_fragments.values())
+    
+    index_version += 1
+    # Results computed against the previous version can never be served again
+    search_result_cache.clear()
+    print(f"Index version {index_version}: applied changes in {time.time() - start_time:.2f}s")
+
+def load_embedding_store():
+    """Open the ChromaDB collection and load the embedding model (slow: imports torch)"""
+    global chroma_client, embedding_collection, embedding_model, search_collection
+    import chromadb
+    from sentence_transformers import SentenceTransformer
+    print(f"Initializing ChromaDB PersistentClient with DB_PATH: {DB_PATH}")
+    client = chromadb.PersistentClient(path=DB_PATH)
+    collection = client.get_collection("code_embeddings")
+    # Check if the embedding collection is populated
+    chunk_count = collection.count()
+    if chunk_count == 0:
+        print("Warning: The embedding collection is empty. Ensure embeddings are indexed properly.")
+    # Load the same model used for indexing
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    search = collection
+    if VECTOR_BACKEND == "numpy":
+        if not vector_store.exists():
+            raise RuntimeError(f"VECTOR_BACKEND=numpy but {EMBEDDINGS_DB_PATH} holds no vectors; run run_indexing.py first")
+        search = vector_store
+        chunk_count = vector_store.count()
+    chroma_client, embedding_collection, embedding_model, search_collection = client, collection, model, search
+    return f"{chunk_count} chunks"
+
+def load_language_model():
+    """Configure the language model behind /query"""
+    global qa_model, llm_backend
+    if LLM_BACKEND == "fake":
+        llm_backend = FakeLLMBackend(delay=float(os.getenv("FAKE_LLM_DELAY", "0.05")))
+        return "fake backend"
+    if not GOOGLE_API_KEY:
+        raise RuntimeError("GOOGLE_API_KEY not set. Gemini API will not be available.")
+    import google.generativeai as genai
+    genai.configure(api_key=GOOGLE_API_KEY)
+    qa_model = genai.GenerativeModel('gemini-1.5-flash')
+    llm_backend = GeminiBackend(qa_model)
+    return "gemini-1.5-flash"
+
+def build_codebase_summary():
+    """Generate the codebase summary, reporting progress to the readiness tracker"""
+    global codebase_summary
+    codebase_summary = summarize_codebase(
+        REPO_PATH,
+        on_progress=lambda count: readiness.progress("summary", count, f"{count} files summarized")
+    )
+    return f"{len(summary_fragments)} files"
+
+def build_path_index():
+    path_index.build()
+    return f"{len(path_index)} files"
+
+async def warm_up(name: str, loader, executor=None):
+    """Run one startup loader off the event loop and record the outcome in the readiness tracker"""
+    readiness.start(name)
+    try:
+        detail = await run_blocking(executor or IO_POOL, loader)
+        readiness.ready(name, detail)
+        print(f"Startup: {name} ready ({detail})")
+    except Exception as e:
+        print(f"Warning: Could not load {name}: {str(e)}")
+        readiness.failed(name, e)
+
+async def warm_up_components():
+    """Load every component concurrently, then start the tasks that keep them fresh"""
+    await asyncio.gather(
+        warm_up("embeddings", load_embedding_store, MODEL_POOL),
+        warm_up("llm", load_language_model),
+        warm_up("summary", build_codebase_summary),
+        warm_up("ctags", lambda: f"{load_ctags_data()} symbols"),
+        warm_up("path_index", build_path_index),
+    )
+    if path_index.ready:
+        background_tasks.append(asyncio.create_task(refresh_path_index_periodically()))
+    # The watcher updates the components above, so it starts once they are loaded
+    if WATCH_REPO:
+        await warm_up("watcher", start_repository_watcher)
 
-# Load ctags data and generate codebase summary at startup
 @app.on_event("startup")
 async def startup_event():
-    """Run when the server starts up"""
-    global codebase_summary
-    print("Generating codebase summary during startup...")
-    codebase_summary = summarize_codebase(REPO_PATH)
-    print("Codebase summary generated.")
-    load_ctags_data()
+    """Start loading components in the background; requests are accepted right away"""
+    background_tasks.append(asyncio.create_task(warm_up_components()))
+
+def start_repository_watcher():
+    """Start the optional file watcher that applies changes to every index in the background"""
+    global repo_watcher
+    repo_watcher = RepositoryWatcher(
+        REPO_PATH,
+        apply_repository_changes,
+        debounce=WATCH_DEBOUNCE_SECONDS,
+        poll_interval=WATCH_POLL_SECONDS,
+        use_polling=WATCH_POLLING
+    )
+    repo_watcher.start()
+    return repo_watcher.mode
+
+def require_component(name: str, feature: str):
+    """Answer 503 (retry later) while a component the endpoint needs is still loading"""
+    if readiness.is_loading(name):
+        raise HTTPException(
+            status_code=503,
+            detail=f"{feature} is not available yet: {name} is still loading",
+            headers={"Retry-After": "5"}
+        )
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers when the server shuts down"""
+    for task in background_tasks:
+        task.cancel()
+    if repo_watcher is not None:
+        repo_watcher.stop()
+    if search_process_pool is not None:
+        search_process_pool.shutdown(wait=False, cancel_futures=True)
+    for pool in (IO_POOL, MODEL_POOL, LLM_POOL):
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def get_search_process_pool():
+    """Return the process pool for content matching, starting it on first use (None when disabled)"""
+    global search_process_pool
+    if search_process_pool is None and SEARCH_WORKERS > 0:
+        # Spawned workers only import indexing.content_search, not the embedding model
+        search_process_pool = ProcessPoolExecutor(
+            max_workers=SEARCH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return search_process_pool
+
+def limited(limiter: ConcurrencyLimiter):
+    """Run an endpoint under a concurrency limiter, answering 503 when its queue is full"""
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            try:
+                async with limiter:
+                    return await endpoint(*args, **kwargs)
+            except Overloaded as e:
+                raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        return wrapper
+    return decorator
+
+async def refresh_path_index_periodically():
+    """Keep the path index current by re-listing directories whose mtime changed"""
+    while True:
+        await asyncio.sleep(PATH_INDEX_REFRESH_SECONDS)
+        try:
+            if await run_blocking(IO_POOL, path_index.refresh):
+                print(f"Path index refreshed: {len(path_index)} files")
+        except Exception as e:
+            print(f"Error refreshing path index: {str(e)}")
 
 # Define Pydantic models
 class SearchQuery(BaseModel):
@@ -214,7 +688,25 @@ async def root():
     return {"message": "Code Navigator Backend Ready"}
 
 @app.get("/browse/{sub_path:path}")
-async def browse_repository(sub_path: str = ""):
+@limited(browse_limiter)
+async def browse_repository(
+    request: Request,
+    sub_path: str = "",
+    start_line: Optional[int] = Query(None, ge=1, description="First line to return (1-based)"),
+    end_line: Optional[int] = Query(None, ge=1, description="Last line to return (inclusive)"),
+    offset: Optional[int] = Query(None, ge=0, description="First byte to return"),
+    length: Optional[int] = Query(None, ge=0, description="Number of bytes to return"),
+    cursor: Optional[str] = Query(None, description="Directory page to continue from (next_cursor of the previous page)"),
+    limit: Optional[int] = Query(None, ge=1, le=5000, description="Directory entries per page"),
+    name_filter: Optional[str] = Query(None, alias="filter", description="Only directory entries whose name contains this text")
+):
+    """
+    List a directory one page at a time (directories first, then by name), or return
+    a file's content (optionally a line or byte range of it).
+    
+    File responses carry ETag and Last-Modified headers; a matching If-None-Match
+    (or If-Modified-Since) gets a 304 without the file being read.
+    """
     # Print debugging information
     print(f"Received browse request for path: {sub_path}")
     print(f"Full REPO_PATH: {REPO_PATH}")
@@ -224,58 +716,58 @@ async def browse_repository(sub_path: str = ""):
     try:
         # Construct the full target path
         target_path = Path(REPO_PATH) / sub_path
-        print(f"Target path: {target_path}, exists: {target_path.exists()}")
+        try:
+            target_stat = await run_blocking(IO_POOL, target_path.stat)
+        except OSError:
+            target_stat = None
+        print(f"Target path: {target_path}, exists: {target_stat is not None}")
         # Check if the path exists
-        if not target_path.exists():
+        if target_stat is None:
             error_msg = f"Path not found: {sub_path}"
             print(f"Error: {error_msg}")
             raise HTTPException(status_code=404, detail=error_msg)
         # Handle directory
-        if target_path.is_dir():
+        if stat.S_ISDIR(target_stat.st_mode):
             try:
-                items = []
                 print(f"Reading directory: {target_path}")
-                for item in target_path.iterdir():
-                    # Skip hidden files (starting with .)
-                    if not item.name.startswith('.'):
-                        items.append({
-                            "name": item.name,
-                            "is_dir": item.is_dir()
-                        })
-                print(f"Found {len(items)} items in directory")
+                page = await run_blocking(
+                    IO_POOL, directory_listings.page, target_path, target_stat,
+                    cursor=cursor, limit=limit or BROWSE_PAGE_SIZE, name_filter=name_filter
+                )
+                print(f"Returning {len(page['items'])} of {page['total']} items in directory")
                 return JSONResponse({
                     "path": sub_path,
-                    "items": items
+                    **page
                 })
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
             except Exception as e:
                 error_msg = f"Error reading directory: {str(e)}"
                 print(f"Error: {error_msg}")
                 raise HTTPException(status_code=500, detail=error_msg)
         # Handle file
-        elif target_path.is_file():
+        elif stat.S_ISREG(target_stat.st_mode):
+            if (start_line is not None or end_line is not None) and (offset is not None or length is not None):
+                raise HTTPException(status_code=400, detail="Request either a line range or a byte range, not both")
+            headers = validator_headers(target_stat)
+            if is_not_modified(
+                target_stat,
+                request.headers.get("if-none-match"),
+                request.headers.get("if-modified-since")
+            ):
+                return Response(status_code=304, headers=headers)
             try:
                 print(f"Reading file: {target_path}")
-                # Skip binary files or very large files
-                if target_path.stat().st_size > 1024 * 1024:  # Skip files larger than 1MB
-                    error_msg = f"File too large to display: {sub_path}"
-                    print(f"Warning: {error_msg}")
-                    return JSONResponse({
-                        "path": sub_path,
-                        "content": f"File too large to display. Size: {target_path.stat().st_size / 1024:.1f} KB"
-                    })
-                content = target_path.read_text(encoding='utf-8', errors='replace')
-                return JSONResponse({
-                    "path": sub_path,
-                    "content": content
-                })
-            except UnicodeDecodeError:
-                # Handle binary files
-                error_msg = f"Cannot display binary file: {sub_path}"
-                print(f"Warning: {error_msg}")
-                return JSONResponse({
-                    "path": sub_path,
-                    "content": "This appears to be a binary file and cannot be displayed."
-                })
+                file_range = await run_blocking(
+                    IO_POOL, read_file_range, target_path, target_stat,
+                    start_line=start_line, end_line=end_line, offset=offset, length=length,
+                    max_bytes=BROWSE_MAX_BYTES, line_index_cache=browse_line_index_cache
+                )
+                if file_range["binary"]:
+                    print(f"Warning: Cannot display binary file: {sub_path}")
+                elif file_range["truncated"]:
+                    print(f"Returning part of {sub_path} ({file_range['end_offset'] - file_range['offset']} of {file_range['size']} bytes)")
+                return JSONResponse({"path": sub_path, **file_range}, headers=headers)
             except Exception as e:
                 error_msg = f"Error reading file: {str(e)}"
                 print(f"Error: {error_msg}")
@@ -294,156 +786,248 @@ async def browse_repository(sub_path: str = ""):
         print(f"Error: {error_msg}")
         raise HTTPException(status_code=500, detail=error_msg)
 
+async def vector_candidates(query_text: str, cache_query: str) -> list:
+    """Nearest chunks to the query embedding, as (chunk_id, document, metadata, distance), best first"""
+    # The embedding depends only on the model, not the index
+    embedding_key = (EMBEDDING_MODEL_NAME, cache_query)
+    query_embedding = query_embedding_cache.get(embedding_key)
+    if query_embedding is None:
+        query_embedding = (await run_blocking(MODEL_POOL, embedding_model.encode, query_text)).tolist()
+        query_embedding_cache.put(embedding_key, query_embedding)
+    
+    results = await run_blocking(
+        MODEL_POOL,
+        search_collection.query,
+        query_embeddings=[query_embedding],
+        n_results=SEMANTIC_SEARCH_CANDIDATES,
+        include=['documents', 'metadatas', 'distances']
+    )
+    if not all(key in results for key in ['ids', 'documents', 'metadatas', 'distances']):
+        raise HTTPException(status_code=500, detail="Unexpected response format from database")
+    return list(zip(results['ids'][0], results['documents'][0], results['metadatas'][0], results['distances'][0]))
+
+async def lexical_candidates(query_text: str) -> list:
+    """Best BM25 matches for the query, as (chunk_id, file_path, score); empty without a BM25 index"""
+    try:
+        return await run_blocking(IO_POOL, bm25_index.search, query_text, SEMANTIC_SEARCH_CANDIDATES)
+    except Exception as e:
+        # Vector results alone are still worth returning
+        print(f"Error querying BM25 index: {str(e)}")
+        return []
+
+def best_snippet(document: str, query_terms: list) -> str:
+    """The chunk text, or for long chunks a window around the first occurrence of a query term"""
+    if len(document) <= 500:
+        return document
+    normalized_document = document.lower()
+    best_pos = -1
+    for term in query_terms:
+        pos = normalized_document.find(term)
+        if pos != -1 and (best_pos == -1 or pos < best_pos):
+            best_pos = pos
+    if best_pos == -1:
+        return document
+    # Extract a window of text centered around the first occurrence
+    start = max(0, best_pos - 150)
+    end = min(len(document), best_pos + 350)
+    snippet = document[start:end]
+    # Add ellipsis if we're not showing the full document
+    if start > 0:
+        snippet = "..." + snippet
+    if end < len(document):
+        snippet = snippet + "..."
+    return snippet
+
 @app.post("/search")
+@limited(semantic_search_limiter)
 async def search_code(search_query: SearchQuery):
+    require_component("embeddings", "Semantic search")
     try:
         # Get query text from request body
         query_text = search_query.query
         
         # Check if ChromaDB and model are initialized
-        if 'embedding_collection' not in globals() or 'embedding_model' not in globals():
+        if search_collection is None or embedding_model is None:
             raise HTTPException(
                 status_code=500, 
                 detail="Search functionality is not available. Database or embedding model not initialized."
             )
         
-        # Generate embedding for the query
-        query_embedding = embedding_model.encode(query_text).tolist()
+        # Serve repeated searches from the result cache; entries are keyed on the index version
+        cache_query = normalize_query(query_text)
+        result_key = (cache_query, index_version)
+        cached_results = search_result_cache.get(result_key)
+        if cached_results is not None:
+            return [{**result, 'query': query_text} for result in cached_results]
         
-        # Query ChromaDB collection - fetch more results initially for filtering
-        results = embedding_collection.query(
-            query_embeddings=[query_embedding],
-            n_results=30,  # Fetch more results than we need to allow for filtering
-            include=['documents', 'metadatas', 'distances']
+        # Vector and BM25 candidates are fetched concurrently, then merged by rank
+        vector_hits, lexical_hits = await asyncio.gather(
+            vector_candidates(query_text, cache_query),
+            lexical_candidates(query_text)
         )
+        fused = reciprocal_rank_fusion(
+            {
+                "vector": [chunk_id for chunk_id, _, _, _ in vector_hits],
+                "lexical": [chunk_id for chunk_id, _, _ in lexical_hits],
+            },
+            k=RRF_K
+        )[:SEMANTIC_SEARCH_RESULTS]
         
-        # Process the results
-        processed_results = []
-        # Check if results contain expected keys
-        if not all(key in results for key in ['documents', 'metadatas', 'distances']):
-            raise HTTPException(status_code=500, detail="Unexpected response format from database")
-        
-        # Normalize query for case-insensitive matching
-        normalized_query = query_text.lower()
-        query_terms = normalized_query.split()
+        # Chunks found only by BM25 still need their text and metadata
+        chunks = {chunk_id: (document, metadata, distance) for chunk_id, document, metadata, distance in vector_hits}
+        missing = [chunk_id for chunk_id, _, _ in fused if chunk_id not in chunks]
+        if missing:
+            fetched = await run_blocking(
+                MODEL_POOL, search_collection.get, ids=missing, include=['documents', 'metadatas']
+            )
+            for chunk_id, document, metadata in zip(fetched['ids'], fetched['documents'], fetched['metadatas']):
+                chunks[chunk_id] = (document, metadata, None)
         
-        # Extract and format results
-        for i in range(len(results['documents'][0])):
-            try:
-                document = results['documents'][0][i]
-                metadata = results['metadatas'][0][i]
-                distance = results['distances'][0][i] if 'distances' in results else None
-                
-                # Check if the document contains any of the query terms (case-insensitive)
-                normalized_document = document.lower()
-                
-                # Calculate a keyword match score (0-1)
-                keyword_match_score = 0
-                term_matches = 0
-                for term in query_terms:
-                    if term in normalized_document:
-                        term_matches += 1
-                
-                if query_terms:
-                    keyword_match_score = term_matches / len(query_terms)
-                
-                # Only include results that have at least one query term
-                if term_matches > 0:
-                    # Calculate a combined relevance score
-                    # - Lower distance means better semantic match (so we use 1-distance)
-                    # - Higher keyword_match_score means better keyword match
-                    semantic_score = 1 - (distance or 0)
-                    combined_score = (semantic_score * 0.6) + (keyword_match_score * 0.4)
-                    
-                    # Find the best snippet that contains the query
-                    snippet = document
-                    if len(document) > 500:
-                        # If document is long, try to find a better snippet that includes query terms
-                        best_pos = -1
-                        for term in query_terms:
-                            pos = normalized_document.find(term)
-                            if pos != -1 and (best_pos == -1 or pos < best_pos):
-                                best_pos = pos
-                        
-                        if best_pos != -1:
-                            # Extract a window of text centered around the first occurrence
-                            start = max(0, best_pos - 150)
-                            end = min(len(document), best_pos + 350)
-                            snippet = document[start:end]
-                            # Add ellipsis if we're not showing the full document
-                            if start > 0:
-                                snippet = "..." + snippet
-                            if end < len(document):
-                                snippet = snippet + "..."
-                    
-                    processed_results.append({
-                        'file_path': metadata.get('file_path', 'Unknown'),
-                        'content': snippet,
-                        'start_char': metadata.get('start_char', 0),
-                        'end_char': metadata.get('end_char', 0),
-                        'distance': distance,
-                        'score': combined_score,
-                        'query': query_text  # Include original query for highlighting
-                    })
-            except (IndexError, KeyError) as e:
-                print(f"Error processing result {i}: {str(e)}")
+        query_terms = query_text.lower().split()
+        # Scores are scaled so a chunk ranked first by both retrievers scores 1
+        best_score = 2 / (RRF_K + 1)
+        processed_results = []
+        for chunk_id, score, ranks in fused:
+            if chunk_id not in chunks:
+                # Removed from the collection since the BM25 index was last updated
                 continue
+            document, metadata, distance = chunks[chunk_id]
+            processed_results.append({
+                'file_path': metadata.get('file_path', 'Unknown'),
+                'content': best_snippet(document, query_terms),
+                'start_char': metadata.get('start_char', 0),
+                'end_char': metadata.get('end_char', 0),
+                # Chunks indexed before line spans were stored have none
+                'start_line': metadata.get('start_line'),
+                'end_line': metadata.get('end_line'),
+                'distance': distance,
+                'score': score / best_score,
+                'ranks': ranks,
+                'query': query_text  # Include original query for highlighting
+            })
         
-        # Sort results by combined score (higher is better)
-        processed_results.sort(key=lambda x: x.get('score', 0), reverse=True)
-        
-        # Limit to top 10 results
-        processed_results = processed_results[:10]
-        
-        return processed_results
+        search_result_cache.put(result_key, processed_results)
+        return [dict(result) for result in processed_results]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error performing search: {str(e)}")
 
-@app.post("/query")
-async def answer_code_question(query_request: QueryRequest):
+def assemble_query_context(question: str, context_file_path: Optional[str], retrieved: dict, file_chunk_texts: list):
+    """
+    Pack the /query context into the token budget, most specific first: the context file
+    (whole if it fits its share, otherwise the line ranges the index and the question point at),
+    the retrieved chunks, then the summary sections of the files they come from.
+    Returns the ContextPacker holding the sections.
+    """
+    packer = ContextPacker(QUERY_CONTEXT_TOKENS)
+    terms = question_terms(question)
+    file_contents = {}
+    
+    def read(rel_path):
+        if rel_path not in file_contents:
+            try:
+                file_contents[rel_path] = (Path(REPO_PATH) / rel_path).read_text(encoding='utf-8', errors='ignore')
+            except OSError:
+                file_contents[rel_path] = None
+        return file_contents[rel_path]
+    
+    # Step 1: Relevant parts of the specific file, if provided
+    context_file_content = None
+    if context_file_path:
+        context_file_content = read(context_file_path)
+        if context_file_content is None:
+            print(f"Requested context file does not exist: {context_file_path}")
+        else:
+            file_cap = int(QUERY_CONTEXT_TOKENS * QUERY_CONTEXT_FILE_SHARE)
+            whole_file = f"\n--- Specific File Context: {context_file_path} ---\n\n```\n{context_file_content}\n```\n"
+            if estimate_tokens(whole_file) <= packer.remaining('context_file', file_cap):
+                packer.add('context_file', whole_file, cap=file_cap)
+            else:
+                lines = context_file_content.split('\n')
+                ranges = merge_ranges(
+                    locate_chunks(context_file_content, file_chunk_texts) + keyword_windows(lines, terms)
+                )
+                if not ranges:
+                    # Nothing points anywhere in particular: start of the file (imports, module docs)
+                    ranges = [(1, min(len(lines), 60))]
+                for first, last in ranges:
+                    packer.add(
+                        'context_file',
+                        f"\n--- Specific File Context: {context_file_path} (lines {first}-{last}) ---\n\n" + render_lines(lines, first, last),
+                        cap=file_cap
+                    )
+    
+    # Step 2: Chunks retrieved for the question, best first
+    involved_files = []
+    documents = (retrieved.get('documents') or [[]])[0]
+    metadatas = (retrieved.get('metadatas') or [[]])[0]
+    for document, metadata in zip(documents, metadatas):
+        rel_path = metadata.get('file_path', 'Unknown')
+        if rel_path == context_file_path and context_file_content is not None:
+            continue  # Already covered by the context file section
+        label = rel_path
+        content = read(rel_path)
+        located = locate_chunks(content, [document]) if content else []
+        if located:
+            label += f" (lines {located[0][0]}-{located[0][1]})"
+        if packer.add('chunk', f"\n--- Relevant Code: {label} ---\n\n```\n{document}\n```\n"):
+            involved_files.append(rel_path)
+    
+    # Step 3: Summary sections (definitions, docstrings) of the files involved;
+    # without retrieved chunks, as much of the codebase summary as fits
+    summary_paths = involved_files if involved_files else list(summary_fragments)
+    if context_file_path:
+        summary_paths = [context_file_path] + summary_paths
+    for rel_path in dict.fromkeys(summary_paths):
+        fragment = summary_fragments.get(rel_path)
+        if fragment:
+            packer.add('summary', fragment)
+    return packer
+
+async def build_query_prompt(question: str, context_file_path: Optional[str]):
+    """
+    Assemble the Gemini prompt for a question from retrieved context within the token budget.
+    Returns (prompt, stats) where stats reports the prompt size and assembly time.
+    """
+    start_time = time.perf_counter()
+    print(f"Starting semantic search for question: {question}")
+    if context_file_path:
+        context_file_path = context_file_path.strip('/').replace('\\', '/')
+    
+    # Retrieve the chunks most similar to the question (and the best chunks of the context file)
+    retrieved = {}
+    file_chunk_texts = []
     try:
-        # Get query details
-        question = query_request.question
-        context_file_path = query_request.context_file_path
-        
-        # Check if API and model are available
-        if not GOOGLE_API_KEY or not qa_model:
-            raise HTTPException(
-                status_code=500,
-                detail="Gemini API is not configured. Please set the GOOGLE_API_KEY environment variable."
-            )
-        
-        # Check if embedding models are available
-        if 'embedding_collection' not in globals() or 'embedding_model' not in globals():
-            raise HTTPException(
-                status_code=500, 
-                detail="Search functionality is not available. Database or embedding model not initialized."
-            )
-        
-        # Initialize context
-        context_code = ""
-        print(f"Starting semantic search for question: {question}")
-        
-        # Step 1: Add pre-generated summarized codebase to the context
-        print("Adding pre-generated summarized codebase to the context...")
-        context_code += codebase_summary
-        
-        # Step 2: Add specific file context if provided
+        if search_collection is None or embedding_model is None:
+            raise RuntimeError("embedding store not loaded")
+        embedding_key = (EMBEDDING_MODEL_NAME, normalize_query(question))
+        query_embedding = query_embedding_cache.get(embedding_key)
+        if query_embedding is None:
+            query_embedding = (await run_blocking(MODEL_POOL, embedding_model.encode, question)).tolist()
+            query_embedding_cache.put(embedding_key, query_embedding)
+        retrieved = await run_blocking(
+            MODEL_POOL,
+            search_collection.query,
+            query_embeddings=[query_embedding],
+            n_results=QUERY_TOP_K,
+            include=['documents', 'metadatas']
+        )
         if context_file_path:
-            try:
-                full_path = Path(REPO_PATH) / context_file_path
-                print(f"Adding specific file context for: {context_file_path}")
-                if full_path.exists() and full_path.is_file():
-                    file_content = full_path.read_text(encoding='utf-8', errors='ignore')
-                    context_code += f"\n--- Specific File Context: {context_file_path} ---\n\n```\n{file_content}\n```\n"
-                else:
-                    print(f"Requested context file does not exist: {context_file_path}")
-            except Exception as e:
-                print(f"Error reading context file: {str(e)}")
-        
-        # Step 3: Construct prompt for Gemini
-        print(f"Constructing prompt for Gemini with context length: {len(context_code)} characters")
-        prompt = f"""System: You are an AI assistant analyzing a codebase. Use the following code context to answer the user's question. 
+            file_hits = await run_blocking(
+                MODEL_POOL,
+                search_collection.query,
+                query_embeddings=[query_embedding],
+                n_results=QUERY_FILE_CHUNKS,
+                where={"file_path": context_file_path},
+                include=['documents']
+            )
+            file_chunk_texts = (file_hits.get('documents') or [[]])[0]
+    except Exception as e:
+        print(f"Error retrieving context chunks: {str(e)}")
+    
+    packer = await run_blocking(IO_POOL, assemble_query_context, question, context_file_path, retrieved, file_chunk_texts)
+    context_code = packer.text()
+    
+    prompt = f"""System: You are an AI assistant analyzing a codebase. Use the following code context to answer the user's question. 
 If the context is insufficient, say so clearly and explain what information is missing.
 
 Code Context:
@@ -454,13 +1038,44 @@ Code Context:
 User Question: {question}
 
 Answer:"""
+    stats = {
+        **packer.stats(),
+        "prompt_tokens": estimate_tokens(prompt),
+        "prompt_chars": len(prompt),
+        "assembly_ms": round((time.perf_counter() - start_time) * 1000, 1),
+        "degraded": [name for name in ("embeddings", "summary") if not readiness.is_ready(name)],
+    }
+    print(
+        f"Query context: ~{stats['prompt_tokens']} tokens ({stats['prompt_chars']} chars) "
+        f"assembled in {stats['assembly_ms']}ms, sections {stats['sections']}"
+    )
+    return prompt, stats
+
+def check_query_available():
+    """
+    Raise if /query cannot be answered: the language model is loading (503) or not configured (500).
+    Without the embedding store or the summary, answers are built from whatever context is available.
+    """
+    require_component("llm", "Question answering")
+    # Check if API and model are available
+    if llm_backend is None:
+        raise HTTPException(
+            status_code=500,
+            detail="Gemini API is not configured. Please set the GOOGLE_API_KEY environment variable."
+        )
+
+@app.post("/query")
+@limited(query_limiter)
+async def answer_code_question(query_request: QueryRequest):
+    check_query_available()
+    try:
+        prompt, context_stats = await build_query_prompt(query_request.question, query_request.context_file_path)
         
         # Step 4: Call Gemini API
         try:
-            response = qa_model.generate_content(prompt)  # Sends the query to Gemini
-            answer = response.text
+            answer = await run_blocking(LLM_POOL, llm_backend.generate, prompt)  # Sends the query to Gemini
             
-            return {"answer": answer}
+            return {"answer": answer, "context": context_stats}
             
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error calling Gemini API: {str(e)}")
@@ -468,6 +1083,53 @@ Answer:"""
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/query/stream")
+async def stream_code_question(query_request: QueryRequest, request: Request):
+    """
+    Streaming variant of /query: answers arrive as Server-Sent Events.
+    
+    Events are `context` (prompt size and assembly time), `token` ({"text": ...}) for each piece of the answer as the model produces it,
+    then either `done` ({"chars": ..., "seconds": ...}) or `error` ({"detail": ...}).
+    Generation upstream is cancelled when the client disconnects.
+    """
+    check_query_available()
+    if query_limiter.is_full():
+        raise HTTPException(status_code=503, detail="Too many concurrent query requests, try again shortly", headers={"Retry-After": "1"})
+    
+    async def events():
+        cancelled = threading.Event()
+        start_time = time.time()
+        chars = 0
+        try:
+            # The slot is held for as long as the answer is streaming
+            async with query_limiter:
+                prompt, context_stats = await build_query_prompt(query_request.question, query_request.context_file_path)
+                yield sse_event("context", context_stats)
+                async for text in stream_in_executor(LLM_POOL, llm_backend, prompt, cancelled):
+                    if await request.is_disconnected():
+                        print("Client disconnected; cancelling answer generation")
+                        break
+                    chars += len(text)
+                    yield sse_event("token", {"text": text})
+                else:
+                    yield sse_event("done", {"chars": chars, "seconds": round(time.time() - start_time, 3)})
+        except Overloaded as e:
+            yield sse_event("error", {"detail": str(e)})
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Error calling Gemini API: {str(e)}"})
+        finally:
+            cancelled.set()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/index/definition/{symbol_name}")
 async def get_definition(symbol_name: str):
     """
@@ -478,23 +1140,114 @@ async def get_definition(symbol_name: str):
         A list of definitions for the symbol, or 404 if not found
     """
     # Check if we have ctags data
+    if readiness.is_loading("ctags"):
+        return JSONResponse(
+            status_code=503,
+            content={"message": "Ctags index is still loading. Try again shortly."},
+            headers={"Retry-After": "5"}
+        )
     if not ctags_data:
         # Try to load it if not already loaded
-        load_ctags_data()
+        await run_blocking(IO_POOL, load_ctags_data)
         if not ctags_data:
             return JSONResponse(
                 status_code=404,
                 content={"message": "Ctags index not available. Run indexing first."}
             )
     # Look up the symbol in the ctags data
-    if symbol_name in ctags_data:
-        return {"definitions": ctags_data[symbol_name]}
+    definitions = ctags_data.lookup(symbol_name)
+    if definitions:
+        return {"definitions": definitions}
     else:
         return JSONResponse(
             status_code=404,
             content={"message": f"Symbol '{symbol_name}' not found in the index"}
         )
 
+@app.get("/index/symbols")
+async def search_symbols(
+    q: str = Query(..., description="Symbol name, prefix, word, initials (e.g. 'gun' for getUserName) or fuzzy fragment"),
+    limit: int = Query(20, ge=1, le=200, description="Maximum number of symbols to return"),
+    kind: Optional[str] = Query(None, description="Only these ctags kinds (comma-separated, e.g. 'function,class')"),
+    path: Optional[str] = Query(None, description="Only definitions whose path contains this text"),
+    fuzzy: bool = Query(True, description="Fall back to fuzzy (subsequence) matches")
+):
+    """
+    Search symbol names in the ctags index for typeahead.
+
+    Matching is case-insensitive and camelCase/snake_case aware. Results are ranked:
+    exact name, prefix, word inside the name, word initials, substring, then fuzzy.
+    Each result carries the symbol's first matching definition and how many match.
+    """
+    if readiness.is_loading("ctags"):
+        return JSONResponse(
+            status_code=503,
+            content={"message": "Ctags index is still loading. Try again shortly."},
+            headers={"Retry-After": "5"}
+        )
+    kinds = [k.strip() for k in kind.split(',') if k.strip()] if kind else None
+    start_time = time.perf_counter()
+    results = await run_blocking(
+        IO_POOL, ctags_data.search, q, limit=limit, kinds=kinds, path=path or None, fuzzy=fuzzy
+    )
+    return {
+        "query": q,
+        "results": results,
+        "took_ms": round((time.perf_counter() - start_time) * 1000, 2)
+    }
+
+@app.get("/health/ready")
+async def health_ready():
+    """
+    Readiness probe: 200 once every background component has finished loading (503 before),
+    with the state, progress and load time of each component
+    """
+    ready = readiness.all_settled()
+    components = readiness.snapshot()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "degraded": [name for name, component in components.items() if component["state"] == "failed"],
+            "components": components
+        }
+    )
+
+@app.get("/summary")
+async def get_summary(
+    dir: Optional[str] = Query(None, description="Only summarize files under this directory")
+):
+    """Return the codebase summary (definitions and docstrings per file), optionally scoped to a subdirectory"""
+    require_component("summary", "The codebase summary")
+    summary, file_count = scoped_summary(dir or "")
+    return {"path": (dir or "").strip('/'), "files": file_count, "summary": summary}
+
+@app.get("/index/version")
+async def get_index_version():
+    """Return the current index version; it changes whenever the watcher updates an index"""
+    return {
+        "version": index_version,
+        "watcher": repo_watcher.mode if repo_watcher else None
+    }
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Return hit/miss statistics for the search and browse caches"""
+    return {
+        "index_version": index_version,
+        "caches": [query_embedding_cache.stats(), search_result_cache.stats(), browse_line_index_cache.stats(), directory_listings.stats()]
+    }
+
+@app.get("/concurrency/stats")
+async def get_concurrency_stats():
+    """Return active, queued and rejected request counts per endpoint limiter"""
+    return {
+        "limiters": [
+            limiter.stats()
+            for limiter in (browse_limiter, semantic_search_limiter, query_limiter, code_search_limiter)
+        ]
+    }
+
 @app.get("/config")
 async def get_config():
     """Return configuration information like the repository path"""
@@ -502,13 +1255,304 @@ async def get_config():
         "repo_path": REPO_PATH
     }
 
+def iter_repository_files(base_dir: Path, search_dir: Path):
+    """Walk the repository, yielding (full_path, rel_path_str, file_name) for every searchable file"""
+    for root, dirs, files in os.walk(search_dir):
+        # Skip hidden directories
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        # Skip common directories to ignore
+        dirs[:] = [d for d in dirs if d not in SEARCH_SKIP_DIRS]
+        
+        for file in files:
+            # Skip hidden files and non-text files like binaries
+            if file.startswith('.'):
+                continue
+            # Get the full path and relative path
+            full_path = Path(root) / file
+            rel_path = full_path.relative_to(base_dir)
+            rel_path_str = str(rel_path).replace('\\', '/')  # Normalize path separators
+            yield full_path, rel_path_str, file
+
+def iter_indexed_files(base_dir: Path, search_dir: Path, literal_groups):
+    """Yield the trigram index's candidate files for a query, restricted to search_dir"""
+    prefix = ""
+    if search_dir != base_dir:
+        prefix = str(search_dir.relative_to(base_dir)).replace('\\', '/') + "/"
+    for rel_path_str in trigram_index.candidates(literal_groups):
+        if prefix and not rel_path_str.startswith(prefix):
+            continue
+        yield base_dir / rel_path_str, rel_path_str, rel_path_str.rsplit('/', 1)[-1]
+
+def iter_file_search(base_dir: Path, search_dir: Path, code: bool, extensions, search_term: str,
+                     search_term_lower: str, search_pattern, is_quoted_string: bool, per_file: int = SEARCH_MATCHES_PER_FILE,
+                     stats: dict = None, cancelled: threading.Event = None):
+    """
+    Blocking part of GET /search: enumerate candidate files and yield each match as it is found.
+    Content matching runs on the search process pool in batches; results keep the walk order.
+    Each content result lists up to per_file matches with their line and column numbers.
+    Stops early once cancelled is set; stats["processed"] counts the files considered so far.
+    """
+    if stats is None:
+        stats = {}
+    stats["processed"] = 0
+    # Literals every match must contain, for trigram lookups and the scanners' prefilter
+    if search_pattern:
+        literal_groups = regex_literal_groups(search_pattern.pattern)
+    else:
+        literal_groups = [[search_term_lower]]
+    if code and trigram_index.exists():
+        # Narrow the search to files containing the query's trigrams, then verify each one
+        candidates = iter_indexed_files(base_dir, search_dir, literal_groups)
+    else:
+        candidates = iter_repository_files(base_dir, search_dir)
+    
+    def filtered_candidates():
+        for full_path, rel_path_str, file in candidates:
+            if cancelled is not None and cancelled.is_set():
+                return
+            stats["processed"] += 1
+            # Check extension filter
+            if extensions and full_path.suffix.lower() not in extensions:
+                continue
+            yield full_path, rel_path_str, file
+    
+    if not code:
+        # Search in file names/paths
+        for full_path, rel_path_str, file in filtered_candidates():
+            if search_term_lower in file.lower() or search_term_lower in rel_path_str.lower():
+                try:
+                    if full_path.stat().st_size > MAX_SEARCH_FILE_SIZE:
+                        continue
+                except OSError:
+                    continue
+                yield {"file_path": rel_path_str}
+        return
+    
+    # Compiled once here; workers receive the matcher with each batch
+    matcher = compile_matcher(search_term, search_term_lower, search_pattern, is_quoted_string, literal_groups)
+    
+    def batches():
+        batch = []
+        for full_path, rel_path_str, _ in filtered_candidates():
+            batch.append((str(full_path), rel_path_str))
+            if len(batch) >= SEARCH_BATCH_SIZE:
+                yield (batch, matcher, MAX_SEARCH_FILE_SIZE, per_file), None
+                batch = []
+        if batch:
+            yield (batch, matcher, MAX_SEARCH_FILE_SIZE, per_file), None
+    
+    global search_process_pool
+    executor = get_search_process_pool()
+    try:
+        # Closing the generator (limit reached, client gone) cancels the batches still queued
+        for _, _, matches in ordered_map(executor, scan_files, batches(), max_in_flight=max(1, SEARCH_WORKERS) * 2):
+            for rel_path_str, result in matches:
+                yield {"file_path": rel_path_str, **result}
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool for the next search
+        search_process_pool = None
+        raise
+
+def run_file_search(base_dir: Path, search_dir: Path, code: bool, extensions, search_term: str,
+                    search_term_lower: str, search_pattern, is_quoted_string: bool, per_file: int = SEARCH_MATCHES_PER_FILE,
+                    limit: int = 100):
+    """
+    Collect up to limit results of iter_file_search.
+    Returns (results, number of files processed).
+    """
+    stats = {}
+    matches = iter_file_search(
+        base_dir, search_dir, code, extensions, search_term, search_term_lower, search_pattern, is_quoted_string,
+        per_file, stats
+    )
+    with contextlib.closing(matches):
+        matching_results = list(itertools.islice(matches, limit))
+    if len(matching_results) >= limit:
+        # Limit results for performance
+        print(f"Reached result limit ({limit})")
+    return matching_results, stats["processed"]
+
+def parse_search_terms(q: str, code: bool, exact: bool):
+    """
+    Interpret a GET /search query: quoted phrases, code patterns and case handling.
+    Returns (search_term, search_term_lower, search_pattern, is_quoted_string).
+    """
+    # Process search term
+    search_term = q.strip()
+    search_term_lower = search_term.lower()
+    
+    # Detect quoted strings for exact phrase matching
+    is_quoted_string = (search_term.startswith('"') and search_term.endswith('"')) or \
+                      (search_term.startswith("'") and search_term.endswith("'"))
+    
+    if is_quoted_string:
+        # Remove the quotes for matching
+        search_term = search_term[1:-1]
+        search_term_lower = search_term.lower()
+        # Force exact matching for quoted strings
+        exact = True
+        print(f"Detected quoted string: '{search_term}'")
+    
+    # Handle complex pattern searches
+    is_pattern_search = ' ' in search_term and code and exact
+    search_pattern = None
+    
+    if is_pattern_search:
+        # Convert pattern to regex if it looks like a code pattern
+        # Common patterns to detect
+        pattern_translations = {
+            "is not null": r"(?:!=\s*null|is\s+not\s+null|!==\s*null)",
+            "is null": r"(?:==\s*null|is\s+null|===\s*null)",
+            "== null": r"(?:==\s*null|is\s+null|===\s*null)",
+            "!= null": r"(?:!=\s*null|is\s+not\s+null|!==\s*null)",
+            # Add more pattern translations as needed
+        }
+        
+        # Check if our search term matches any common patterns
+        matched_pattern = False
+        for pattern_text, regex_pattern in pattern_translations.items():
+            if pattern_text in search_term_lower:
+                search_pattern = re.compile(regex_pattern, re.IGNORECASE)
+                print(f"Using pattern match: {regex_pattern}")
+                matched_pattern = True
+                break
+                
+        # If no predefined pattern matched, treat it as an exact phrase to match
+        if not matched_pattern:
+            # For quoted strings or exact match searches, create a pattern that matches the exact phrase
+            # but allows for different kinds of whitespace
+            if is_quoted_string or exact:
+                # Escape special regex characters but keep the pattern as a phrase to match
+                pattern_text = re.escape(search_term)
+                # Allow variations in whitespace
+                pattern_text = pattern_text.replace(r'\ ', r'\s+')
+                search_pattern = re.compile(pattern_text, re.IGNORECASE)
+                print(f"Using exact phrase pattern: {pattern_text}")
+    
+    return search_term, search_term_lower, search_pattern, is_quoted_string
+
+async def plan_file_search(q: str, ext: Optional[str], dir: Optional[str], code: bool, exact: bool, limit: int,
+                           per_file: int = SEARCH_MATCHES_PER_FILE):
+    """
+    Resolve a GET /search request into the work to do.
+    
+    Returns:
+        tuple: ("paths", [results]) when the path index answered it outright,
+               ("walk", iter_file_search args) when files have to be walked, or
+               ("empty", None) when the directory does not exist
+    """
+    search_term, search_term_lower, search_pattern, is_quoted_string = parse_search_terms(q, code, exact)
+    
+    # Process extension filter if provided
+    extensions = None
+    if ext:
+        extensions = [f".{e.lower().lstrip('.')}" for e in ext.split(',')]
+        print(f"Filtering by extensions: {extensions}")
+        
+    # File name searches are answered from the in-memory path index without touching the disk
+    if not code and path_index.ready:
+        dir_path = dir.strip('/').replace('\\', '/') if dir else None
+        if dir_path and not path_index.has_dir(dir_path):
+            print(f"Directory not found: {dir_path}")
+            return "empty", None
+        matches = await run_blocking(IO_POOL, path_index.search, search_term, extensions=extensions,
+                                     directory=dir_path, limit=limit)
+        print(f"Path index search for '{q}' found {len(matches)} matches")
+        return "paths", [{"file_path": rel_path_str} for rel_path_str in matches]
+        
+    # Process directory filter
+    base_dir = Path(REPO_PATH)
+    search_dir = base_dir
+    if dir:
+        # Clean up and validate the directory path
+        dir_path = dir.strip('/').replace('\\', '/')
+        search_dir = base_dir / dir_path
+        
+        # Check if the specified directory exists
+        if not await run_blocking(IO_POOL, search_dir.is_dir):
+            print(f"Directory not found: {dir_path}")
+            return "empty", None  # Empty result if directory doesn't exist
+        
+    search_type = "code content" if code else "file names"
+    print(f"Searching for '{q}' in {search_dir} (search type: {search_type})")
+    return "walk", (base_dir, search_dir, code, extensions, search_term, search_term_lower, search_pattern, is_quoted_string,
+                    per_file)
+
+def ndjson_line(data: dict) -> str:
+    """Format one line of newline-delimited JSON"""
+    return json.dumps(data) + "\n"
+
+async def async_iterate(items):
+    """Async iterator over an already computed list"""
+    for item in items:
+        yield item
+
+async def stream_file_search(request: Request, plan, limit: int):
+    """
+    Body of a streaming GET /search: NDJSON lines, one per match as soon as it is found.
+    
+    Each match is `{"type": "match", ...result}`. While files are being scanned
+    without a hit, `{"type": "progress", "processed": n}` lines are sent every
+    SEARCH_PROGRESS_SECONDS; they keep the UI informed and let the server notice
+    a closed connection. The last line is `{"type": "done", ...}` or `{"type": "error", ...}`.
+    The scan stops as soon as the limit is reached or the client disconnects.
+    """
+    cancelled = threading.Event()
+    start_time = time.time()
+    count = 0
+    limited = False
+    stats = {"processed": 0}
+    try:
+        # The slot is held for as long as the search is streaming
+        async with code_search_limiter:
+            kind, work = plan
+            if kind == "walk":
+                matches = iterate_in_executor(
+                    IO_POOL, lambda: iter_file_search(*work, stats=stats, cancelled=cancelled), cancelled,
+                    idle_seconds=SEARCH_PROGRESS_SECONDS
+                )
+            else:
+                matches = async_iterate(work or [])
+            async for result in matches:
+                if await request.is_disconnected():
+                    print("Client disconnected; cancelling search")
+                    break
+                if result is None:
+                    yield ndjson_line({"type": "progress", "processed": stats["processed"]})
+                    continue
+                count += 1
+                yield ndjson_line({"type": "match", **result})
+                if count >= limit:
+                    limited = True
+                    break
+            yield ndjson_line({
+                "type": "done",
+                "count": count,
+                "processed": stats["processed"],
+                "limited": limited,
+                "seconds": round(time.time() - start_time, 3)
+            })
+            print(f"Streamed search: processed {stats['processed']} files, sent {count} matches")
+    except Overloaded as e:
+        yield ndjson_line({"type": "error", "detail": str(e)})
+    except Exception as e:
+        print(f"Error in search: {str(e)}")
+        yield ndjson_line({"type": "error", "detail": f"Error searching: {str(e)}"})
+    finally:
+        cancelled.set()
+
 @app.get("/search", response_model=List[dict])
 async def search(
+    request: Request,
     q: str = Query(..., description="Search term for file names, paths, or code content"),
     ext: Optional[str] = Query(None, description="Filter by file extension (comma-separated list)"),
     dir: Optional[str] = Query(None, description="Restrict search to this directory"),
     code: bool = Query(False, description="Search within code content if True"),
-    exact: bool = Query(False, description="Enable exact pattern matching")
+    exact: bool = Query(False, description="Enable exact pattern matching"),
+    limit: int = Query(SEARCH_RESULT_LIMIT, ge=1, le=SEARCH_MAX_RESULTS, description="Maximum number of results"),
+    stream: bool = Query(False, description="Stream results as NDJSON as they are found"),
+    per_file: int = Query(SEARCH_MATCHES_PER_FILE, ge=1, le=SEARCH_MAX_MATCHES_PER_FILE,
+                          description="Maximum number of matches listed per file in code searches")
 ):
     """
     Unified search endpoint for files and code content.
@@ -518,241 +1562,41 @@ async def search(
     - `dir`: Optional directory path to restrict the search
     - `code`: If True, search within code content; otherwise, search file names/paths
     - `exact`: If True, use exact pattern matching for more precise code searches
+    - `limit`: Maximum number of results (default SEARCH_RESULT_LIMIT, at most SEARCH_MAX_RESULTS)
+    - `per_file`: For code searches, how many matches to list per file, each with its 1-based
+      line and column (default SEARCH_MATCHES_PER_FILE, at most SEARCH_MAX_MATCHES_PER_FILE)
+    - `stream`: If True (or with `Accept: application/x-ndjson`), results are streamed as NDJSON
+      while the scan runs, and the scan stops when the client disconnects (see stream_file_search)
     
     Returns a list of matching results with file paths and optional metadata.
     """
+    if stream or "application/x-ndjson" in request.headers.get("accept", ""):
+        if code_search_limiter.is_full():
+            raise HTTPException(status_code=503, detail="Too many concurrent code_search requests, try again shortly", headers={"Retry-After": "1"})
+        try:
+            plan = await plan_file_search(q, ext, dir, code, exact, limit, per_file)
+        except Exception as e:
+            print(f"Error in search: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error searching: {str(e)}")
+        return StreamingResponse(
+            stream_file_search(request, plan, limit),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    return await collect_file_search(q, ext, dir, code, exact, limit, per_file)
+
+@limited(code_search_limiter)
+async def collect_file_search(q: str, ext: Optional[str], dir: Optional[str], code: bool, exact: bool, limit: int,
+                              per_file: int = SEARCH_MATCHES_PER_FILE):
+    """Non-streaming GET /search: run the whole search and return the results as one list"""
     try:
-        # Initialize search results
-        matching_results = []
-        
-        # Process search term
-        search_term = q.strip()
-        search_term_lower = search_term.lower()
+        kind, work = await plan_file_search(q, ext, dir, code, exact, limit, per_file)
+        if kind != "walk":
+            return work or []
         
-        # Detect quoted strings for exact phrase matching
-        is_quoted_string = (search_term.startswith('"') and search_term.endswith('"')) or \
-                          (search_term.startswith("'") and search_term.endswith("'"))
-        
-        if is_quoted_string:
-            # Remove the quotes for matching
-            search_term = search_term[1:-1]
-            search_term_lower = search_term.lower()
-            # Force exact matching for quoted strings
-            exact = True
-            print(f"Detected quoted string: '{search_term}'")
-        
-        # Handle complex pattern searches
-        is_pattern_search = ' ' in search_term and code and exact
-        search_pattern = None
-        
-        if is_pattern_search:
-            # Convert pattern to regex if it looks like a code pattern
-            # Common patterns to detect
-            pattern_translations = {
-                "is not null": r"(?:!=\s*null|is\s+not\s+null|!==\s*null)",
-                "is null": r"(?:==\s*null|is\s+null|===\s*null)",
-                "== null": r"(?:==\s*null|is\s+null|===\s*null)",
-                "!= null": r"(?:!=\s*null|is\s+not\s+null|!==\s*null)",
-                # Add more pattern translations as needed
-            }
-            
-            # Check if our search term matches any common patterns
-            matched_pattern = False
-            for pattern_text, regex_pattern in pattern_translations.items():
-                if pattern_text in search_term_lower:
-                    search_pattern = re.compile(regex_pattern, re.IGNORECASE)
-                    print(f"Using pattern match: {regex_pattern}")
-                    matched_pattern = True
-                    break
-                    
-            # If no predefined pattern matched, treat it as an exact phrase to match
-            if not matched_pattern:
-                # For quoted strings or exact match searches, create a pattern that matches the exact phrase
-                # but allows for different kinds of whitespace
-                if is_quoted_string or exact:
-                    # Escape special regex characters but keep the pattern as a phrase to match
-                    pattern_text = re.escape(search_term)
-                    # Allow variations in whitespace
-                    pattern_text = pattern_text.replace(r'\ ', r'\s+')
-                    search_pattern = re.compile(pattern_text, re.IGNORECASE)
-                    print(f"Using exact phrase pattern: {pattern_text}")
-            
-        # Process extension filter if provided
-        extensions = None
-        if ext:
-            extensions = [f".{e.lower().lstrip('.')}" for e in ext.split(',')]
-            print(f"Filtering by extensions: {extensions}")
-            
-        # Process directory filter
-        base_dir = Path(REPO_PATH)
-        search_dir = base_dir
-        if dir:
-            # Clean up and validate the directory path
-            dir_path = dir.strip('/').replace('\\', '/')
-            search_dir = base_dir / dir_path
-            
-            # Check if the specified directory exists
-            if not search_dir.exists() or not search_dir.is_dir():
-                print(f"Directory not found: {dir_path}")
-                return []  # Empty result if directory doesn't exist
-            
-        # Track how many files we've processed
-        processed = 0
-        matched = 0
-        
-        search_type = "code content" if code else "file names"
-        print(f"Searching for '{q}' in {search_dir} (search type: {search_type})")
-        
-        # Walk through the directory structure
-        for root, dirs, files in os.walk(search_dir):
-            # Skip hidden directories
-            dirs[:] = [d for d in dirs if not d.startswith('.')]
-            # Skip common directories to ignore
-            dirs[:] = [d for d in dirs if d not in ['node_modules', '__pycache__', 'venv', 'env', '.git', 'build', 'dist']]
-            
-            for file in files:
-                processed += 1
-                
-                # Skip hidden files and non-text files like binaries
-                if file.startswith('.'):
-                    continue
-                    
-                # Get the full path and relative path
-                full_path = Path(root) / file
-                rel_path = full_path.relative_to(base_dir)
-                rel_path_str = str(rel_path).replace('\\', '/')  # Normalize path separators
-                
-                # Check extension filter
-                if extensions and not any(full_path.suffix.lower() == ext for ext in extensions):
-                    continue
-                    
-                # Skip large files before reading them
-                if full_path.stat().st_size > 5 * 1024 * 1024:  # Skip files > 5MB
-                    continue
-                
-                # Different search strategy based on code flag
-                if code:
-                    # Search in file content
-                    try:
-                        # Try to read as text file
-                        try:
-                            with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                content = f.read()
-                        except UnicodeDecodeError:
-                            # Skip binary files
-                            continue
-                            
-                        # Enhanced pattern matching
-                        if search_pattern:
-                            # Use regex search
-                            match = search_pattern.search(content)
-                            if match:
-                                # Extract context around match
-                                pos = match.start()
-                                match_text = match.group(0)
-                                
-                                # Get surrounding context
-                                start = max(0, pos - 100)
-                                end = min(len(content), pos + len(match_text) + 100)
-                                
-                                # Create snippet with context
-                                before = content[start:pos]
-                                after = content[pos+len(match_text):end]
-                                
-                                snippet = ""
-                                if start > 0:
-                                    snippet += "..."
-                                snippet += before + "«" + match_text + "»" + after
-                                if end < len(content):
-                                    snippet += "..."
-
-                                matching_results.append({
-                                    "file_path": rel_path_str,
-                                    "snippet": snippet,
-                                    "match_position": pos,
-                                    "match_text": match_text,
-                                    "exact_match": True
-                                })
-                                matched += 1
-                        elif is_quoted_string:
-                            # For quoted strings without a pattern, do a case-sensitive search
-                            if search_term in content:
-                                pos = content.find(search_term)
-                                
-                                # Extract context around match
-                                start = max(0, pos - 100)
-                                end = min(len(content), pos + len(search_term) + 100)
-                                
-                                # Create snippet with context
-                                before = content[start:pos]
-                                after = content[pos+len(search_term):end]
-                                
-                                snippet = ""
-                                if start > 0:
-                                    snippet += "..."
-                                snippet += before + "«" + search_term + "»" + after
-                                if end < len(content):
-                                    snippet += "..."
-                                    
-                                matching_results.append({
-                                    "file_path": rel_path_str,
-                                    "snippet": snippet,
-                                    "match_position": pos,
-                                    "match_text": search_term,
-                                    "exact_match": True
-                                })
-                                matched += 1
-                        else:
-                            # Simple substring search
-                            if search_term_lower in content.lower():
-                                # Find context around match
-                                content_lower = content.lower()
-                                pos = content_lower.find(search_term_lower)
-                                
-                                if pos != -1:
-                                    # Extract context around match (100 chars before and after)
-                                    start = max(0, pos - 100)
-                                    end = min(len(content), pos + 100 + len(search_term_lower))
-                                    
-                                    # Get snippet with highlighting
-                                    before = content[start:pos]
-                                    matched_text = content[pos:pos + len(search_term_lower)]
-                                    after = content[pos + len(search_term_lower):end]
-                                    
-                                    snippet = ""
-                                    if start > 0:
-                                        snippet += "..."
-                                    snippet += before + matched_text + after
-                                    if end < len(content):
-                                        snippet += "..."
-
-                                    matching_results.append({
-                                        "file_path": rel_path_str,
-                                        "snippet": snippet,
-                                        "match_position": pos
-                                    })
-                                    matched += 1
-                    except Exception as e:
-                        # Skip problematic files
-                        print(f"Error reading {rel_path_str}: {str(e)}")
-                        continue
-                else:
-                    # Search in file names/paths
-                    if (search_term_lower in file.lower() or search_term_lower in rel_path_str.lower()):
-                        matching_results.append({
-                            "file_path": rel_path_str
-                        })
-                        matched += 1
-                
-                # Limit to 100 results for performance
-                if matched >= 100:
-                    print(f"Reached result limit (100)")
-                    break
-            
-            if matched >= 100:
-                break
-                
-        print(f"Search complete: processed {processed} files, found {matched} matches")
+        # Walking the tree and matching content are blocking; run them off the event loop
+        matching_results, processed = await run_blocking(IO_POOL, run_file_search, *work, limit=limit)
+        print(f"Search complete: processed {processed} files, found {len(matching_results)} matches")
         return matching_results
             
     except Exception as e:
@@ -15,12 +15,19 @@ import logging
 from pathlib import Path
 from dotenv import load_dotenv
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import sqlite3
 import pandas as pd
-from chromadb.config import Settings
-from chromadb import PersistentClient
-import shutil  # Add this to handle directory deletion
+import argparse
+from indexing.manifest import FileManifest, stat_file
+from indexing.pipeline import EmbeddingWriter, prefetch, ordered_map
+from indexing.extract import should_index_file, process_file, chunk_records
+from indexing.trigram_index import TrigramIndex
+from indexing.bm25_index import BM25Index
+from indexing.vector_store import VectorStore
+from indexing.embedding_cache import EmbeddingCache
+from indexing.ctags_indexer import run_ctags
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 
 # Configure logging
 logging.basicConfig(
@@ -45,134 +52,167 @@ if not os.path.isdir(REPO_PATH):
 data_dir = Path("data")
 data_dir.mkdir(exist_ok=True)
 
-# Ensure ChromaDB directory is recreated fresh
+# ChromaDB directory is kept between runs so unchanged files are not re-embedded
 CHROMA_DB_PATH = "chroma_db"
-chroma_db_dir = Path(CHROMA_DB_PATH)
-
-# Delete existing ChromaDB directory if it exists
-if chroma_db_dir.exists():
-    logger.info(f"Deleting existing ChromaDB directory: {CHROMA_DB_PATH}")
-    shutil.rmtree(chroma_db_dir)  # Deletes the directory and its contents
+COLLECTION_NAME = "code_embeddings"
 
-# Create a fresh ChromaDB directory
-logger.info(f"Creating fresh ChromaDB directory: {CHROMA_DB_PATH}")
-chroma_db_dir.mkdir(exist_ok=True)
+# Manifest of path, size, mtime and content hash from the previous run
+MANIFEST_DB_PATH = "data/manifest.db"
 
-# Initialize ChromaDB client
-logger.info(f"Initializing ChromaDB at {CHROMA_DB_PATH}...")
-chroma_client = PersistentClient(path=CHROMA_DB_PATH)
+# Trigram index backing code-content queries of GET /search
+TRIGRAM_DB_PATH = "data/trigrams.db"
 
-# Ensure the collection exists
-COLLECTION_NAME = "code_embeddings"
-logger.info(f"Creating new collection: {COLLECTION_NAME}")
-embedding_collection = chroma_client.create_collection(COLLECTION_NAME)  # Always create a new collection
+# BM25 index over the embedded chunks, queried next to the vectors by POST /search
+BM25_DB_PATH = "data/bm25.db"
 
-# Initialize embedding model
-logger.info("Loading embedding model...")
-model = SentenceTransformer('all-MiniLM-L6-v2')
+# Quantized copy of every embedding, searched by the NumPy backend (VECTOR_BACKEND=numpy)
+EMBEDDINGS_DB_PATH = "data/embeddings.db"
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "int8")
 
-# File extensions to index
-CODE_EXTENSIONS = [
-    '.py', '.js', '.jsx', '.ts', '.tsx', '.java', '.c', '.cpp', '.h', 
-    '.hpp', '.cs', '.go', '.rs', '.php', '.rb', '.swift', '.kt', '.sh',
-    '.html', '.css', '.scss', '.sql', '.md', '.json', '.xml', '.yaml', '.yml'
-]
+# Embeddings by (model, chunk text hash), kept across runs and full rebuilds so unchanged
+# and duplicate chunks are never encoded twice; least recently used entries beyond the limit are dropped
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBEDDING_CACHE_DB_PATH = "data/embedding_cache.db"
+CHUNK_EMBEDDING_CACHE_ENTRIES = int(os.getenv("CHUNK_EMBEDDING_CACHE_ENTRIES", "500000"))
 
-def should_index_file(file_path):
-    """Determine if a file should be indexed based on extension and path."""
-    # Skip hidden files and directories
-    if any(part.startswith('.') for part in Path(file_path).parts):
-        return False
-        
-    # Skip node_modules, venv, etc.
-    excluded_dirs = ['node_modules', 'venv', 'env', 'dist', 'build', '__pycache__']
-    if any(excluded in Path(file_path).parts for excluded in excluded_dirs):
-        return False
-        
-    # Check file extension
-    extension = Path(file_path).suffix.lower()
-    return extension in CODE_EXTENSIONS
+# Directory for the ctags tags file, its shards and manifest (read by the server from the same setting)
+CTAGS_DATA_DIR = os.getenv("CTAGS_DATA_DIR", "data")
 
-def chunk_file(content, max_chunk_size=1000, overlap=200):
-    """Split file content into overlapping chunks for better embedding."""
-    if len(content) <= max_chunk_size:
-        return [content]
-        
-    chunks = []
-    for i in range(0, len(content), max_chunk_size - overlap):
-        chunk = content[i:i + max_chunk_size]
-        if len(chunk) > 100:  # Only include chunks with enough content
-            chunks.append(chunk)
-    return chunks
+# Opened by init_index_stores(); worker processes re-import this module and must not load them
+chroma_client = None
+embedding_collection = None
+model = None
 
-def find_definitions(file_path, content):
-    """Find function and class definitions in the file."""
-    extension = Path(file_path).suffix.lower()
-    definitions = []
+def init_index_stores():
+    """Open the ChromaDB collection and load the embedding model."""
+    global chroma_client, embedding_collection, model
+    # Imported here rather than at the top so worker processes never pull in torch
+    from sentence_transformers import SentenceTransformer
+    from chromadb import PersistentClient
     
-    if extension == '.py':
-        # Simple regex-based approach for Python
-        import re
-        # Match function and class definitions
-        patterns = [
-            r'def\s+([a-zA-Z0-9_]+)\s*\(', 
-            r'class\s+([a-zA-Z0-9_]+)\s*[:\(]'
-        ]
-        
-        lines = content.split('\n')
-        for i, line in enumerate(lines):
-            for pattern in patterns:
-                matches = re.finditer(pattern, line)
-                for match in matches:
-                    name = match.group(1)
-                    definitions.append({
-                        'name': name,
-                        'file_path': file_path,
-                        'line_number': i + 1,
-                        'type': 'function' if 'def ' in match.group(0) else 'class'
-                    })
+    Path(CHROMA_DB_PATH).mkdir(exist_ok=True)
     
-    elif extension in ['.js', '.jsx', '.ts', '.tsx']:
-        # Simple regex for JavaScript/TypeScript
-        import re
-        patterns = [
-            r'function\s+([a-zA-Z0-9_]+)\s*\(', 
-            r'class\s+([a-zA-Z0-9_]+)\s*[{\s]',
-            r'const\s+([a-zA-Z0-9_]+)\s*=\s*(?:async\s*)?\([^)]*\)\s*=>'
-        ]
-        
-        lines = content.split('\n')
-        for i, line in enumerate(lines):
-            for pattern in patterns:
-                matches = re.finditer(pattern, line)
-                for match in matches:
-                    name = match.group(1)
-                    def_type = 'class' if 'class ' in match.group(0) else 'function'
-                    definitions.append({
-                        'name': name,
-                        'file_path': file_path,
-                        'line_number': i + 1,
-                        'type': def_type
-                    })
+    # Initialize ChromaDB client
+    logger.info(f"Initializing ChromaDB at {CHROMA_DB_PATH}...")
+    chroma_client = PersistentClient(path=CHROMA_DB_PATH)
+    
+    # Ensure the collection exists
+    logger.info(f"Opening collection: {COLLECTION_NAME}")
+    embedding_collection = chroma_client.get_or_create_collection(COLLECTION_NAME)
+    
+    # Initialize embedding model
+    logger.info("Loading embedding model...")
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+def remove_file_from_index(rel_path, vector_store, definitions_db, bm25_writer):
+    """Remove all chunks and definitions previously stored for a file."""
+    embedding_collection.delete(where={"file_path": rel_path})
+    vector_store.delete(where={"file_path": rel_path})
+    definitions_db.execute("DELETE FROM definitions WHERE file_path = ?", (rel_path,))
+    bm25_writer.remove_file(rel_path)
+
+def backfill_bm25_index(bm25_writer, page_size=1000):
+    """Add the chunks already in the collection to the BM25 index (for indexes built before it existed)."""
+    offset = 0
+    while True:
+        page = embedding_collection.get(include=['documents', 'metadatas'], limit=page_size, offset=offset)
+        if not page['ids']:
+            break
+        by_file = {}
+        for chunk_id, document, metadata in zip(page['ids'], page['documents'], page['metadatas']):
+            chunk_ids, documents = by_file.setdefault(metadata.get('file_path'), ([], []))
+            chunk_ids.append(chunk_id)
+            documents.append(document)
+        for rel_path, (chunk_ids, documents) in by_file.items():
+            bm25_writer.add_file(rel_path, chunk_ids, documents)
+        offset += len(page['ids'])
+    logger.info(f"Added {offset} existing chunks to the BM25 index")
+
+def backfill_vector_store(vector_store, page_size=1000):
+    """Copy the embeddings already in the collection to the vector store (for indexes built before it existed)."""
+    offset = 0
+    while True:
+        page = embedding_collection.get(include=['embeddings', 'documents', 'metadatas'], limit=page_size, offset=offset)
+        if not len(page['ids']):
+            break
+        vector_store.add(page['ids'], page['embeddings'], page['documents'], page['metadatas'])
+        offset += len(page['ids'])
+    logger.info(f"Copied {offset} existing embeddings to the vector store")
+
+def scan_repository(manifest, executor=None):
+    """
+    Walk the repository and yield one entry per indexable file, in walk order.
+
+    Files whose size and mtime match the manifest are yielded without being
+    read. Everything else goes through process_file, either inline or on the
+    worker pool; results are yielded in the same order either way, so a
+    parallel run produces the same IDs and rows as a serial one.
+
+    Runs on the prefetch thread, so it only reads the manifest; all database
+    writes happen on the consumer side. Each entry is a tuple
+    (status, rel_path, stat_result, content_hash, chunks, definitions) where
+    status is 'unchanged', 'touched' (same content, new mtime), 'changed', or
+    'error' (unreadable this run; its existing index entries are left alone).
+    """
+    def candidates():
+        for root, dirs, files in os.walk(REPO_PATH):
+            # Skip hidden directories
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            
+            for file in files:
+                full_path = os.path.join(root, file)
+                rel_path = os.path.relpath(full_path, REPO_PATH)
+                
+                if not should_index_file(full_path):
+                    continue
+                
+                stat_result = stat_file(full_path)
+                if stat_result is None:
+                    continue
+                
+                # Size and mtime unchanged: skip without reading the file
+                if manifest.is_unchanged(rel_path, stat_result):
+                    yield None, (rel_path, stat_result)
+                    continue
+                
+                previous = manifest.get(rel_path)
+                previous_hash = previous[2] if previous is not None else None
+                yield (full_path, rel_path, previous_hash), (rel_path, stat_result)
     
-    return definitions
+    for args, (rel_path, stat_result), result in ordered_map(executor, process_file, candidates()):
+        if args is None:
+            yield ('unchanged', rel_path, stat_result, None, None, None)
+            continue
+        status, content_hash, chunks, file_definitions = result
+        if status == 'error':
+            logger.error(f"Error processing {rel_path}: {content_hash}")
+            content_hash = None
+        yield (status, rel_path, stat_result, content_hash, chunks, file_definitions)
+
+def index_repository(full=False, batch_size=256, workers=0, ctags_jobs=0):
+    """
+    Index the repository for search and navigation.
+
+    Only files that were added or modified since the previous run are re-chunked,
+    re-embedded and re-scanned for definitions; chunks and definitions of deleted
+    files are removed. Pass full=True to discard everything and rebuild from scratch.
 
-def index_repository():
-    """Index the entire repository for search and navigation."""
+    File reading and chunking run on a background thread while chunks are
+    embedded in batches of batch_size and written with one bulk add per batch.
+    With workers > 1, reading, definition extraction and chunking are spread
+    over that many processes, streaming results back to the single writer.
+    ctags runs last, as ctags_jobs parallel processes over shards of the tree.
+    """
+    global embedding_collection
     start_time = time.time()
+    if model is None:
+        init_index_stores()
     indexed_files = 0
+    unchanged_files = 0
     processed_chunks = 0
     
     # Initialize databases
-    embeddings_db = sqlite3.connect('data/embeddings.db')
-    embeddings_db.execute('''CREATE TABLE IF NOT EXISTS embeddings (
-        id INTEGER PRIMARY KEY,
-        file_path TEXT,
-        content TEXT,
-        start_char INTEGER,
-        end_char INTEGER,
-        embedding BLOB
-    )''')
+    vector_store = VectorStore(EMBEDDINGS_DB_PATH, dtype=VECTOR_DTYPE)
     
     definitions_db = sqlite3.connect('data/definitions.db')
     definitions_db.execute('''CREATE TABLE IF NOT EXISTS definitions (
@@ -183,72 +223,143 @@ def index_repository():
         type TEXT
     )''')
     
-    # Clear existing data
-    embeddings_db.execute("DELETE FROM embeddings")
-    definitions_db.execute("DELETE FROM definitions")
+    # Create indexes up front so per-file deletes don't scan the whole table
+    definitions_db.execute("CREATE INDEX IF NOT EXISTS idx_name ON definitions (name)")
+    definitions_db.execute("CREATE INDEX IF NOT EXISTS idx_file ON definitions (file_path)")
+    
+    manifest = FileManifest(MANIFEST_DB_PATH)
+    bm25_index = BM25Index(BM25_DB_PATH)
+    
+    rebuilding = full or len(manifest) == 0
+    if rebuilding:
+        # Clear existing data
+        logger.info(f"Running full re-index, recreating collection: {COLLECTION_NAME}")
+        try:
+            chroma_client.delete_collection(COLLECTION_NAME)
+        except Exception:
+            pass  # Collection did not exist yet
+        embedding_collection = chroma_client.create_collection(COLLECTION_NAME)
+        vector_store.clear()
+        definitions_db.execute("DELETE FROM definitions")
+        manifest.clear()
+    else:
+        logger.info(f"Running incremental index against manifest of {len(manifest)} files")
+    
+    # The BM25 index is updated with the same chunks as the collection, file by file
+    bm25_backfill = not rebuilding and len(bm25_index) == 0
+    bm25_writer = bm25_index.writer(full=rebuilding)
+    if bm25_backfill:
+        logger.info(f"Building BM25 index at {BM25_DB_PATH} from the existing collection...")
+        backfill_bm25_index(bm25_writer)
+    vector_backfill = not rebuilding and not vector_store.exists() and embedding_collection.count()
+    if vector_backfill:
+        logger.info(f"Filling vector store at {EMBEDDINGS_DB_PATH} from the existing collection...")
+        backfill_vector_store(vector_store)
     
     logger.info(f"Indexing repository at {REPO_PATH}...")
     
-    all_embeddings = []
     all_definitions = []
+    seen_paths = set()
+    pending_manifest = {}
+    
+    def mark_indexed(rel_path):
+        # Only record a file once all of its chunks were written
+        stat_result, content_hash = pending_manifest.pop(rel_path)
+        manifest.update(rel_path, stat_result, content_hash)
+    
+    embedding_cache = EmbeddingCache(
+        EMBEDDING_CACHE_DB_PATH, model_name=EMBEDDING_MODEL_NAME, max_entries=CHUNK_EMBEDDING_CACHE_ENTRIES
+    )
+    writer = EmbeddingWriter(
+        model, embedding_collection, batch_size=batch_size, on_file_complete=mark_indexed,
+        vector_store=vector_store, cache=embedding_cache
+    )
+    
+    executor = None
+    if workers > 1:
+        # Spawn keeps the model and database handles of this process out of the workers
+        logger.info(f"Using {workers} worker processes for file ingestion")
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
     
-    # Walk through the repository
-    for root, dirs, files in os.walk(REPO_PATH):
-        # Skip hidden directories
-        dirs[:] = [d for d in dirs if not d.startswith('.')]
+    try:
+        scanned = prefetch(scan_repository(manifest, executor))
+        for status, rel_path, stat_result, content_hash, chunks, file_definitions in scanned:
+            seen_paths.add(rel_path)
         
-        for file in files:
-            full_path = os.path.join(root, file)
-            rel_path = os.path.relpath(full_path, REPO_PATH)
-            
-            if not should_index_file(full_path):
+            if status == 'error':
                 continue
-                
+            if status == 'unchanged':
+                unchanged_files += 1
+                continue
+            if status == 'touched':
+                # Touched but not modified; just refresh size/mtime
+                manifest.update(rel_path, stat_result, content_hash)
+                unchanged_files += 1
+                continue
+        
             try:
-                with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                
-                # Find definitions
-                file_definitions = find_definitions(rel_path, content)
+                if not rebuilding:
+                    # Modified file (or one left half-written by an interrupted run):
+                    # drop its stale chunks and definitions first
+                    remove_file_from_index(rel_path, vector_store, definitions_db, bm25_writer)
+            
                 all_definitions.extend(file_definitions)
-                
-                # Process file content in chunks for embedding
-                chunks = chunk_file(content)
-                for i, chunk in enumerate(chunks):
-                    start_char = 0 if i == 0 else i * 800  # Approximate char position
-                    end_char = start_char + len(chunk)
-                    
-                    # Generate embedding
-                    embedding = model.encode(chunk).tolist()
-                    
-                    # Add embedding to ChromaDB collection
-                    embedding_collection.add(
-                        documents=[chunk],
-                        metadatas=[{"file_path": rel_path, "start_char": start_char, "end_char": end_char}],
-                        ids=[f"{rel_path}_{start_char}_{end_char}"]
-                    )
-                    
-                    processed_chunks += 1
-                
+            
+                pending_manifest[rel_path] = (stat_result, content_hash)
+                ids, documents, metadatas = chunk_records(rel_path, chunks)
+                bm25_writer.add_file(rel_path, ids, documents)
+                writer.add_file(rel_path, ids, documents, metadatas)
+                processed_chunks += len(chunks)
+            
                 indexed_files += 1
                 if indexed_files % 50 == 0:
-                    logger.info(f"Indexed {indexed_files} files, {processed_chunks} chunks")
-                    
+                    logger.info(f"Indexed {indexed_files} files, {processed_chunks} chunks; {writer.stats_message()}")
+                
             except Exception as e:
                 logger.error(f"Error processing {rel_path}: {str(e)}")
+        
+        writer.close()
+        logger.info(f"Embedding throughput: {writer.stats_message()}")
+        embedding_cache.prune()
+        embedding_cache.close()
+        
+        # Trigram index for GET /search covers every searchable file, not just CODE_EXTENSIONS
+        logger.info(f"Updating trigram index at {TRIGRAM_DB_PATH}...")
+        try:
+            TrigramIndex(TRIGRAM_DB_PATH).build(REPO_PATH, executor=executor, full=full)
+        except Exception as e:
+            logger.error(f"Error building trigram index: {str(e)}")
+        
+        # Sharded ctags run; only shards with changed files are re-tagged
+        logger.info(f"Updating ctags index in {CTAGS_DATA_DIR}...")
+        if not run_ctags(REPO_PATH, data_dir=CTAGS_DATA_DIR, jobs=ctags_jobs, full=full):
+            logger.error("ctags index is incomplete; definition lookups may be missing symbols")
+    
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    # Remove chunks and definitions of files deleted since the previous run
+    deleted_paths = [path for path in manifest.entries if path not in seen_paths]
+    for rel_path in deleted_paths:
+        try:
+            remove_file_from_index(rel_path, vector_store, definitions_db, bm25_writer)
+            manifest.remove(rel_path)
+        except Exception as e:
+            logger.error(f"Error removing {rel_path} from index: {str(e)}")
     
     # Debug log: Check the number of embeddings in the collection
     logger.info(f"Total embeddings in collection '{COLLECTION_NAME}': {embedding_collection.count()}")
     
-    # Batch insert embeddings
-    cursor = embeddings_db.cursor()
-    for embed_data in all_embeddings:
-        cursor.execute(
-            "INSERT INTO embeddings (file_path, content, start_char, end_char, embedding) VALUES (?, ?, ?, ?, ?)",
-            (embed_data['file_path'], embed_data['content'], embed_data['start_char'], 
-             embed_data['end_char'], embed_data['embedding'])
-        )
-    embeddings_db.commit()
+    # Export the vectors for the NumPy backend to memory-map; a run that changed nothing keeps
+    # the current snapshot (rewriting it only if changes applied by the watcher have piled up)
+    try:
+        if rebuilding or vector_backfill or indexed_files or deleted_paths:
+            vector_store.write_snapshot()
+        else:
+            vector_store.write_snapshot_if_stale()
+    except Exception as e:
+        logger.error(f"Error writing vector snapshot: {str(e)}")
     
     # Batch insert definitions
     cursor = definitions_db.cursor()
@@ -259,12 +370,10 @@ def index_repository():
         )
     definitions_db.commit()
     
-    # Create indexes for faster queries
-    embeddings_db.execute("CREATE INDEX IF NOT EXISTS idx_file_path ON embeddings (file_path)")
-    definitions_db.execute("CREATE INDEX IF NOT EXISTS idx_name ON definitions (name)")
-    definitions_db.execute("CREATE INDEX IF NOT EXISTS idx_file ON definitions (file_path)")
+    bm25_writer.close()
     
-    embeddings_db.close()
+    # Commit the manifest last: if anything above failed, those files are redone next run
+    manifest.close()
     definitions_db.close()
     
     end_time = time.time()
@@ -272,15 +381,23 @@ def index_repository():
     
     logger.info(f"Repository indexing complete!")
     logger.info(f"Indexed {indexed_files} files with {processed_chunks} chunks")
+    logger.info(f"Skipped {unchanged_files} unchanged files, removed {len(deleted_paths)} deleted files")
     logger.info(f"Created {len(all_definitions)} definition entries")
     logger.info(f"Time elapsed: {minutes:.2f} minutes")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index the repository for search and navigation")
+    parser.add_argument("--full", action="store_true", help="Discard the existing index and rebuild from scratch")
+    parser.add_argument("--batch-size", type=int, default=256, help="Number of chunks encoded and written per batch")
+    parser.add_argument("--workers", type=int, default=0, help="Number of processes for reading, chunking and definition extraction (0 = serial)")
+    parser.add_argument("--ctags-jobs", type=int, default=0, help="Number of concurrent ctags processes (0 = CPU count)")
+    args = parser.parse_args()
+    
     try:
-        index_repository()
+        index_repository(full=args.full, batch_size=args.batch_size, workers=args.workers, ctags_jobs=args.ctags_jobs)
     except KeyboardInterrupt:
         logger.info("Indexing interrupted by user")
         sys.exit(0)
     except Exception as e:
         logger.error(f"Indexing failed: {str(e)}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
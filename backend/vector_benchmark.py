@@ -0,0 +1,152 @@
+"""
+Benchmark: recall and query latency of the ChromaDB and NumPy vector backends.
+
+Builds both stores from the same synthetic, clustered embeddings and answers
+the same queries with each, e.g.
+    python vector_benchmark.py --sizes 100000,1000000 --backends numpy,chroma
+
+Recall@k is measured against an exact float32 search. Latency is measured one
+query at a time and, with --concurrency, with that many queries in flight (the
+NumPy backend answers concurrent queries with one scan). Nothing is written to
+the index in data/; stores are built in a temporary directory.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from indexing.vector_store import VectorStore
+
+BUILD_BATCH = 5000
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(label, latencies):
+    print(
+        f"{label}: n={len(latencies)} "
+        f"p50={percentile(latencies, 0.50) * 1000:.1f}ms "
+        f"p99={percentile(latencies, 0.99) * 1000:.1f}ms "
+        f"mean={statistics.mean(latencies) * 1000:.1f}ms"
+    )
+
+
+def embedding_blocks(count, dim, clusters, seed):
+    """Unit vectors drawn around random cluster centres, generated block by block (reproducibly, without holding them all)."""
+    centres = np.random.default_rng(seed).standard_normal((clusters, dim)).astype(np.float32)
+    for number, start in enumerate(range(0, count, BUILD_BATCH)):
+        rng = np.random.default_rng((seed, number))
+        size = min(BUILD_BATCH, count - start)
+        vectors = centres[rng.integers(0, clusters, size)] + 0.6 * rng.standard_normal((size, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        yield start, vectors
+
+
+def exact_neighbours(queries, count, dim, clusters, seed, k):
+    """Chunk IDs of the k nearest vectors to each query, by exact float32 search."""
+    best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+    best_distances = np.zeros((len(queries), 0), dtype=np.float32)
+    for start, vectors in embedding_blocks(count, dim, clusters, seed):
+        distances = 2.0 - 2.0 * (queries @ vectors.T)
+        rows = np.broadcast_to(np.arange(start, start + len(vectors)), distances.shape)
+        best_rows = np.concatenate([best_rows, rows], axis=1)
+        best_distances = np.concatenate([best_distances, distances], axis=1)
+        keep = np.argsort(best_distances, axis=1)[:, :k]
+        best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        best_distances = np.take_along_axis(best_distances, keep, axis=1)
+    return [{f"chunk_{row}" for row in rows} for rows in best_rows]
+
+
+def build(store, count, dim, clusters, seed):
+    start_time = time.perf_counter()
+    for start, vectors in embedding_blocks(count, dim, clusters, seed):
+        ids = [f"chunk_{row}" for row in range(start, start + len(vectors))]
+        metadatas = [{"file_path": f"file_{row // 10}.py"} for row in range(start, start + len(vectors))]
+        store.add(ids=ids, embeddings=vectors, documents=[""] * len(ids), metadatas=metadatas)
+    if isinstance(store, VectorStore):
+        store.write_snapshot()
+    return time.perf_counter() - start_time
+
+
+def measure(store, queries, k, concurrency):
+    """Run every query; returns (latencies, results) with results in query order."""
+    results = [None] * len(queries)
+    latencies = []
+    remaining = iter(range(len(queries)))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                index = next(remaining, None)
+            if index is None:
+                return
+            start = time.perf_counter()
+            response = store.query(query_embeddings=[queries[index].tolist()], n_results=k, include=['distances'])
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                results[index] = set(response['ids'][0])
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, results
+
+
+def open_store(backend, directory, dtype):
+    if backend == "numpy":
+        return VectorStore(os.path.join(directory, "embeddings.db"), dtype=dtype)
+    import chromadb
+    client = chromadb.PersistentClient(path=os.path.join(directory, "chroma"))
+    return client.get_or_create_collection("benchmark")
+
+
+def main(args):
+    dim = args.dim
+    rng = np.random.default_rng(args.seed + 1)
+    for size in args.sizes:
+        print(f"--- {size} chunks, {dim} dimensions, k={args.k} ---")
+        # Queries are fresh draws from the same distribution as the chunks
+        queries = next(embedding_blocks(args.queries, dim, args.clusters, args.seed + 1))[1]
+        queries = queries[rng.permutation(len(queries))]
+        truth = exact_neighbours(queries, size, dim, args.clusters, args.seed, args.k)
+        for backend in args.backends:
+            with tempfile.TemporaryDirectory(dir=args.work_dir) as directory:
+                store = open_store(backend, directory, args.dtype)
+                label = f"{backend} ({args.dtype})" if backend == "numpy" else backend
+                print(f"{label}: built in {build(store, size, dim, args.clusters, args.seed):.1f}s")
+                # Warm up (snapshot mapping, HNSW loading)
+                measure(store, queries[:5], args.k, 1)
+                for concurrency in sorted({1, args.concurrency}):
+                    latencies, results = measure(store, queries, args.k, concurrency)
+                    recall = statistics.mean(len(found & expected) / args.k for found, expected in zip(results, truth))
+                    summarize(f"{label}, {concurrency} in flight, recall@{args.k}={recall:.3f}", latencies)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare recall and latency of the ChromaDB and NumPy vector backends")
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated chunk counts to benchmark")
+    parser.add_argument("--backends", default="numpy,chroma", help="Comma-separated backends: numpy, chroma")
+    parser.add_argument("--dtype", default="int8", choices=["int8", "float16"], help="Vector storage type of the NumPy backend")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension (384 for all-MiniLM-L6-v2)")
+    parser.add_argument("--clusters", type=int, default=1000, help="Number of clusters the synthetic embeddings are drawn around")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per measurement")
+    parser.add_argument("--k", type=int, default=20, help="Neighbours per query")
+    parser.add_argument("--concurrency", type=int, default=8, help="Queries in flight for the concurrent measurement")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--work-dir", default=None, help="Directory for the temporary stores (default: system temp)")
+    args = parser.parse_args()
+    args.sizes = [int(size) for size in args.sizes.split(",")]
+    args.backends = [backend.strip() for backend in args.backends.split(",")]
+    main(args)
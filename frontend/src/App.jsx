@@ -71,7 +71,15 @@ function App() {
     }
   };
 
-  const handleSearchResultSelect = (filePath, startChar, endChar) => {
+  // Content search results carry the line of the match that was clicked
+  const handleSearchFileSelect = (filePath, line) => {
+    handleFileSelect(filePath, true);
+    if (line) {
+      setSelectedPosition({ start: line, end: line });
+    }
+  };
+
+  const handleSearchResultSelect = (filePath, startLine, endLine) => {
     if (!filePath) {
       return;
     }
@@ -93,7 +101,7 @@ function App() {
     // Force re-render of the CodeViewer by changing the key
     setForceRender(prev => prev + 1);
     setSelectedFile(processedPath);
-    setSelectedPosition({ start: startChar, end: endChar });
+    setSelectedPosition({ start: startLine, end: endLine });
   };
 
   const toggleQAPanel = () => setIsQAPanelOpen(!isQAPanelOpen);
@@ -172,7 +180,7 @@ function App() {
         <div className="main-content">
           {searchPanelVisible && (
             <div className="search-panel-wrapper">
-              <FileSearchPanel onFileSelect={(filePath) => handleFileSelect(filePath, true)} />
+              <FileSearchPanel onFileSelect={handleSearchFileSelect} />
             </div>
           )}
 
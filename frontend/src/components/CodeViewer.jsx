@@ -8,6 +8,9 @@ const CodeViewer = ({ filePath, highlightStart, highlightEnd, repoPath }) => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [fileInfo, setFileInfo] = useState({ lines: 0, size: 0 });
+  // Set when the server returned only the first part of a large file: { endLine, totalLines }
+  const [partial, setPartial] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const editorRef = useRef(null);
 
   // Helper function to handle editor mounting
@@ -23,6 +26,7 @@ const CodeViewer = ({ filePath, highlightStart, highlightEnd, repoPath }) => {
         editor.layout();
         // Force refresh syntax highlighting
         monaco.editor.setModelLanguage(editor.getModel(), language);
+        revealHighlight(editor);
       }, 100);
     }
   }
@@ -89,12 +93,36 @@ const CodeViewer = ({ filePath, highlightStart, highlightEnd, repoPath }) => {
     return displayNames[languageId] || languageId;
   };
 
+  const formatSize = (size) => (size < 1024 ? `${size} B` : `${(size / 1024).toFixed(1)} KB`);
+
+  const fileUrl = (path) => `http://127.0.0.1:8000/browse/${encodeURIComponent(path)}`;
+
+  // The server pages large files by line range; fetch the next page and append it
+  const loadMore = async () => {
+    if (!partial || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const response = await axios.get(fileUrl(filePath), {
+        timeout: 15000,
+        params: { start_line: partial.endLine + 1 }
+      });
+      const data = response.data;
+      setCodeContent((previous) => previous + data.content);
+      setPartial(data.truncated ? { endLine: data.end_line, totalLines: data.total_lines } : null);
+    } catch (err) {
+      setError(err.response?.data?.detail || err.message || 'Failed to fetch file content');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     let isMounted = true; // Flag to track mount status
 
     // Only fetch if filePath is provided
     if (!filePath) {
       setCodeContent('');
+      setPartial(null);
       return;
     }
 
@@ -103,16 +131,12 @@ const CodeViewer = ({ filePath, highlightStart, highlightEnd, repoPath }) => {
       setError(null);
       
       try {
-        // Use the filePath prop directly, assuming it's already normalized by App.jsx
-        const normalizedPath = filePath;
+        // Use the filePath prop directly, assuming it's already normalized by App.jsx;
+        // the path is URL-encoded to handle spaces and special characters
+        const url = fileUrl(filePath);
         
-        // Encode URL components to handle spaces and special characters
-        const encodedPath = encodeURIComponent(normalizedPath);
-        
-        // Use the browser API with the normalized path
-        const url = `http://127.0.0.1:8000/browse/${encodedPath}`;
-        
-        // Track the request and response headers for debugging
+        // The server sends ETags, so revisiting an unchanged file is answered with a 304
+        // from the browser cache instead of re-downloading it
         const config = {
           timeout: 15000, // Extend timeout for larger files
           headers: {
@@ -124,16 +148,18 @@ const CodeViewer = ({ filePath, highlightStart, highlightEnd, repoPath }) => {
         const response = await axios.get(url, config);
         
         if (isMounted && response.data && typeof response.data.content === 'string') {
-          const content = response.data.content;
+          const data = response.data;
+          const content = data.content;
           
           setCodeContent(content);
+          setPartial(data.truncated && data.end_line ? { endLine: data.end_line, totalLines: data.total_lines } : null);
           
-          // Calculate basic file info
-          const lines = content.split('\n').length;
-          const size = new Blob([content]).size;
+          // File info for the whole file, even when only part of it was returned
+          const lines = data.total_lines ?? content.split('\n').length;
+          const size = data.size ?? new Blob([content]).size;
           setFileInfo({
             lines,
-            size: size < 1024 ? `${size} B` : `${(size / 1024).toFixed(1)} KB`
+            size: formatSize(size)
           });
         } else if (isMounted) {
           setError('Received an invalid response format from the server');
@@ -181,6 +207,28 @@ const CodeViewer = ({ filePath, highlightStart, highlightEnd, repoPath }) => {
     }
   }, [codeContent]);
 
+  // Scroll to and select the highlighted lines (1-based), if they are among those loaded
+  const revealHighlight = (editor) => {
+    const lineCount = editor?.getModel()?.getLineCount() ?? 0;
+    if (!highlightStart || highlightStart > lineCount) {
+      return;
+    }
+    const endLine = Math.min(Math.max(highlightEnd || highlightStart, highlightStart), lineCount);
+    editor.revealLineInCenter(highlightStart);
+    editor.setSelection({
+      startLineNumber: highlightStart,
+      startColumn: 1,
+      endLineNumber: endLine,
+      endColumn: editor.getModel().getLineMaxColumn(endLine)
+    });
+  };
+
+  useEffect(() => {
+    if (codeContent) {
+      revealHighlight(editorRef.current);
+    }
+  }, [codeContent, highlightStart, highlightEnd]);
+
   // Determine language for syntax highlighting
   const language = getLanguageFromPath(filePath);
   const languageDisplayName = getLanguageDisplayName(language);
@@ -238,6 +286,15 @@ const CodeViewer = ({ filePath, highlightStart, highlightEnd, repoPath }) => {
         </div>
       </div>
       
+      {partial && (
+        <div className="partial-notice">
+          <span>Showing lines 1–{partial.endLine} of {partial.totalLines}</span>
+          <button onClick={loadMore} disabled={loadingMore}>
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
+      
       <div className="editor-container">
         <Editor
           height="calc(90vh - 60px)"
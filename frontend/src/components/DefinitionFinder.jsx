@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import './DefinitionFinder.css';
 
@@ -7,16 +7,57 @@ const DefinitionFinder = ({ onDefinitionSelect, repoPath }) => {
   const [definitions, setDefinitions] = useState([]);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState(null);
+  const [suggestions, setSuggestions] = useState([]);
+  const [highlighted, setHighlighted] = useState(-1);
+  const [showSuggestions, setShowSuggestions] = useState(false);
+  const suggestAbortRef = useRef(null);
 
-  const handleFindDefinition = async () => {
-    if (!symbol.trim()) return;
+  // Typeahead: fetch ranked symbol suggestions shortly after the user stops typing
+  useEffect(() => {
+    const query = symbol.trim();
+    if (!query) {
+      setSuggestions([]);
+      return undefined;
+    }
+    const timer = setTimeout(async () => {
+      if (suggestAbortRef.current) {
+        suggestAbortRef.current.abort();
+      }
+      const controller = new AbortController();
+      suggestAbortRef.current = controller;
+      try {
+        const response = await axios.get('http://127.0.0.1:8000/index/symbols', {
+          params: { q: query, limit: 10 },
+          signal: controller.signal
+        });
+        setSuggestions(response.data?.results || []);
+        setHighlighted(-1);
+      } catch (err) {
+        if (!axios.isCancel(err)) {
+          // Suggestions are best effort; the explicit lookup still reports errors
+          setSuggestions([]);
+        }
+      }
+    }, 150);
+    return () => clearTimeout(timer);
+  }, [symbol]);
+
+  useEffect(() => () => {
+    if (suggestAbortRef.current) {
+      suggestAbortRef.current.abort();
+    }
+  }, []);
+
+  const handleFindDefinition = async (name = symbol) => {
+    if (!name.trim()) return;
     
+    setShowSuggestions(false);
     setIsLoading(true);
     setDefinitions([]);
     setError(null);
     
     try {
-      const response = await axios.get(`http://127.0.0.1:8000/index/definition/${encodeURIComponent(symbol.trim())}`);
+      const response = await axios.get(`http://127.0.0.1:8000/index/definition/${encodeURIComponent(name.trim())}`);
       
       if (response.data && response.data.definitions) {
         setDefinitions(response.data.definitions);
@@ -27,7 +68,7 @@ const DefinitionFinder = ({ onDefinitionSelect, repoPath }) => {
       console.error('Error finding definition:', err);
       
       if (err.response?.status === 404) {
-        setError(`No definitions found for symbol "${symbol}"`);
+        setError(`No definitions found for symbol "${name}"`);
       } else {
         setError(err.response?.data?.message || 'An error occurred while searching for definitions');
       }
@@ -36,9 +77,27 @@ const DefinitionFinder = ({ onDefinitionSelect, repoPath }) => {
     }
   };
 
+  const handleSuggestionSelect = (suggestion) => {
+    setSymbol(suggestion.name);
+    handleFindDefinition(suggestion.name);
+  };
+
   const handleKeyDown = (e) => {
-    if (e.key === 'Enter') {
-      handleFindDefinition();
+    const open = showSuggestions && suggestions.length > 0;
+    if (open && e.key === 'ArrowDown') {
+      e.preventDefault();
+      setHighlighted((index) => (index + 1) % suggestions.length);
+    } else if (open && e.key === 'ArrowUp') {
+      e.preventDefault();
+      setHighlighted((index) => (index <= 0 ? suggestions.length - 1 : index - 1));
+    } else if (e.key === 'Escape') {
+      setShowSuggestions(false);
+    } else if (e.key === 'Enter') {
+      if (open && highlighted >= 0) {
+        handleSuggestionSelect(suggestions[highlighted]);
+      } else {
+        handleFindDefinition();
+      }
     }
   };
 
@@ -72,16 +131,46 @@ const DefinitionFinder = ({ onDefinitionSelect, repoPath }) => {
       <h3>Find Symbol Definitions</h3>
       
       <div className="definition-finder-input">
-        <input
-          type="text"
-          value={symbol}
-          onChange={(e) => setSymbol(e.target.value)}
-          onKeyDown={handleKeyDown}
-          placeholder="Enter symbol name..."
-          className="symbol-input"
-        />
+        <div className="symbol-input-wrapper">
+          <input
+            type="text"
+            value={symbol}
+            onChange={(e) => {
+              setSymbol(e.target.value);
+              setShowSuggestions(true);
+            }}
+            onKeyDown={handleKeyDown}
+            onFocus={() => setShowSuggestions(true)}
+            onBlur={() => setShowSuggestions(false)}
+            placeholder="Enter symbol name..."
+            className="symbol-input"
+          />
+          {showSuggestions && suggestions.length > 0 && (
+            <ul className="symbol-suggestions">
+              {suggestions.map((suggestion, index) => (
+                <li
+                  key={suggestion.name}
+                  className={`symbol-suggestion${index === highlighted ? ' highlighted' : ''}`}
+                  // mousedown fires before the input's blur hides the list
+                  onMouseDown={(e) => {
+                    e.preventDefault();
+                    handleSuggestionSelect(suggestion);
+                  }}
+                  onMouseEnter={() => setHighlighted(index)}
+                >
+                  <span className="suggestion-name">{suggestion.name}</span>
+                  <span className="suggestion-kind">{suggestion.kind}</span>
+                  <span className="suggestion-path">
+                    {suggestion.path}
+                    {suggestion.definitions > 1 ? ` (+${suggestion.definitions - 1})` : ''}
+                  </span>
+                </li>
+              ))}
+            </ul>
+          )}
+        </div>
         <button 
-          onClick={handleFindDefinition} 
+          onClick={() => handleFindDefinition()} 
           className="find-button"
           disabled={isLoading || !symbol.trim()}
         >
@@ -1,52 +1,81 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import './FileBrowser.css';
 
+// Directory entries fetched per request; the server sorts them (directories first, then by name)
+const PAGE_SIZE = 500;
+
+const formatSize = (size) => {
+  if (size === null || size === undefined) return '';
+  if (size < 1024) return `${size} B`;
+  if (size < 1024 * 1024) return `${(size / 1024).toFixed(1)} KB`;
+  return `${(size / (1024 * 1024)).toFixed(1)} MB`;
+};
+
 const FileBrowser = ({ currentPath, onPathChange, onFileSelect }) => {
   const [items, setItems] = useState([]);
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [filter, setFilter] = useState('');
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
+  const requestRef = useRef(null);
 
-  useEffect(() => {
-    const fetchDirectoryContents = async () => {
-      setLoading(true);
-      setError(null);
-      
-      try {
-        const response = await axios.get(`http://127.0.0.1:8000/browse/${currentPath}`, {
-          timeout: 10000, // 10 second timeout
-          headers: {
-            'Accept': 'application/json',
-            'Content-Type': 'application/json'
-          }
-        });
-        
-        if (response.data && Array.isArray(response.data.items)) {
-          // Sort items: directories first, then files, both alphabetically
-          const sortedItems = response.data.items.sort((a, b) => {
-            // If both are dirs or both are files, sort alphabetically
-            if (a.is_dir === b.is_dir) {
-              return a.name.localeCompare(b.name);
-            }
-            // Otherwise, directories come first
-            return a.is_dir ? -1 : 1;
-          });
-          
-          setItems(sortedItems);
-        } else {
-          setItems([]);
-          setError('Unexpected response format from server');
+  // Fetch one page of the directory; without a cursor the list starts over
+  const fetchPage = async (cursor = null) => {
+    if (requestRef.current) {
+      requestRef.current.abort();
+    }
+    const controller = new AbortController();
+    requestRef.current = controller;
+    setLoading(true);
+    setError(null);
+    
+    try {
+      const response = await axios.get(`http://127.0.0.1:8000/browse/${currentPath}`, {
+        timeout: 10000, // 10 second timeout
+        signal: controller.signal,
+        params: {
+          limit: PAGE_SIZE,
+          ...(cursor ? { cursor } : {}),
+          ...(filter ? { filter } : {})
+        },
+        headers: {
+          'Accept': 'application/json'
         }
-      } catch (err) {
-        setError(err.response?.data?.detail || err.message || 'Failed to fetch directory contents');
-      } finally {
+      });
+      
+      if (response.data && Array.isArray(response.data.items)) {
+        setItems((previous) => (cursor ? [...previous, ...response.data.items] : response.data.items));
+        setTotal(response.data.total ?? response.data.items.length);
+        setNextCursor(response.data.next_cursor || null);
+      } else {
+        setItems([]);
+        setNextCursor(null);
+        setError('Unexpected response format from server');
+      }
+    } catch (err) {
+      if (axios.isCancel(err)) return;
+      setError(err.response?.data?.detail || err.message || 'Failed to fetch directory contents');
+    } finally {
+      if (requestRef.current === controller) {
+        requestRef.current = null;
         setLoading(false);
       }
-    };
+    }
+  };
 
-    fetchDirectoryContents();
+  // Reset the filter when moving to another directory
+  useEffect(() => {
+    setFilter('');
   }, [currentPath]);
 
+  // Refetch from the first page when the directory or (debounced) filter changes
+  useEffect(() => {
+    const timer = setTimeout(() => fetchPage(), filter ? 200 : 0);
+    return () => clearTimeout(timer);
+  }, [currentPath, filter]);
+
   const handleItemClick = (item) => {
     if (!item) {
       return;
@@ -159,6 +188,20 @@ const FileBrowser = ({ currentPath, onPathChange, onFileSelect }) => {
         ))}
       </div>
 
+      <div className="file-filter" style={{ flex: '0 0 auto' }}>
+        <input
+          type="text"
+          value={filter}
+          onChange={(e) => setFilter(e.target.value)}
+          placeholder="Filter by name..."
+        />
+        {total > 0 && (
+          <span className="file-count">
+            {items.length < total ? `${items.length} of ${total}` : total} items
+          </span>
+        )}
+      </div>
+
       {loading && <div className="loading" style={{ flex: '0 0 auto' }}>Loading...</div>}
       
       {error && (
@@ -178,7 +221,7 @@ const FileBrowser = ({ currentPath, onPathChange, onFileSelect }) => {
         {items.length > 0 ? (
           items.map((item, index) => (
             <li 
-              key={index} 
+              key={item.name} 
               className={`file-item ${item.is_dir ? 'directory' : 'file'}`}
               onClick={() => handleItemClick(item)}
               style={{ padding: '3px 4px', fontSize: '12px', marginBottom: '1px' }}
@@ -186,14 +229,26 @@ const FileBrowser = ({ currentPath, onPathChange, onFileSelect }) => {
               <span className="file-icon">
                 {item.is_dir ? getDirIcon() : getFileIcon(item.name)}
               </span>
-              {item.name}
+              <span className="file-name">{item.name}</span>
+              <span className="file-meta">
+                {item.is_dir
+                  ? (item.child_count !== null && item.child_count !== undefined ? `${item.child_count} items` : '')
+                  : formatSize(item.size)}
+              </span>
             </li>
           ))
         ) : !loading && !error ? (
           <div className="empty-directory">
-            This directory is empty or no items returned
+            {filter ? 'No items match the filter' : 'This directory is empty or no items returned'}
           </div>
         ) : null}
+        {nextCursor && !loading && (
+          <li className="load-more">
+            <button onClick={() => fetchPage(nextCursor)}>
+              Load more ({total - items.length} remaining)
+            </button>
+          </li>
+        )}
       </ul>
     </div>
   );
@@ -1,7 +1,16 @@
-import { useState, useEffect } from 'react';
-import axios from 'axios';
+import { useState, useEffect, useRef } from 'react';
 import './FileSearchPanel.css';
 
+// Most results a search returns; the server stops scanning once it has this many
+const RESULT_LIMIT = 200;
+
+// Snippet or line preview as HTML: text escaped, «matches» highlighted
+const highlightMatches = (text) => text
+    .replace(/&/g, '&amp;')
+    .replace(/</g, '&lt;')
+    .replace(/>/g, '&gt;')
+    .replace(/«(.*?)»/g, '<span class="match-highlight">$1</span>');
+
 const FileSearchPanel = ({ onFileSelect }) => {
     const [searchQuery, setSearchQuery] = useState('');
     const [extension, setExtension] = useState('');
@@ -11,6 +20,12 @@ const FileSearchPanel = ({ onFileSelect }) => {
     const [error, setError] = useState(null);
     const [searchType, setSearchType] = useState('filename'); // 'filename' or 'content'
     const [exactMatch, setExactMatch] = useState(false);
+    // Files scanned so far by a streaming search, and whether it stopped at the result limit
+    const [progress, setProgress] = useState(null);
+    const abortRef = useRef(null);
+    
+    // Cancel a running search when the panel unmounts; the server stops scanning when the stream closes
+    useEffect(() => () => abortRef.current?.abort(), []);
     
     // Common file extensions to filter by
     const commonExtensions = ['py', 'js', 'jsx', 'ts', 'tsx', 'java', 'c', 'cpp', 'h', 'html', 'css'];
@@ -18,9 +33,13 @@ const FileSearchPanel = ({ onFileSelect }) => {
     const handleSearch = async () => {
         if (!searchQuery.trim()) return;
         
+        abortRef.current?.abort();
+        const controller = new AbortController();
+        abortRef.current = controller;
         setIsLoading(true);
         setError(null);
         setResults([]);
+        setProgress(null);
         
         try {
             // Check if the query is quoted for exact phrase matching
@@ -31,7 +50,9 @@ const FileSearchPanel = ({ onFileSelect }) => {
             const params = { 
                 q: searchQuery,
                 code: searchType === 'content',
-                exact: exactMatch || isQuotedString // Force exact matching for quoted strings
+                exact: exactMatch || isQuotedString, // Force exact matching for quoted strings
+                limit: RESULT_LIMIT,
+                stream: true
             };
             
             if (extension) params.ext = extension;
@@ -39,25 +60,62 @@ const FileSearchPanel = ({ onFileSelect }) => {
             
             console.log(`Searching for "${searchQuery}" in ${searchType} mode (exact: ${params.exact})`);
             
-            // Call the unified search endpoint
-            const response = await axios.get('http://127.0.0.1:8000/search', { params });
+            // Call the unified search endpoint; matches stream in as NDJSON while files are scanned
+            const query = new URLSearchParams(Object.entries(params).map(([key, value]) => [key, String(value)]));
+            const response = await fetch(`http://127.0.0.1:8000/search?${query}`, {
+                headers: { 'Accept': 'application/x-ndjson' },
+                signal: controller.signal
+            });
+            if (!response.ok) {
+                const body = await response.json().catch(() => ({}));
+                throw new Error(body.detail || `HTTP ${response.status}`);
+            }
             
-            if (response.data && Array.isArray(response.data)) {
-                console.log(`Found ${response.data.length} results`);
-                setResults(response.data);
-            } else {
-                console.error("Unexpected response format:", response.data);
-                setError("Received invalid response format from server");
-                setResults([]);
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                // One JSON object per line; keep any partial line in the buffer
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                const matches = [];
+                for (const line of lines) {
+                    if (!line.trim()) continue;
+                    const message = JSON.parse(line);
+                    if (message.type === 'match') {
+                        const { type, ...result } = message;
+                        matches.push(result);
+                    } else if (message.type === 'progress' || message.type === 'done') {
+                        setProgress({ processed: message.processed, limited: !!message.limited });
+                    } else if (message.type === 'error') {
+                        throw new Error(message.detail);
+                    }
+                }
+                if (matches.length > 0) {
+                    setResults((previous) => [...previous, ...matches]);
+                }
             }
         } catch (err) {
-            console.error('Error searching:', err);
-            setError(`Failed to search: ${err.message || 'Unknown error'}`);
-            setResults([]);
+            if (err.name !== 'AbortError') {
+                console.error('Error searching:', err);
+                setError(`Failed to search: ${err.message || 'Unknown error'}`);
+            }
         } finally {
-            setIsLoading(false);
+            if (abortRef.current === controller) {
+                abortRef.current = null;
+                setIsLoading(false);
+            }
         }
     };
+    
+    const handleStop = () => {
+        abortRef.current?.abort();
+        abortRef.current = null;
+        setIsLoading(false);
+    };
 
     const handleKeyDown = (e) => {
         if (e.key === 'Enter') {
@@ -65,10 +123,10 @@ const FileSearchPanel = ({ onFileSelect }) => {
         }
     };
 
-    const handleSelectFile = (filePath) => {
+    const handleSelectFile = (filePath, line) => {
         if (onFileSelect) {
-            // Pass the file path to the parent component
-            onFileSelect(filePath);
+            // Pass the file path (and the line of a match, if one was picked) to the parent component
+            onFileSelect(filePath, line);
         }
     };
 
@@ -148,9 +206,11 @@ const FileSearchPanel = ({ onFileSelect }) => {
                             onKeyDown={handleKeyDown}
                         />
                     </div>
-                    <button onClick={handleSearch} disabled={isLoading}>
-                        {isLoading ? 'Searching...' : 'Search'}
-                    </button>
+                    {isLoading ? (
+                        <button onClick={handleStop}>Stop</button>
+                    ) : (
+                        <button onClick={handleSearch}>Search</button>
+                    )}
                 </div>
                 
                 <div className="extension-shortcuts">
@@ -177,19 +237,36 @@ const FileSearchPanel = ({ onFileSelect }) => {
             <div className="search-results">
                 {results && results.length > 0 ? (
                     <div>
-                        <p className="results-count">{results.length} result(s) found</p>
+                        <p className="results-count">
+                            {results.length} result(s) found
+                            {progress?.limited && ` (first ${RESULT_LIMIT} shown)`}
+                            {isLoading && progress && ` • ${progress.processed} files scanned`}
+                        </p>
                         <ul className="file-list">
                             {results.map((result, index) => (
-                                <li key={index} onClick={() => handleSelectFile(result.file_path)}>
+                                <li key={`${result.file_path}-${index}`} onClick={() => handleSelectFile(result.file_path, result.line)}>
                                     <span className="file-icon">📄</span>
                                     <div className="file-result">
                                         <div className="file-path">{result.file_path}</div>
-                                        {result.snippet && (
+                                        {result.matches ? (
+                                            <ul className={`match-lines ${result.exact_match ? 'exact-match' : ''}`}>
+                                                {result.matches.map((match) => (
+                                                    <li
+                                                        key={`${match.line}:${match.column}`}
+                                                        onClick={(e) => {
+                                                            e.stopPropagation();
+                                                            handleSelectFile(result.file_path, match.line);
+                                                        }}
+                                                    >
+                                                        <span className="match-location">{match.line}:{match.column}</span>
+                                                        <code dangerouslySetInnerHTML={{ __html: highlightMatches(match.preview) }} />
+                                                    </li>
+                                                ))}
+                                                {result.more_matches && <li className="more-matches">More matches in this file</li>}
+                                            </ul>
+                                        ) : result.snippet && (
                                             <div className={`code-snippet ${result.exact_match ? 'exact-match' : ''}`}>
-                                                <pre dangerouslySetInnerHTML={{ __html: 
-                                                    result.snippet.replace(/«(.*?)»/g, 
-                                                    '<span class="match-highlight">$1</span>') 
-                                                }} />
+                                                <pre dangerouslySetInnerHTML={{ __html: highlightMatches(result.snippet) }} />
                                             </div>
                                         )}
                                     </div>
@@ -203,7 +280,7 @@ const FileSearchPanel = ({ onFileSelect }) => {
                 
                 {isLoading && (
                     <div className="loading">
-                        <p>Searching...</p>
+                        <p>{progress ? `Searching... ${progress.processed} files scanned` : 'Searching...'}</p>
                         <div className="loading-spinner"></div>
                     </div>
                 )}
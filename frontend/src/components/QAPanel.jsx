@@ -1,16 +1,42 @@
-import { useState } from 'react';
-import axios from 'axios';
+import { useState, useRef, useEffect } from 'react';
 import './QAPanel.css';
 
+// Parse one Server-Sent Event block ("event: ...\ndata: ...") into { event, data }
+const parseEvent = (block) => {
+  let event = 'message';
+  const dataLines = [];
+  for (const line of block.split('\n')) {
+    if (line.startsWith('event:')) {
+      event = line.slice(6).trim();
+    } else if (line.startsWith('data:')) {
+      dataLines.push(line.slice(5).trimStart());
+    }
+  }
+  return { event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : {} };
+};
+
 const QAPanel = ({ currentFilePath }) => {
   const [question, setQuestion] = useState('');
   const [answer, setAnswer] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState(null);
+  const abortRef = useRef(null);
+
+  // Stop any answer still streaming when the panel goes away
+  useEffect(() => () => abortRef.current?.abort(), []);
+
+  const handleStop = () => {
+    abortRef.current?.abort();
+  };
 
   const handleAsk = async () => {
     if (!question.trim()) return;
     
+    // Cancel a previous answer that is still streaming
+    abortRef.current?.abort();
+    const controller = new AbortController();
+    abortRef.current = controller;
+    
     setIsLoading(true);
     setAnswer('');
     setError(null);
@@ -26,13 +52,48 @@ const QAPanel = ({ currentFilePath }) => {
         requestBody.context_file_path = currentFilePath;
       }
       
-      const response = await axios.post('http://localhost:8000/query', requestBody);
-      setAnswer(response.data.answer);
+      // Stream the answer: the backend sends Server-Sent Events as tokens arrive
+      const response = await fetch('http://localhost:8000/query/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(requestBody),
+        signal: controller.signal
+      });
+      if (!response.ok) {
+        const body = await response.json().catch(() => ({}));
+        throw new Error(body.detail || 'An error occurred while getting an answer');
+      }
+      
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        // Events are separated by a blank line; keep any partial event in the buffer
+        const blocks = buffer.split('\n\n');
+        buffer = blocks.pop();
+        for (const block of blocks) {
+          if (!block.trim()) continue;
+          const { event, data } = parseEvent(block);
+          if (event === 'token') {
+            setAnswer((previous) => previous + data.text);
+          } else if (event === 'error') {
+            throw new Error(data.detail || 'An error occurred while getting an answer');
+          }
+        }
+      }
     } catch (err) {
-      setError(err.response?.data?.detail || 'An error occurred while getting an answer');
-      console.error('Query error:', err);
+      if (err.name !== 'AbortError') {
+        setError(err.message || 'An error occurred while getting an answer');
+        console.error('Query error:', err);
+      }
     } finally {
-      setIsLoading(false);
+      if (abortRef.current === controller) {
+        abortRef.current = null;
+        setIsLoading(false);
+      }
     }
   };
 
@@ -69,14 +130,24 @@ const QAPanel = ({ currentFilePath }) => {
           }}
         />
         
-        <button 
-          onClick={handleAsk} 
-          className="qa-button"
-          disabled={isLoading || !question.trim()}
-          style={{ flexShrink: 0 }}
-        >
-          {isLoading ? 'Thinking...' : 'Ask AI'}
-        </button>
+        {isLoading ? (
+          <button 
+            onClick={handleStop} 
+            className="qa-button"
+            style={{ flexShrink: 0 }}
+          >
+            Stop
+          </button>
+        ) : (
+          <button 
+            onClick={handleAsk} 
+            className="qa-button"
+            disabled={!question.trim()}
+            style={{ flexShrink: 0 }}
+          >
+            Ask AI
+          </button>
+        )}
       </div>
       
       {currentFilePath && (
@@ -85,7 +156,7 @@ const QAPanel = ({ currentFilePath }) => {
         </div>
       )}
       
-      {isLoading && (
+      {isLoading && !answer && (
         <div className="qa-loading" style={{ marginBottom: '15px' }}>
           <p>AI is analyzing the code and formulating an answer...</p>
         </div>
@@ -83,14 +83,15 @@ const SearchPanel = ({ onResultSelect, repoPath }) => {
     
     // Get the file path from the result
     const filePath = result.file_path; // Use the original path directly
-    const startChar = result.start_char || 0;
-    const endChar = result.end_char || 0;
+    // Line span of the chunk (absent for chunks indexed before spans were stored)
+    const startLine = result.start_line || 0;
+    const endLine = result.end_line || startLine;
     
     // Log the original path being passed up
-    console.log(`Selecting file with original path: ${filePath} (${startChar}:${endChar})`);
+    console.log(`Selecting file with original path: ${filePath} (lines ${startLine}-${endLine})`);
     
     // Pass the original file path to the parent component
-    onResultSelect(filePath, startChar, endChar); // Pass original filePath
+    onResultSelect(filePath, startLine, endLine); // Pass original filePath
   };
 
   return (